@@ -8,10 +8,9 @@ CORS(app)
 
 try:
     from utils.db import init_db
-    import os
-    if not os.path.exists(Config.DATABASE_PATH):
-        init_db()
-        print("Database initialized!")
+    applied = init_db()
+    if applied:
+        print(f"Database migrated ({len(applied)} migration(s) applied)")
 except Exception as e:
     print(f"Database initialization: {e}")
 
@@ -25,13 +24,30 @@ app.register_blueprint(student_bp, url_prefix="/api/student")
 app.register_blueprint(teacher_bp, url_prefix="/api/teacher")
 app.register_blueprint(admin_bp, url_prefix="/api/admin")
 
+# The ML predictor stays out of the import graph; warm it per ML_LOAD_MODE
+from utils.ml import start_loading
+if Config.ML_LOAD_MODE == 'eager':
+    start_loading(background=False)
+elif Config.ML_LOAD_MODE == 'background':
+    start_loading()
+
 @app.route("/")
 def index():
     return {"message": "SmartEd API is running", "status": "success"}
 
 @app.route("/api/health")
 def health():
-    return {"status": "healthy", "version": "1.0.0"}
+    from utils.db import pool_metrics
+    from utils.cache import cache_metrics
+    from utils.ml import ml_status, ml_ready
+    return {
+        "status": "healthy",
+        "version": "1.0.0",
+        "ml_ready": ml_ready(),
+        "db_pool": pool_metrics(),
+        "response_cache": cache_metrics(),
+        "ml": ml_status()
+    }
 
 if __name__ == "__main__":
     app.run(debug=True, port=5000)
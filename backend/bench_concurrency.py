@@ -0,0 +1,117 @@
+"""
+Throughput of /api/student/dashboard under concurrent requests
+
+Each inference configuration runs in its own process (Config is read at
+import) against a scratch copy of the database, with the response and
+prediction caches disabled so every request evaluates the models. Requests
+are issued from 1, 8 and 32 threads through the Flask test client, which
+exercises the same GIL and thread contention as a threaded server.
+
+    cd backend && python bench_concurrency.py [--requests 400]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_PATH = os.path.dirname(os.path.abspath(__file__))
+
+CONFIGURATIONS = {
+    # What the models were persisted with: forests predict with n_jobs=-1
+    'sklearn, persisted n_jobs': {'ML_FLAT_TREES': '0', 'ML_INFERENCE_N_JOBS': '-1'},
+    'sklearn, n_jobs=1': {'ML_FLAT_TREES': '0', 'ML_INFERENCE_N_JOBS': '1'},
+    'flat trees, n_jobs=1': {'ML_FLAT_TREES': '1', 'ML_INFERENCE_N_JOBS': '1'}
+}
+
+
+def run_configuration(concurrency_levels, total_requests):
+    """Child process: measure one configuration and print JSON results"""
+    sys.path.append(BACKEND_PATH)
+    from app import app
+    from utils.auth import generate_token
+    from utils.ml import wait_until_ready
+    from config import Config
+
+    wait_until_ready(120)
+    conn = sqlite3.connect(Config.DATABASE_PATH)
+    students = conn.execute(
+        """SELECT u.user_id, u.email FROM users u
+           JOIN students s ON s.user_id = u.user_id
+           WHERE u.role = 'student'"""
+    ).fetchall()
+    conn.close()
+    headers = [{'Authorization': f'Bearer {generate_token(user_id, email, "student")}'} for user_id, email in students]
+
+    def request(i):
+        started = time.perf_counter()
+        response = app.test_client().get('/api/student/dashboard', headers=headers[i % len(headers)])
+        assert response.status_code == 200, response.status_code
+        return time.perf_counter() - started
+
+    for i in range(min(len(headers), 20)):
+        request(i)
+
+    results = {}
+    for concurrency in concurrency_levels:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            started = time.perf_counter()
+            latencies = sorted(pool.map(request, range(total_requests)))
+            elapsed = time.perf_counter() - started
+        results[concurrency] = {
+            'throughput': total_requests / elapsed,
+            'p50_ms': latencies[len(latencies) // 2] * 1000,
+            'p95_ms': latencies[int(len(latencies) * 0.95)] * 1000
+        }
+    print(json.dumps(results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--requests', type=int, default=400, help='requests per concurrency level')
+    parser.add_argument('--run', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_configuration(args.concurrency, args.requests)
+        return
+
+    sys.path.append(BACKEND_PATH)
+    from config import Config
+
+    scratch = tempfile.mkdtemp(prefix='smarted-bench-')
+    db_path = os.path.join(scratch, 'smarted.db')
+    shutil.copy2(Config.DATABASE_PATH, db_path)
+
+    print(f"{'configuration':<26} {'concurrency':>11} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8}  (cpus: {os.cpu_count()})")
+    try:
+        for name, overrides in CONFIGURATIONS.items():
+            env = dict(
+                os.environ,
+                DATABASE_PATH=db_path,
+                ML_LOAD_MODE='eager',
+                RESPONSE_CACHE_SIZE='0',
+                ML_PREDICTION_CACHE_SIZE='0',
+                **overrides
+            )
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--run', '--requests', str(args.requests),
+                 '--concurrency', *map(str, args.concurrency)],
+                cwd=BACKEND_PATH, env=env, capture_output=True, text=True, check=True
+            ).stdout
+            results = json.loads(output.strip().splitlines()[-1])
+            for concurrency in args.concurrency:
+                r = results[str(concurrency)]
+                print(f"{name:<26} {concurrency:>11} {r['throughput']:>8.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f}")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
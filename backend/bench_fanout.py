@@ -0,0 +1,191 @@
+"""
+At-risk and practice statistics before/after removing the mastery x
+engagement join (teacher dashboard at_risk_students, student practice
+latest_stats)
+
+Generates a scratch database through the migrations and triggers (the
+daily engagement rollup is filled as the logs are inserted), then times
+the old join-then-average queries against the per-student lookups the
+routes run now, and checks that both pick the same at-risk students. The
+defaults are 10k students x 9 topics x 2k engagement logs over 90 days:
+20M log rows take about half an hour to insert through the triggers
+(--db keeps the file for later runs) and the old all-students query about
+a minute per run; --students/--logs scale it down.
+
+    cd backend && python bench_fanout.py [--students 10000] [--logs 2000] [--repeat 3]
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import sqlite3
+import argparse
+import tempfile
+import statistics
+
+BACKEND_PATH = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(BACKEND_PATH)
+
+from utils.migrations import migrate
+from utils.timeutil import SECONDS_PER_DAY, now_epoch, epoch_days_ago, today_bucket
+
+SUBJECTS = {
+    'Mathematics': ['Algebra', 'Geometry', 'Calculus'],
+    'Science': ['Physics', 'Chemistry', 'Biology'],
+    'English': ['Grammar', 'Literature', 'Writing']
+}
+SECTIONS = [(grade, section) for grade in (8, 9, 10, 11, 12, 13) for section in 'ABCDE']
+
+OLD_AT_RISK = """
+    SELECT
+        s.student_id, s.student_name, s.grade, s.section,
+        COALESCE(AVG(m.final_mastery_score), 0) as avg_mastery,
+        COALESCE(AVG(e.engagement_score), 0) as avg_engagement
+    FROM students s
+    LEFT JOIN mastery_scores m ON s.student_id = m.student_id
+    LEFT JOIN engagement_logs e ON s.student_id = e.student_id
+        AND e.timestamp >= ?
+    WHERE {student_filter}
+    GROUP BY s.student_id, s.student_name, s.grade, s.section
+    HAVING avg_mastery < 65 OR avg_engagement < 60
+    ORDER BY avg_mastery ASC
+    LIMIT 10"""
+
+NEW_AT_RISK = """
+    SELECT * FROM (
+        SELECT
+         s.student_id, s.student_name, s.grade, s.section,
+         COALESCE((
+             SELECT AVG(m.final_mastery_score)
+             FROM mastery_scores m
+             WHERE m.student_id = s.student_id
+         ), 0) as avg_mastery,
+         COALESCE((
+             SELECT CAST(SUM(d.score_sum) AS REAL) / SUM(d.score_count)
+             FROM student_daily_engagement d
+             WHERE d.student_id = s.student_id AND d.day_bucket >= ?
+         ), 0) as avg_engagement
+        FROM students s
+        WHERE {student_filter}
+    )
+    WHERE avg_mastery < 65 OR avg_engagement < 60
+    ORDER BY avg_mastery ASC
+    LIMIT 10"""
+
+OLD_LATEST_STATS = """
+    SELECT AVG(final_mastery_score) as avg_mastery,
+           AVG(engagement_score) as avg_engagement
+    FROM mastery_scores m
+    JOIN engagement_logs e ON m.student_id = e.student_id
+    WHERE m.student_id = ?"""
+
+NEW_LATEST_STATS = """
+    SELECT
+        (SELECT AVG(final_mastery_score)
+         FROM mastery_scores
+         WHERE student_id = ?) as avg_mastery,
+        (SELECT CAST(SUM(score_sum) AS REAL) / SUM(score_count)
+         FROM student_daily_engagement
+         WHERE student_id = ?) as avg_engagement"""
+
+
+def generate(db_path, n_students, logs_per_student, seed=42):
+    """Migrated database with n_students, 9 mastery rows each and their engagement logs"""
+    migrate(db_path)
+    rnd = random.Random(seed)
+    now = now_epoch()
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    for i in range(n_students):
+        student_id = f'STU{i:06d}'
+        grade, section = SECTIONS[i % len(SECTIONS)]
+        conn.execute(
+            "INSERT INTO students (student_id, student_name, grade, section, institution_id) "
+            "VALUES (?, ?, ?, ?, 'INST001')",
+            (student_id, f'Student {i}', grade, section)
+        )
+        conn.executemany(
+            "INSERT INTO mastery_scores (student_id, subject, topic, final_mastery_score, mastery_level) "
+            "VALUES (?, ?, ?, ?, 'intermediate')",
+            [(student_id, subject, topic, rnd.uniform(30, 100))
+             for subject, topics in SUBJECTS.items() for topic in topics]
+        )
+        conn.executemany(
+            "INSERT INTO engagement_logs (student_id, session_id, activity_type, duration_seconds, "
+            "interaction_count, timestamp, engagement_score) VALUES (?, ?, 'video', ?, 5, ?, ?)",
+            [(student_id, f'{student_id}-{k}', rnd.randint(60, 3000),
+              now - rnd.random() * 90 * SECONDS_PER_DAY, rnd.uniform(20, 100))
+             for k in range(logs_per_student)]
+        )
+        if i % 500 == 499:
+            conn.commit()
+            print(f"  {i + 1:,} students generated", flush=True)
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+def timed(conn, sql, args, repeat):
+    """(median milliseconds, rows of the last run)"""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = conn.execute(sql, args).fetchall()
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times), rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--students', type=int, default=10000)
+    parser.add_argument('--logs', type=int, default=2000, help='engagement logs per student')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per query (median reported)')
+    parser.add_argument('--db', help='reuse (or keep) the generated database at this path')
+    args = parser.parse_args()
+
+    scratch = None
+    db_path = args.db
+    if db_path is None:
+        scratch = tempfile.mkdtemp(prefix='smarted-fanout-')
+        db_path = os.path.join(scratch, 'smarted.db')
+    try:
+        if not os.path.exists(db_path):
+            print(f"Generating {args.students:,} students x {args.logs:,} logs in {db_path}...")
+            started = time.perf_counter()
+            generate(db_path, args.students, args.logs)
+            print(f"  done in {time.perf_counter() - started:.0f}s")
+
+        conn = sqlite3.connect(db_path)
+        (total_logs,) = conn.execute("SELECT COUNT(*) FROM engagement_logs").fetchone()
+        grade, section = SECTIONS[0]
+        (student_id,) = conn.execute("SELECT MIN(student_id) FROM students").fetchone()
+        one_class = "s.grade = ? AND s.section = ?"
+        cases = [
+            ('at-risk, all students',
+             OLD_AT_RISK.format(student_filter='1=1'), (epoch_days_ago(30),),
+             NEW_AT_RISK.format(student_filter='1=1'), (today_bucket() - 30,)),
+            ('at-risk, one class',
+             OLD_AT_RISK.format(student_filter=one_class), (epoch_days_ago(30), grade, section),
+             NEW_AT_RISK.format(student_filter=one_class), (today_bucket() - 30, grade, section)),
+            ('practice latest_stats',
+             OLD_LATEST_STATS, (student_id,),
+             NEW_LATEST_STATS, (student_id, student_id)),
+        ]
+
+        print(f"\n{total_logs:,} engagement rows, SQLite {sqlite3.sqlite_version}, median of {args.repeat}")
+        print(f"{'query':<24} {'before ms':>11} {'after ms':>10} {'speedup':>9}  same students")
+        for name, old_sql, old_args, new_sql, new_args in cases:
+            old_ms, old_rows = timed(conn, old_sql, old_args, args.repeat)
+            new_ms, new_rows = timed(conn, new_sql, new_args, args.repeat)
+            same = '-' if name.startswith('practice') else [r[0] for r in old_rows] == [r[0] for r in new_rows]
+            print(f"{name:<24} {old_ms:>11.3f} {new_ms:>10.3f} {old_ms / new_ms:>8.0f}x  {same}")
+        conn.close()
+    finally:
+        if scratch:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
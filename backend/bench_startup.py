@@ -0,0 +1,98 @@
+"""
+Startup cost of the backend for each ML_LOAD_MODE
+
+Each mode runs in fresh processes (Config is read at import) against a
+scratch copy of the database, migrated beforehand so no run pays for the
+migrations. A run times `import app`, then the first /api/health through
+the Flask test client (whether the models were ready for it), then how
+long until the predictor is loaded, all from the start of the import
+(lazy mode only starts loading at that wait, as a first prediction
+request would). Process time adds the interpreter start and exit around
+that.
+
+    cd backend && python bench_startup.py [--repeat 3]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+BACKEND_PATH = os.path.dirname(os.path.abspath(__file__))
+
+LOAD_MODES = ['eager', 'background', 'lazy']
+
+
+def run_startup():
+    """Child process: time import and first health check, print JSON results"""
+    sys.path.append(BACKEND_PATH)
+    started = time.perf_counter()
+    from app import app
+    imported = time.perf_counter()
+
+    response = app.test_client().get('/api/health')
+    assert response.status_code == 200, response.status_code
+    health = time.perf_counter()
+
+    from utils.ml import wait_until_ready
+    loaded = wait_until_ready(300)
+    ready = time.perf_counter()
+    print(json.dumps({
+        'import_ms': (imported - started) * 1000,
+        'health_ms': (health - imported) * 1000,
+        'ml_ready_at_health': response.get_json()['ml_ready'],
+        'ready_ms': (ready - started) * 1000 if loaded else None
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--modes', nargs='+', choices=LOAD_MODES, default=LOAD_MODES)
+    parser.add_argument('--repeat', type=int, default=3, help='processes per mode (median reported)')
+    parser.add_argument('--run', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_startup()
+        return
+
+    sys.path.append(BACKEND_PATH)
+    from config import Config
+    from utils.migrations import migrate
+
+    scratch = tempfile.mkdtemp(prefix='smarted-startup-')
+    db_path = os.path.join(scratch, 'smarted.db')
+    shutil.copy2(Config.DATABASE_PATH, db_path)
+    migrate(db_path)
+
+    print(f"\n{'mode':<11} {'import ms':>10} {'health ms':>10} {'ml ready':>9} {'ready ms':>9} {'process ms':>11}"
+          f"  (median of {args.repeat})")
+    try:
+        for mode in args.modes:
+            env = dict(os.environ, DATABASE_PATH=db_path, ML_LOAD_MODE=mode)
+            runs = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                output = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), '--run'],
+                    cwd=BACKEND_PATH, env=env, capture_output=True, text=True, check=True
+                ).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                result['process_ms'] = (time.perf_counter() - started) * 1000
+                runs.append(result)
+
+            median = lambda key: statistics.median(r[key] for r in runs)
+            ready_at_health = sum(r['ml_ready_at_health'] for r in runs)
+            ready_ms = '-' if any(r['ready_ms'] is None for r in runs) else f"{median('ready_ms'):.0f}"
+            print(f"{mode:<11} {median('import_ms'):>10.0f} {median('health_ms'):>10.1f} "
+                  f"{f'{ready_at_health}/{len(runs)}':>9} {ready_ms:>9} {median('process_ms'):>11.0f}")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
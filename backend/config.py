@@ -3,8 +3,49 @@ from datetime import timedelta
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
-    DATABASE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'smarted.db')
+    DATABASE_PATH = os.environ.get('DATABASE_PATH') or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'smarted.db')
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-key-change-in-production'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
     BCRYPT_LOG_ROUNDS = 12
     CORS_HEADERS = 'Content-Type'
+
+    # SQLite connection pool
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 8))
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 5.0))
+    DB_STATEMENT_CACHE_SIZE = int(os.environ.get('DB_STATEMENT_CACHE_SIZE', 256))
+    DB_POOL_HEALTH_CHECK_INTERVAL = float(os.environ.get('DB_POOL_HEALTH_CHECK_INTERVAL', 30.0))
+
+    # Single writer thread (group commit)
+    DB_WRITE_BATCH_SIZE = int(os.environ.get('DB_WRITE_BATCH_SIZE', 64))
+    DB_WRITE_TIMEOUT = float(os.environ.get('DB_WRITE_TIMEOUT', 10.0))
+
+    # Per-user response cache for student views
+    RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 1024))
+    RESPONSE_CACHE_TTL = float(os.environ.get('RESPONSE_CACHE_TTL', 60.0))
+
+    # ML predictor loading: 'background' (warm on a thread at startup),
+    # 'lazy' (on first use) or 'eager' (block startup until loaded)
+    ML_LOAD_MODE = os.environ.get('ML_LOAD_MODE', 'background')
+
+    # Trained models (flat files or a registry/ folder of versions)
+    ML_MODELS_PATH = os.environ.get('ML_MODELS_PATH') or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'ml', 'models', '')
+
+    # Every worker process follows the registry's CURRENT pointer, checking
+    # it at most this often; each one reports its state in a status file
+    # under ML_WORKER_STATUS_PATH (default: registry/.workers)
+    ML_REGISTRY_POLL_SECONDS = float(os.environ.get('ML_REGISTRY_POLL_SECONDS', 2.0))
+    ML_WORKER_STATUS_PATH = os.environ.get('ML_WORKER_STATUS_PATH')
+
+    # ML inference parallelism: n_jobs pinned on sklearn models, and batches
+    # above ML_BATCH_CHUNK_ROWS split across a shared pool of ML_BATCH_WORKERS
+    # threads (0 = min(4, cpu count)); ML_FLAT_TREES=0 evaluates with sklearn
+    ML_INFERENCE_N_JOBS = int(os.environ.get('ML_INFERENCE_N_JOBS', 1))
+    ML_BATCH_CHUNK_ROWS = int(os.environ.get('ML_BATCH_CHUNK_ROWS', 1024))
+    ML_BATCH_WORKERS = int(os.environ.get('ML_BATCH_WORKERS', 0))
+    ML_FLAT_TREES = os.environ.get('ML_FLAT_TREES', '1') != '0'
+
+    # Rows per chunk of the mastery batch scoring job (utils/scoring.py)
+    ML_SCORING_CHUNK_ROWS = int(os.environ.get('ML_SCORING_CHUNK_ROWS', 5000))
+
+    # ML prediction memoization (entries across all models)
+    ML_PREDICTION_CACHE_SIZE = int(os.environ.get('ML_PREDICTION_CACHE_SIZE', 4096))
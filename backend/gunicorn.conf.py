@@ -0,0 +1,40 @@
+"""
+Gunicorn settings for serving the API with several worker processes
+
+    pip install gunicorn
+    cd backend && gunicorn -c gunicorn.conf.py app:app
+
+The app is imported once in the master, with the ML predictor loaded
+eagerly, and then forked: workers share the master's pages copy-on-write,
+and with exported models (ml/models/registry) every worker maps the same
+tree files. Set GUNICORN_PRELOAD=0 to have each worker load its own copy;
+measure_memory.py compares the two.
+"""
+import os
+import multiprocessing
+
+bind = os.environ.get('GUNICORN_BIND', '127.0.0.1:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count(), 8)))
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') != '0'
+
+# A background loader thread would not survive the fork, so load the
+# predictor before it (or, without preload, before a worker serves)
+os.environ.setdefault('ML_LOAD_MODE', 'eager')
+
+# Models on the hist backend have no n_jobs to pin and size OpenMP's pool
+# from this when the runtime starts; with one pool per worker, the default
+# of one thread per core would oversubscribe the machine
+os.environ.setdefault('OMP_NUM_THREADS', '1')
+
+
+# Workers follow the model registry's CURRENT pointer and each report
+# their state (GET /api/admin/models); register them as they start and
+# drop the report of any that exits
+def post_fork(server, worker):
+    from utils.ml import register_worker
+    register_worker()
+
+
+def child_exit(server, worker):
+    from utils.ml import unregister_worker
+    unregister_worker(worker.pid)
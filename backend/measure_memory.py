@@ -0,0 +1,186 @@
+"""
+Per-worker memory of the API under gunicorn (Linux only)
+
+For each combination of worker count, preload mode and model format this
+starts gunicorn on a scratch copy of the database and models, sends
+student requests until every worker has run predictions, then reads RSS
+and PSS from /proc/<pid>/smaps_rollup for the master and each worker.
+PSS charges shared pages fractionally, so the PSS total is the memory
+the whole server actually costs.
+
+    cd backend && python measure_memory.py [--workers 1 8] [--requests 40]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import signal
+import sqlite3
+import argparse
+import tempfile
+import subprocess
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_PATH = os.path.dirname(os.path.abspath(__file__))
+ROOT_PATH = os.path.dirname(BACKEND_PATH)
+sys.path.append(BACKEND_PATH)
+sys.path.append(os.path.join(ROOT_PATH, 'ml', 'src'))
+
+from config import Config
+
+SMAPS_FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+
+def prepare_models(scratch, model_format):
+    """Scratch models folder: plain pickles, or a registry version with exports"""
+    models_path = os.path.join(scratch, f'models-{model_format}', '')
+    if os.path.exists(models_path):
+        return models_path
+    source = os.path.join(ROOT_PATH, 'ml', 'models')
+    os.makedirs(models_path)
+    for filename in os.listdir(source):
+        if filename.endswith('.pkl'):
+            shutil.copy2(os.path.join(source, filename), models_path)
+    if model_format == 'exported':
+        from model_registry import REGISTRY_DIR, import_flat_models
+        import_flat_models(models_path, os.path.join(models_path, REGISTRY_DIR))
+    return models_path
+
+
+def student_tokens(db_path, limit):
+    from utils.auth import generate_token
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute(
+            """SELECT u.user_id, u.email FROM users u
+               JOIN students s ON s.user_id = u.user_id
+               WHERE u.role = 'student' LIMIT ?""",
+            (limit,)
+        ).fetchall()
+    finally:
+        conn.close()
+    return [generate_token(user_id, email, 'student') for user_id, email in rows]
+
+
+def get(url, token=None):
+    request = urllib.request.Request(url, headers={'Authorization': f'Bearer {token}'} if token else {})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return json.loads(response.read() or b'null')
+
+
+def wait_until_ready(base_url, process, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("gunicorn exited during startup")
+        try:
+            if get(f'{base_url}/api/health').get('ml_ready'):
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not become ready")
+
+
+def child_pids(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(child) for child in f.read().split()]
+    except FileNotFoundError:
+        children = []
+        for entry in os.listdir('/proc'):
+            if entry.isdigit():
+                try:
+                    with open(f'/proc/{entry}/stat') as f:
+                        if int(f.read().rsplit(')', 1)[1].split()[1]) == pid:
+                            children.append(int(entry))
+                except (OSError, IndexError, ValueError):
+                    continue
+        return children
+
+
+def smaps_rollup(pid):
+    """Memory counters of one process, in MiB"""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            key, _, rest = line.partition(':')
+            if key in SMAPS_FIELDS:
+                values[key] = int(rest.split()[0]) / 1024
+    return values
+
+
+def measure(workers, preload, model_format, db_path, scratch, requests_per_worker, port):
+    env = dict(
+        os.environ,
+        DATABASE_PATH=db_path,
+        ML_MODELS_PATH=prepare_models(scratch, model_format),
+        ML_LOAD_MODE='eager',
+        GUNICORN_PRELOAD='1' if preload else '0',
+        WEB_CONCURRENCY=str(workers),
+        GUNICORN_BIND=f'127.0.0.1:{port}'
+    )
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+        cwd=BACKEND_PATH, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        wait_until_ready(base_url, process)
+        tokens = student_tokens(db_path, 50)
+        urls = [
+            (f'{base_url}/api/student/{endpoint}', tokens[i % len(tokens)])
+            for i in range(requests_per_worker * workers)
+            for endpoint in ('dashboard', 'analytics')
+        ]
+        with ThreadPoolExecutor(max_workers=2 * workers) as pool:
+            list(pool.map(lambda args: get(*args), urls))
+        time.sleep(0.5)
+
+        master = smaps_rollup(process.pid)
+        worker_stats = [smaps_rollup(pid) for pid in child_pids(process.pid)]
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=30)
+
+    return master, worker_stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--preload', choices=['on', 'off', 'both'], default='both')
+    parser.add_argument('--models', choices=['pickled', 'exported', 'both'], default='both')
+    parser.add_argument('--requests', type=int, default=40, help='student requests per worker')
+    parser.add_argument('--port', type=int, default=5099)
+    args = parser.parse_args()
+
+    preload_modes = {'on': [True], 'off': [False], 'both': [False, True]}[args.preload]
+    model_formats = ['pickled', 'exported'] if args.models == 'both' else [args.models]
+
+    scratch = tempfile.mkdtemp(prefix='smarted-mem-')
+    db_path = os.path.join(scratch, 'smarted.db')
+    shutil.copy2(Config.DATABASE_PATH, db_path)
+
+    print(f"{'models':<9} {'preload':<8} {'workers':>7} | {'worker RSS':>10} {'worker PSS':>10} "
+          f"{'private':>8} | {'master PSS':>10} {'total RSS':>10} {'total PSS':>10}  (MiB)")
+    try:
+        for model_format in model_formats:
+            for preload in preload_modes:
+                for workers in args.workers:
+                    master, stats = measure(workers, preload, model_format, db_path, scratch, args.requests, args.port)
+                    n = len(stats)
+                    avg = {key: sum(s[key] for s in stats) / n for key in SMAPS_FIELDS}
+                    private = avg['Private_Clean'] + avg['Private_Dirty']
+                    total_rss = master['Rss'] + sum(s['Rss'] for s in stats)
+                    total_pss = master['Pss'] + sum(s['Pss'] for s in stats)
+                    print(f"{model_format:<9} {'on' if preload else 'off':<8} {n:>7} | {avg['Rss']:>10.1f} "
+                          f"{avg['Pss']:>10.1f} {private:>8.1f} | {master['Pss']:>10.1f} {total_rss:>10.1f} {total_pss:>10.1f}")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,10 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils.auth import token_required, role_required
-from utils.db import execute_query
+from utils.db import execute_query, execute_writes, QueryBundle
+from utils.timeutil import today_bucket, month_ranges
+from utils.ml import registry_status, reload_models
+from model_registry import RegistryError
 from datetime import datetime
 
 admin_bp = Blueprint("admin", __name__)
@@ -14,47 +17,52 @@ admin_bp = Blueprint("admin", __name__)
 def dashboard(current_user):
     """Get comprehensive admin dashboard data"""
     try:
-        # Get all students
-        all_students = execute_query(
-            "SELECT student_id FROM students"
-        )
-        
-        student_ids = [s['student_id'] for s in all_students]
-        total_students = len(student_ids)
+        # Admins see every student, so panels aggregate whole tables (no
+        # student id lists) over the same snapshot
+        bundle = QueryBundle()
         
-        if total_students == 0:
-            return jsonify({"message": "No students in system"}), 200
+        bundle.add(
+            'roster',
+            "SELECT COUNT(*) as total_students FROM students",
+            fetch_one=True
+        )
         
         # Overall institutional mastery rate
-        overall_mastery = execute_query(
-            f"""SELECT AVG(final_mastery_score) as avg_mastery
-               FROM mastery_scores
-               WHERE student_id IN ({','.join(['?']*len(student_ids))})""",
-            tuple(student_ids),
+        bundle.add(
+            'overall_mastery',
+            """SELECT AVG(final_mastery_score) as avg_mastery
+               FROM mastery_scores""",
             fetch_one=True
         )
         
-        # Average engagement across institution
-        avg_engagement = execute_query(
-            f"""SELECT AVG(engagement_score) as avg_engagement
-               FROM engagement_logs
-               WHERE student_id IN ({','.join(['?']*len(student_ids))})
-               AND timestamp >= datetime('now', '-30 days')""",
-            tuple(student_ids),
+        # Average engagement across institution (a day range over the daily
+        # rollup, idx_daily_engagement_day)
+        bundle.add(
+            'avg_engagement',
+            """SELECT CAST(SUM(score_sum) AS REAL) / SUM(score_count) as avg_engagement
+               FROM student_daily_engagement
+               WHERE day_bucket >= ?""",
+            (today_bucket() - 30,),
             fetch_one=True
         )
     
-        active_students = execute_query(
-            f"""SELECT COUNT(DISTINCT student_id) as count
-               FROM engagement_logs
-               WHERE student_id IN ({','.join(['?']*len(student_ids))})
-               AND timestamp >= datetime('now', '-7 days')""",
-            tuple(student_ids),
+        # Students active in the last week: one primary-key probe of the
+        # daily rollup per student instead of a DISTINCT over the window
+        bundle.add(
+            'active_students',
+            """SELECT COUNT(*) as count
+               FROM students s
+               WHERE EXISTS (
+                   SELECT 1 FROM student_daily_engagement d
+                   WHERE d.student_id = s.student_id AND d.day_bucket >= ?
+               )""",
+            (today_bucket() - 7,),
             fetch_one=True
         )
         
         # Teacher adoption (users with teacher role)
-        teacher_stats = execute_query(
+        bundle.add(
+            'teacher_stats',
             """SELECT 
                 COUNT(*) as total_teachers,
                 SUM(CASE WHEN last_login >= datetime('now', '-7 days') THEN 1 ELSE 0 END) as active_teachers
@@ -63,35 +71,40 @@ def dashboard(current_user):
             fetch_one=True
         )
         
-        # Mastery trend over last 5 months
-        mastery_trend = execute_query(
+        # Mastery trend over last 5 months: one idx_mastery_updated range
+        # per calendar month (the oldest clipped at the 5-month cutoff), so
+        # there is no grouping by a computed month label
+        months = month_ranges(6)
+        bundle.add(
+            'mastery_trend',
             f"""SELECT 
-                strftime('%Y-%m', m.updated_at) as month,
-                AVG(m.final_mastery_score) as avg_mastery
-               FROM mastery_scores m
-               WHERE m.student_id IN ({','.join(['?']*len(student_ids))})
-               AND m.updated_at >= datetime('now', '-5 months')
-               GROUP BY month
-               ORDER BY month ASC""",
-            tuple(student_ids)
+                months.column1 as month,
+                (SELECT AVG(m.final_mastery_score)
+                 FROM mastery_scores m
+                 WHERE m.updated_at >= MAX(months.column2, CAST(strftime('%s', 'now', '-5 months') AS INTEGER))
+                 AND m.updated_at < months.column3) as avg_mastery
+               FROM (VALUES {', '.join(['(?, ?, ?)'] * len(months))}) months""",
+            tuple(value for month in months for value in month)
         )
         
-        # Subject-wise performance
-        subject_performance = execute_query(
-            f"""SELECT 
+        # Subject-wise performance (idx_mastery_subject_student covers it;
+        # the handful of subject rows are ordered in Python)
+        bundle.add(
+            'subject_performance',
+            """SELECT 
                 subject,
                 AVG(final_mastery_score) as avg_mastery,
                 COUNT(DISTINCT student_id) as student_count
                FROM mastery_scores
-               WHERE student_id IN ({','.join(['?']*len(student_ids))})
-               GROUP BY subject
-               ORDER BY avg_mastery DESC""",
-            tuple(student_ids)
+               GROUP BY subject"""
         )
         
-        # Engagement distribution
-        engagement_dist = execute_query(
-            f"""SELECT 
+        # Engagement distribution (per-student 30-day averages from the daily
+        # rollup; CROSS JOIN keeps students as the outer loop, so each one is
+        # a primary-key range and the groups come out in student order)
+        bundle.add(
+            'engagement_dist',
+            """SELECT 
                 CASE 
                     WHEN avg_eng >= 75 THEN 'high'
                     WHEN avg_eng >= 50 THEN 'medium'
@@ -99,18 +112,19 @@ def dashboard(current_user):
                 END as level,
                 COUNT(*) as count
                FROM (
-                   SELECT student_id, AVG(engagement_score) as avg_eng
-                   FROM engagement_logs
-                   WHERE student_id IN ({','.join(['?']*len(student_ids))})
-                   AND timestamp >= datetime('now', '-30 days')
-                   GROUP BY student_id
+                   SELECT s.student_id, CAST(SUM(d.score_sum) AS REAL) / SUM(d.score_count) as avg_eng
+                   FROM students s
+                   CROSS JOIN student_daily_engagement d ON d.student_id = s.student_id
+                   WHERE d.day_bucket >= ?
+                   GROUP BY s.student_id
                )
                GROUP BY level""",
-            tuple(student_ids)
+            (today_bucket() - 30,)
         )
         
         # Teacher usage patterns
-        teacher_usage = execute_query(
+        bundle.add(
+            'teacher_usage',
             """SELECT 
                 COUNT(*) as count,
                 CASE 
@@ -123,6 +137,25 @@ def dashboard(current_user):
                GROUP BY usage_level"""
         )
         
+        results = bundle.run()
+        total_students = results['roster']['total_students']
+        if total_students == 0:
+            return jsonify({"message": "No students in system"}), 200
+        
+        overall_mastery = results['overall_mastery']
+        avg_engagement = results['avg_engagement']
+        active_students = results['active_students']
+        teacher_stats = results['teacher_stats']
+        mastery_trend = sorted(
+            (t for t in results['mastery_trend'] if t['avg_mastery'] is not None),
+            key=lambda t: t['month']
+        )
+        subject_performance = sorted(
+            results['subject_performance'], key=lambda s: s['avg_mastery'], reverse=True
+        )
+        engagement_dist = results['engagement_dist']
+        teacher_usage = results['teacher_usage']
+        
         # Calculate confidence score based on multiple factors
         mastery_factor = (overall_mastery['avg_mastery'] or 0) / 100
         engagement_factor = (avg_engagement['avg_engagement'] or 0) / 100
@@ -257,6 +290,83 @@ def get_users(current_user):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def _teacher_exists(teacher_id):
+    return execute_query(
+        "SELECT 1 FROM users WHERE user_id = ? AND role = 'teacher'",
+        (teacher_id,),
+        fetch_one=True
+    ) is not None
+
+def _teacher_roster(teacher_id):
+    rows = execute_query(
+        """SELECT institution_id, grade, section
+           FROM teacher_classes
+           WHERE teacher_id = ?
+           ORDER BY institution_id, grade, section""",
+        (teacher_id,)
+    )
+    return [
+        {
+            "institution_id": r['institution_id'],
+            "grade": r['grade'],
+            "section": r['section']
+        } for r in rows
+    ]
+
+@admin_bp.route("/teachers/<teacher_id>/classes", methods=["GET"])
+@token_required
+@role_required(['admin'])
+def get_teacher_classes(current_user, teacher_id):
+    """Classes on a teacher's roster (the students their views are scoped to)"""
+    try:
+        if not _teacher_exists(teacher_id):
+            return jsonify({"error": "Teacher not found"}), 404
+        
+        return jsonify({"teacher_id": teacher_id, "classes": _teacher_roster(teacher_id)}), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@admin_bp.route("/teachers/<teacher_id>/classes", methods=["PUT"])
+@token_required
+@role_required(['admin'])
+def set_teacher_classes(current_user, teacher_id):
+    """
+    Replace a teacher's roster
+    
+    Body: {"classes": [{"institution_id": "INST001", "grade": 10, "section": "A"}, ...]}
+    The old roster is swapped for the new one in a single write; teacher
+    ETags cover the classes in scope, so cached views refresh on their own.
+    """
+    try:
+        if not _teacher_exists(teacher_id):
+            return jsonify({"error": "Teacher not found"}), 404
+        
+        classes = (request.get_json(silent=True) or {}).get('classes')
+        if not isinstance(classes, list):
+            return jsonify({"error": "classes must be a list"}), 400
+        
+        roster = set()
+        for c in classes:
+            try:
+                roster.add((str(c['institution_id']), int(c['grade']), str(c['section'])))
+            except (KeyError, TypeError, ValueError):
+                return jsonify({"error": "Each class needs institution_id, grade and section"}), 400
+        
+        execute_writes(
+            [("DELETE FROM teacher_classes WHERE teacher_id = ?", (teacher_id,))] +
+            [
+                ("""INSERT INTO teacher_classes (teacher_id, institution_id, grade, section)
+                    VALUES (?, ?, ?, ?)""", (teacher_id,) + row)
+                for row in sorted(roster)
+            ]
+        )
+        
+        return jsonify({"teacher_id": teacher_id, "classes": _teacher_roster(teacher_id)}), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @admin_bp.route("/reports", methods=["GET"])
 @token_required
 @role_required(['admin'])
@@ -294,3 +404,43 @@ def get_reports(current_user):
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+@admin_bp.route("/models", methods=["GET"])
+@token_required
+@role_required(['admin'])
+def get_models(current_user):
+    """ML registry versions, CURRENT, and the model version every worker serves"""
+    try:
+        return jsonify(registry_status()), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@admin_bp.route("/models/reload", methods=["POST"])
+@token_required
+@role_required(['admin'])
+def reload_model_version(current_user):
+    """
+    Hot-swap the ML models to a registry version (default: CURRENT)
+    
+    This worker loads and validates the version, then points CURRENT at
+    it; the other workers follow CURRENT within ML_REGISTRY_POLL_SECONDS
+    (see GET /models for each worker's state)
+    """
+    try:
+        version = (request.get_json(silent=True) or {}).get('version')
+        try:
+            started = reload_models(version)
+        except RegistryError as e:
+            return jsonify({"error": str(e)}), 404
+        
+        if not started:
+            return jsonify({"error": "A model load or reload is already running"}), 409
+        
+        return jsonify({
+            "message": "Model reload started",
+            "status": registry_status()
+        }), 202
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
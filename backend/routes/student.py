@@ -4,27 +4,21 @@ import os
 
 # Add relevant paths for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'ml', 'src'))
 
 from utils.auth import token_required
-from utils.db import execute_query
-from datetime import datetime, timedelta
+from utils.db import execute_query, execute_writes, QueryBundle
+from utils.cache import cached_response, invalidate_user
+from utils.versions import conditional_get
+from utils.timeutil import today_bucket, current_week_bucket, to_iso, to_sql_datetime, day_label, week_label
+from utils.ml import get_predictor, stored_mastery_prediction
 import random
 
-# Import ML Predictor
-try:
-    from predict import AMEPPredictor
-    ML_MODELS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'ml', 'models', '')
-    predictor = AMEPPredictor(models_path=ML_MODELS_PATH)
-    HAS_ML = True
-except Exception as e:
-    print(f"Warning: Could not initialize ML Predictor: {e}")
-    HAS_ML = False
-
 student_bp = Blueprint("student", __name__)
 
 @student_bp.route("/dashboard", methods=["GET"])
 @token_required
+@conditional_get("dashboard")
+@cached_response("dashboard")
 def dashboard(current_user):
     """Get comprehensive student dashboard data"""
     try:
@@ -40,19 +34,29 @@ def dashboard(current_user):
         if not student_profile:
             return jsonify({"error": "Student profile not found"}), 404
         
+        # Every dashboard panel is read from the same snapshot
+        bundle = QueryBundle()
+        
         # Get overall mastery score across all subjects
-        mastery_data = execute_query(
-            """SELECT AVG(final_mastery_score) as avg_mastery, 
-               COUNT(DISTINCT subject) as subject_count
-               FROM mastery_scores WHERE student_id = ?""",
+        bundle.add(
+            'mastery_data',
+            # Per-subject sums first: the index is already in subject order,
+            # so this needs no DISTINCT sorter
+            """SELECT CAST(SUM(score_sum) AS REAL) / SUM(score_count) as avg_mastery,
+               COUNT(*) as subject_count
+               FROM (SELECT SUM(final_mastery_score) as score_sum, COUNT(*) as score_count
+                     FROM mastery_scores WHERE student_id = ?
+                     GROUP BY subject)""",
             (student_profile['student_id'],),
             fetch_one=True
         )
         
         # Get subject-wise mastery
-        subject_mastery = execute_query(
+        bundle.add(
+            'subject_mastery',
+            # (student_id, subject, topic) is unique, so COUNT(*) counts topics
             """SELECT subject, AVG(final_mastery_score) as mastery, 
-               COUNT(DISTINCT topic) as topics_covered
+               COUNT(*) as topics_covered
                FROM mastery_scores 
                WHERE student_id = ? 
                GROUP BY subject
@@ -61,19 +65,21 @@ def dashboard(current_user):
         )
         
         # Get engagement metrics for last 30 days
-        engagement_data = execute_query(
-            """SELECT AVG(engagement_score) as avg_engagement,
-               SUM(duration_seconds) as total_time,
-               COUNT(*) as session_count
-               FROM engagement_logs 
+        bundle.add(
+            'engagement_data',
+            """SELECT CAST(SUM(score_sum) AS REAL) / SUM(score_count) as avg_engagement,
+               SUM(duration_sum) as total_time,
+               SUM(event_count) as session_count
+               FROM student_daily_engagement 
                WHERE student_id = ? 
-               AND timestamp >= datetime('now', '-30 days')""",
-            (student_profile['student_id'],),
+               AND day_bucket >= ?""",
+            (student_profile['student_id'], today_bucket() - 30),
             fetch_one=True
         )
         
         # Get recent quiz performance
-        recent_quizzes = execute_query(
+        bundle.add(
+            'recent_quizzes',
             """SELECT subject, topic, quiz_score, timestamp, difficulty_level
                FROM quiz_attempts 
                WHERE student_id = ? 
@@ -82,21 +88,24 @@ def dashboard(current_user):
             (student_profile['student_id'],)
         )
         
-        # Get weekly performance trend
-        weekly_performance = execute_query(
-            """SELECT strftime('%Y-%W', timestamp) as week, 
+        # Get weekly performance trend (from idx_quiz_student_week; grouping
+        # the daily rollup by week would need a temp B-tree)
+        bundle.add(
+            'weekly_performance',
+            """SELECT week_bucket, 
                AVG(quiz_score) as avg_score
                FROM quiz_attempts 
                WHERE student_id = ? 
-               AND timestamp >= datetime('now', '-8 weeks')
-               GROUP BY week
-               ORDER BY week DESC
+               AND week_bucket >= ?
+               GROUP BY week_bucket
+               ORDER BY week_bucket DESC
                LIMIT 8""",
-            (student_profile['student_id'],)
+            (student_profile['student_id'], current_week_bucket() - 8)
         )
         
         # Get project activity
-        project_data = execute_query(
+        bundle.add(
+            'project_data',
             """SELECT project_id, role_in_team, tasks_completed,
                peer_review_score, collaboration_score, 
                project_completion_pct, created_at
@@ -108,7 +117,8 @@ def dashboard(current_user):
         )
         
         # Get weak subjects for initial recommendations
-        weak_subjects = execute_query(
+        bundle.add(
+            'weak_subjects',
             """SELECT subject, topic, final_mastery_score
                FROM mastery_scores 
                WHERE student_id = ? 
@@ -118,11 +128,56 @@ def dashboard(current_user):
             (student_profile['student_id'],)
         )
         
+        # Mastery predictions precomputed by the batch scoring job
+        bundle.add(
+            'stored_predictions',
+            """SELECT subject, topic, predicted_mastery_score,
+               predicted_model_version, predicted_at
+               FROM mastery_scores
+               WHERE student_id = ?
+               AND predicted_mastery_score IS NOT NULL""",
+            (student_profile['student_id'],)
+        )
+        
+        # Get active days for the streak calculation
+        bundle.add(
+            'recent_engagement',
+            """SELECT day_bucket
+               FROM student_daily_engagement
+               WHERE student_id = ?
+               AND day_bucket >= ?
+               ORDER BY day_bucket DESC""",
+            (student_profile['student_id'], today_bucket() - 30)
+        )
+        
+        results = bundle.run()
+        mastery_data = results['mastery_data']
+        subject_mastery = results['subject_mastery']
+        engagement_data = results['engagement_data']
+        recent_quizzes = results['recent_quizzes']
+        weekly_performance = results['weekly_performance']
+        project_data = results['project_data']
+        weak_subjects = results['weak_subjects']
+        stored_predictions = {(p['subject'], p['topic']): p for p in results['stored_predictions']}
+        
         # ML-Powered Recommendations and Insights
         recommendations = []
         ai_insight = "Based on your recent activity, you are progressing well."
         
-        if HAS_ML:
+        # Next-session mastery for the latest quiz topic, from the batch job
+        # when its prediction is current
+        predicted_next = None
+        if recent_quizzes:
+            recent = recent_quizzes[0]
+            predicted_next = stored_mastery_prediction(
+                stored_predictions.get((recent['subject'], recent['topic'])),
+                recent['timestamp']
+            )
+            if predicted_next is not None:
+                ai_insight = f"Your predicted mastery for the next session is {predicted_next}%. Keep it up!"
+        
+        predictor = get_predictor()
+        if predictor is not None:
             try:
                 # Prepare data for ML prediction
                 ml_input = {
@@ -148,7 +203,7 @@ def dashboard(current_user):
                 })
                 
                 # Get a prediction for next mastery level
-                if recent_quizzes:
+                if recent_quizzes and predicted_next is None:
                     recent = recent_quizzes[0]
                     ml_input.update({
                         'quiz_score': recent['quiz_score'],
@@ -184,17 +239,7 @@ def dashboard(current_user):
             })
         
         # Calculate streak and engagement level
-        recent_engagement = execute_query(
-            """SELECT DATE(timestamp) as activity_date
-               FROM engagement_logs
-               WHERE student_id = ?
-               AND timestamp >= datetime('now', '-30 days')
-               GROUP BY DATE(timestamp)
-               ORDER BY activity_date DESC""",
-            (student_profile['student_id'],)
-        )
-        
-        streak = calculate_streak(recent_engagement)
+        streak = calculate_streak(results['recent_engagement'])
         
         response_data = {
             "profile": {
@@ -224,7 +269,7 @@ def dashboard(current_user):
             },
             "weekly_performance": [
                 {
-                    "week": w['week'],
+                    "week": week_label(w['week_bucket']),
                     "score": int(w['avg_score'])
                 } for w in reversed(weekly_performance)
             ],
@@ -234,7 +279,7 @@ def dashboard(current_user):
                     "topic": q['topic'],
                     "score": q['quiz_score'],
                     "difficulty": q['difficulty_level'],
-                    "date": q['timestamp']
+                    "date": to_iso(q['timestamp'])
                 } for q in recent_quizzes
             ],
             "projects": [
@@ -245,7 +290,7 @@ def dashboard(current_user):
                     "peer_score": p['peer_review_score'],
                     "collaboration": p['collaboration_score'],
                     "completion": p['project_completion_pct'],
-                    "date": p['created_at']
+                    "date": to_sql_datetime(p['created_at'])
                 } for p in project_data
             ],
             "recommendations": recommendations[:6]
@@ -257,19 +302,18 @@ def dashboard(current_user):
         print(f"Error in student dashboard: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
-def calculate_streak(engagement_dates):
-    """Calculate consecutive days streak"""
-    if not engagement_dates:
+def calculate_streak(engagement_days):
+    """Calculate consecutive days streak from day buckets (newest first)"""
+    if not engagement_days:
         return 0
     
     streak = 0
-    current_date = datetime.now().date()
+    current_day = today_bucket()
     
-    for record in engagement_dates:
-        activity_date = datetime.strptime(record['activity_date'], '%Y-%m-%d').date()
-        expected_date = current_date - timedelta(days=streak)
+    for record in engagement_days:
+        expected_day = current_day - streak
         
-        if activity_date == expected_date:
+        if record['day_bucket'] == expected_day:
             streak += 1
         else:
             break
@@ -278,6 +322,8 @@ def calculate_streak(engagement_dates):
 
 @student_bp.route("/analytics", methods=["GET"])
 @token_required
+@conditional_get("analytics")
+@cached_response("analytics")
 def analytics(current_user):
     """Get detailed analytics data for student"""
     try:
@@ -293,8 +339,11 @@ def analytics(current_user):
         if not student:
             return jsonify({"error": "Student not found"}), 404
         
+        bundle = QueryBundle()
+        
         # Get comprehensive mastery data
-        mastery_data = execute_query(
+        bundle.add(
+            'mastery_data',
             """SELECT AVG(final_mastery_score) as avg_mastery
                FROM mastery_scores WHERE student_id = ?""",
             (student['student_id'],),
@@ -302,7 +351,8 @@ def analytics(current_user):
         )
         
         # Subject-wise mastery with topics
-        subject_mastery = execute_query(
+        bundle.add(
+            'subject_mastery',
             """SELECT subject, topic, final_mastery_score, predicted_mastery_score,
                updated_at
                FROM mastery_scores 
@@ -312,57 +362,60 @@ def analytics(current_user):
         )
         
         # Engagement trends over time
-        engagement_trends = execute_query(
-            """SELECT DATE(timestamp) as date, 
-               AVG(engagement_score) as avg_engagement,
-               SUM(duration_seconds) as total_duration
-               FROM engagement_logs 
+        bundle.add(
+            'engagement_trends',
+            """SELECT day_bucket, 
+               CAST(score_sum AS REAL) / score_count as avg_engagement,
+               duration_sum as total_duration
+               FROM student_daily_engagement 
                WHERE student_id = ? 
-               AND timestamp >= datetime('now', '-30 days')
-               GROUP BY DATE(timestamp)
-               ORDER BY date""",
-            (student['student_id'],)
+               AND day_bucket >= ?
+               ORDER BY day_bucket""",
+            (student['student_id'], today_bucket() - 30)
         )
         
         # Quiz performance trends
-        quiz_trends = execute_query(
-            """SELECT DATE(timestamp) as date,
-               AVG(quiz_score) as avg_score,
-               COUNT(*) as quiz_count
-               FROM quiz_attempts 
+        bundle.add(
+            'quiz_trends',
+            """SELECT day_bucket,
+               CAST(score_sum AS REAL) / attempt_count as avg_score,
+               attempt_count as quiz_count
+               FROM student_daily_quiz 
                WHERE student_id = ? 
-               AND timestamp >= datetime('now', '-60 days')
-               GROUP BY DATE(timestamp)
-               ORDER BY date""",
-            (student['student_id'],)
+               AND day_bucket >= ?
+               ORDER BY day_bucket""",
+            (student['student_id'], today_bucket() - 60)
         )
         
         # Get weekly performance
-        weekly_performance = execute_query(
-            """SELECT strftime('%Y-%W', timestamp) as week,
+        bundle.add(
+            'weekly_performance',
+            """SELECT week_bucket,
                AVG(quiz_score) as avg_score,
                COUNT(*) as attempts
                FROM quiz_attempts 
                WHERE student_id = ? 
-               AND timestamp >= datetime('now', '-12 weeks')
-               GROUP BY week
-               ORDER BY week""",
-            (student['student_id'],)
+               AND week_bucket >= ?
+               GROUP BY week_bucket
+               ORDER BY week_bucket""",
+            (student['student_id'], current_week_bucket() - 12)
         )
         
         # Calculate engagement score and time
-        engagement_summary = execute_query(
-            """SELECT AVG(engagement_score) as score,
-               SUM(duration_seconds) as total_time
-               FROM engagement_logs 
+        bundle.add(
+            'engagement_summary',
+            """SELECT CAST(SUM(score_sum) AS REAL) / SUM(score_count) as score,
+               SUM(duration_sum) as total_time
+               FROM student_daily_engagement 
                WHERE student_id = ? 
-               AND timestamp >= datetime('now', '-30 days')""",
-            (student['student_id'],),
+               AND day_bucket >= ?""",
+            (student['student_id'], today_bucket() - 30),
             fetch_one=True
         )
 
         # Get project metrics for ML
-        project_metrics = execute_query(
+        bundle.add(
+            'project_metrics',
             """SELECT AVG(communication_score) as avg_comm,
                AVG(collaboration_score) as avg_collab,
                AVG(creativity_score) as avg_creat,
@@ -374,10 +427,20 @@ def analytics(current_user):
             (student['student_id'],),
             fetch_one=True
         )
-
+        
+        results = bundle.run()
+        mastery_data = results['mastery_data']
+        subject_mastery = results['subject_mastery']
+        engagement_trends = results['engagement_trends']
+        quiz_trends = results['quiz_trends']
+        weekly_performance = results['weekly_performance']
+        engagement_summary = results['engagement_summary']
+        project_metrics = results['project_metrics']
+        
         # Predict future engagement if possible
         predicted_engagement = None
-        if HAS_ML and engagement_summary and engagement_summary['score'] is not None:
+        predictor = get_predictor()
+        if predictor is not None and engagement_summary and engagement_summary['score'] is not None:
             try:
                 ml_input = {
                     'tasks_completed': project_metrics['total_tasks'] or 5,
@@ -408,7 +471,7 @@ def analytics(current_user):
                 "total_time_hours": round((engagement_summary['total_time'] or 0) / 3600, 1),
                 "trends": [
                     {
-                        "date": e['date'],
+                        "date": day_label(e['day_bucket']),
                         "score": int(e['avg_engagement'] or 0),
                         "duration": e['total_duration'] or 0
                     } for e in engagement_trends
@@ -416,14 +479,14 @@ def analytics(current_user):
             },
             "weekly_performance": [
                 {
-                    "week": w['week'],
+                    "week": week_label(w['week_bucket']),
                     "score": int(w['avg_score'] or 0),
                     "attempts": w['attempts'] or 0
                 } for w in weekly_performance
             ],
             "quiz_trends": [
                 {
-                    "date": q['date'],
+                    "date": day_label(q['day_bucket']),
                     "score": int(q['avg_score'] or 0),
                     "count": q['quiz_count'] or 0
                 } for q in quiz_trends
@@ -436,6 +499,8 @@ def analytics(current_user):
 
 @student_bp.route("/practice", methods=["GET"])
 @token_required
+@conditional_get("practice")
+@cached_response("practice")
 def practice(current_user):
     """Get practice recommendations and history"""
     try:
@@ -450,8 +515,11 @@ def practice(current_user):
         if not student:
             return jsonify({"error": "Student not found"}), 404
         
+        bundle = QueryBundle()
+        
         # Get weak areas for practice
-        weak_areas = execute_query(
+        bundle.add(
+            'weak_areas',
             """SELECT subject, topic, final_mastery_score
                FROM mastery_scores 
                WHERE student_id = ? 
@@ -462,7 +530,8 @@ def practice(current_user):
         )
         
         # Get strong areas for challenges
-        strong_areas = execute_query(
+        bundle.add(
+            'strong_areas',
             """SELECT subject, topic, final_mastery_score
                FROM mastery_scores 
                WHERE student_id = ? 
@@ -473,7 +542,8 @@ def practice(current_user):
         )
         
         # Get practice history from quiz attempts
-        practice_history = execute_query(
+        bundle.add(
+            'practice_history',
             """SELECT subject, topic, quiz_score, difficulty_level, timestamp
                FROM quiz_attempts 
                WHERE student_id = ? 
@@ -483,32 +553,55 @@ def practice(current_user):
         )
         
         # Calculate streak
-        recent_activity = execute_query(
-            """SELECT DATE(timestamp) as activity_date
-               FROM quiz_attempts
+        bundle.add(
+            'recent_activity',
+            """SELECT day_bucket
+               FROM student_daily_quiz
                WHERE student_id = ?
-               AND timestamp >= datetime('now', '-30 days')
-               GROUP BY DATE(timestamp)
-               ORDER BY activity_date DESC""",
-            (student['student_id'],)
+               AND day_bucket >= ?
+               ORDER BY day_bucket DESC""",
+            (student['student_id'], today_bucket() - 30)
         )
         
+        # Get mastery overview
+        bundle.add(
+            'mastery_overview',
+            """SELECT AVG(final_mastery_score) as overall
+               FROM mastery_scores WHERE student_id = ?""",
+            (student['student_id'],),
+            fetch_one=True
+        )
+        
+        # Get latest stats for ML
+        predictor = get_predictor()
+        if predictor is not None:
+            bundle.add(
+                'latest_stats',
+                """SELECT
+                       (SELECT AVG(final_mastery_score)
+                        FROM mastery_scores
+                        WHERE student_id = ?) as avg_mastery,
+                       (SELECT CAST(SUM(score_sum) AS REAL) / SUM(score_count)
+                        FROM student_daily_engagement
+                        WHERE student_id = ?) as avg_engagement""",
+                (student['student_id'], student['student_id']),
+                fetch_one=True
+            )
+        
+        results = bundle.run()
+        weak_areas = results['weak_areas']
+        strong_areas = results['strong_areas']
+        practice_history = results['practice_history']
+        recent_activity = results['recent_activity']
+        mastery_overview = results['mastery_overview']
+        
         streak = calculate_streak(recent_activity)
         
         # Get ML recommendations if available
         ai_recommendations = []
-        if HAS_ML:
+        if predictor is not None:
             try:
-                # Get latest stats for ML
-                latest_stats = execute_query(
-                    """SELECT AVG(final_mastery_score) as avg_mastery,
-                              AVG(engagement_score) as avg_engagement
-                       FROM mastery_scores m
-                       JOIN engagement_logs e ON m.student_id = e.student_id
-                       WHERE m.student_id = ?""",
-                    (student['student_id'],),
-                    fetch_one=True
-                )
+                latest_stats = results['latest_stats']
                 
                 ml_input = {
                     'mastery_score': latest_stats['avg_mastery'] or 60,
@@ -531,14 +624,6 @@ def practice(current_user):
             except Exception as ml_err:
                 print(f"ML Rec Error: {ml_err}")
 
-        # Get mastery overview
-        mastery_overview = execute_query(
-            """SELECT AVG(final_mastery_score) as overall
-               FROM mastery_scores WHERE student_id = ?""",
-            (student['student_id'],),
-            fetch_one=True
-        )
-        
         return jsonify({
             "profile": {
                 "name": student['student_name']
@@ -570,7 +655,7 @@ def practice(current_user):
                     "topic": p['topic'],
                     "score": p['quiz_score'],
                     "difficulty": p['difficulty_level'],
-                    "timestamp": p['timestamp']
+                    "timestamp": to_iso(p['timestamp'])
                 } for p in practice_history
             ],
             "streak_days": streak
@@ -582,6 +667,7 @@ def practice(current_user):
 
 @student_bp.route("/projects", methods=["GET"])
 @token_required
+@conditional_get("projects")
 def projects(current_user):
     """Get PBL project data"""
     try:
@@ -619,7 +705,7 @@ def projects(current_user):
                     "peer_score": p['peer_review_score'],
                     "collaboration": p['collaboration_score'],
                     "completion": p['project_completion_pct'],
-                    "created_at": p['created_at']
+                    "created_at": to_sql_datetime(p['created_at'])
                 } for p in project_data
             ]
         }), 200
@@ -630,6 +716,7 @@ def projects(current_user):
 
 @student_bp.route("/settings", methods=["GET"])
 @token_required
+@conditional_get("settings")
 def get_settings(current_user):
     """Get student settings and profile"""
     try:
@@ -670,27 +757,32 @@ def update_settings(current_user):
         student_id = current_user.get('user_id')
         data = request.get_json()
         
+        statements = []
+        
         # Update student profile
         if 'learning_pace' in data or 'preferred_learning_style' in data:
-            execute_query(
+            statements.append((
                 """UPDATE students 
                    SET learning_pace = COALESCE(?, learning_pace),
                        preferred_learning_style = COALESCE(?, preferred_learning_style)
                    WHERE user_id = ?""",
-                (data.get('learning_pace'), data.get('preferred_learning_style'), student_id),
-                commit=True
-            )
+                (data.get('learning_pace'), data.get('preferred_learning_style'), student_id)
+            ))
         
         # Update user info
         if 'full_name' in data or 'email' in data:
-            execute_query(
+            statements.append((
                 """UPDATE users 
                    SET full_name = COALESCE(?, full_name),
                        email = COALESCE(?, email)
                    WHERE user_id = ?""",
-                (data.get('full_name'), data.get('email'), student_id),
-                commit=True
-            )
+                (data.get('full_name'), data.get('email'), student_id)
+            ))
+        
+        # Both updates commit together on the writer thread
+        if statements:
+            execute_writes(statements)
+            invalidate_user(student_id)
         
         return jsonify({"message": "Settings updated successfully"}), 200
         
@@ -3,112 +3,165 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils.auth import token_required
-from utils.db import execute_query
+from utils.db import execute_query, QueryBundle
+from utils.scope import StudentScope
+from utils.versions import conditional_get, class_etag
+from utils.ml import get_predictor, stored_mastery_prediction
+from utils.timeutil import today_bucket, to_iso
 from datetime import datetime
 
 teacher_bp = Blueprint("teacher", __name__)
 
 @teacher_bp.route("/dashboard", methods=["GET"])
 @token_required
+@conditional_get("teacher_dashboard", etag_func=class_etag)
 def dashboard(current_user):
     """Get comprehensive teacher dashboard data"""
     try:
         teacher_id = current_user.get('user_id')
         teacher_subject = current_user.get('subject', 'Mathematics')
         
-        # Get all students (in a real system, filter by teacher's classes)
-        students = execute_query(
-            "SELECT student_id, student_name, grade, section FROM students ORDER BY grade, section"
-        )
+        # Only the teacher's own classes (teacher_classes roster)
+        scope = StudentScope(current_user)
+        rollup_filter, rollup_args = scope.class_filter('c')
+        student_filter, student_args = scope.class_filter('s')
         
-        student_ids = [s['student_id'] for s in students]
+        # Class/topic aggregates come from the trigger-maintained class
+        # rollups (see database/migrations/0005_class_rollups.sql)
+        bundle = QueryBundle()
         
-        if not student_ids:
-            return jsonify({"message": "No students found"}), 200
+        bundle.add(
+            'roster',
+            f"""SELECT COALESCE(SUM(student_count), 0) as total_students
+               FROM class_rollups c
+               WHERE {rollup_filter}""",
+            rollup_args,
+            fetch_one=True
+        )
         
         # Calculate class-wide mastery
-        class_mastery = execute_query(
-            f"""SELECT AVG(final_mastery_score) as avg_mastery
-               FROM mastery_scores 
-               WHERE student_id IN ({','.join(['?']*len(student_ids))})""",
-            tuple(student_ids),
+        bundle.add(
+            'class_mastery',
+            f"""SELECT CAST(SUM(mastery_sum) AS REAL) / SUM(mastery_count) as avg_mastery
+               FROM class_topic_rollups c
+               WHERE {rollup_filter}""",
+            rollup_args,
             fetch_one=True
         )
         
         # Calculate engagement index
-        engagement_index = execute_query(
-            f"""SELECT AVG(engagement_score) as avg_engagement
-               FROM engagement_logs 
-               WHERE student_id IN ({','.join(['?']*len(student_ids))})
-               AND timestamp >= datetime('now', '-30 days')""",
-            tuple(student_ids),
+        bundle.add(
+            'engagement_index',
+            f"""SELECT CAST(SUM(score_sum) AS REAL) / SUM(score_count) as avg_engagement
+               FROM class_daily_engagement c
+               WHERE {rollup_filter}
+               AND day_bucket >= ?""",
+            rollup_args + (today_bucket() - 30,),
             fetch_one=True
         )
         
-        # Find at-risk students (low mastery or low engagement)
-        at_risk_students = execute_query(
-            f"""SELECT 
-                s.student_id, s.student_name, s.grade, s.section,
-                COALESCE(AVG(m.final_mastery_score), 0) as avg_mastery,
-                COALESCE(AVG(e.engagement_score), 0) as avg_engagement
-               FROM students s
-               LEFT JOIN mastery_scores m ON s.student_id = m.student_id
-               LEFT JOIN engagement_logs e ON s.student_id = e.student_id 
-                   AND e.timestamp >= datetime('now', '-30 days')
-               WHERE s.student_id IN ({','.join(['?']*len(student_ids))})
-               GROUP BY s.student_id, s.student_name, s.grade, s.section
-               HAVING avg_mastery < 65 OR avg_engagement < 60
+        # Find at-risk students (low mastery or low engagement). Each average
+        # is a per-student indexed lookup (engagement from the daily rollup),
+        # so mastery rows and engagement logs are never joined to each other
+        bundle.add(
+            'at_risk_students',
+            f"""SELECT * FROM (
+                   SELECT 
+                    s.student_id, s.student_name, s.grade, s.section,
+                    COALESCE((
+                        SELECT AVG(m.final_mastery_score)
+                        FROM mastery_scores m
+                        WHERE m.student_id = s.student_id
+                    ), 0) as avg_mastery,
+                    COALESCE((
+                        SELECT CAST(SUM(d.score_sum) AS REAL) / SUM(d.score_count)
+                        FROM student_daily_engagement d
+                        WHERE d.student_id = s.student_id AND d.day_bucket >= ?
+                    ), 0) as avg_engagement
+                   FROM students s
+                   WHERE {student_filter}
+               )
+               WHERE avg_mastery < 65 OR avg_engagement < 60
                ORDER BY avg_mastery ASC
                LIMIT 10""",
-            tuple(student_ids)
+            (today_bucket() - 30,) + student_args
         )
         
         # Get topic-wise mastery breakdown
-        topic_mastery = execute_query(
+        bundle.add(
+            'topic_mastery',
             f"""SELECT 
                 topic, 
-                AVG(final_mastery_score) as avg_mastery,
-                COUNT(DISTINCT student_id) as student_count
-               FROM mastery_scores 
-               WHERE student_id IN ({','.join(['?']*len(student_ids))})
+                CAST(SUM(mastery_sum) AS REAL) / SUM(mastery_count) as avg_mastery,
+                SUM(mastery_count) as student_count
+               FROM class_topic_rollups c
+               WHERE {rollup_filter}
                GROUP BY topic
                ORDER BY avg_mastery ASC
                LIMIT 10""",
-            tuple(student_ids)
+            rollup_args
         )
         
-        # Get engagement distribution
-        engagement_distribution = execute_query(
-            f"""SELECT 
-                CASE 
-                    WHEN avg_eng >= 75 THEN 'high'
-                    WHEN avg_eng >= 50 THEN 'medium'
-                    ELSE 'low'
-                END as level,
-                COUNT(*) as count
+        # Get engagement distribution (per-student 30-day averages from the
+        # daily rollups; the window slides, so levels are bucketed on read).
+        # Each roster student's level is computed from their own index range,
+        # so only the three-row level grouping needs a sorter
+        bundle.add(
+            'engagement_distribution',
+            f"""SELECT level, COUNT(*) as count
                FROM (
-                   SELECT student_id, AVG(engagement_score) as avg_eng
-                   FROM engagement_logs
-                   WHERE student_id IN ({','.join(['?']*len(student_ids))})
-                   AND timestamp >= datetime('now', '-30 days')
-                   GROUP BY student_id
+                   SELECT (
+                       SELECT CASE
+                           WHEN CAST(SUM(d.score_sum) AS REAL) / SUM(d.score_count) >= 75 THEN 'high'
+                           WHEN CAST(SUM(d.score_sum) AS REAL) / SUM(d.score_count) >= 50 THEN 'medium'
+                           ELSE 'low'
+                       END
+                       FROM student_daily_engagement d
+                       WHERE d.student_id = s.student_id AND d.day_bucket >= ?
+                   ) as level
+                   FROM students s
+                   WHERE {student_filter}
+                   AND EXISTS (
+                       SELECT 1 FROM student_daily_engagement d
+                       WHERE d.student_id = s.student_id AND d.day_bucket >= ?
+                   )
                )
                GROUP BY level""",
-            tuple(student_ids)
+            (today_bucket() - 30,) + student_args + (today_bucket() - 30,)
         )
         
-        # Get recent quiz results
-        recent_quizzes = execute_query(
+        # Get recent quiz results. The class-wide newest 20 are among each
+        # student's own newest 20, so only those reach the final sort
+        bundle.add(
+            'recent_quizzes',
             f"""SELECT 
                 s.student_name, q.subject, q.topic, q.quiz_score, q.timestamp
-               FROM quiz_attempts q
-               JOIN students s ON q.student_id = s.student_id
-               WHERE q.student_id IN ({','.join(['?']*len(student_ids))})
+               FROM students s
+               JOIN quiz_attempts q ON q.student_id = s.student_id
+                AND q.timestamp >= COALESCE((
+                    SELECT q2.timestamp FROM quiz_attempts q2
+                    WHERE q2.student_id = s.student_id
+                    ORDER BY q2.timestamp DESC
+                    LIMIT 1 OFFSET 19
+                ), 0)
+               WHERE {student_filter}
                ORDER BY q.timestamp DESC
                LIMIT 20""",
-            tuple(student_ids)
+            student_args
         )
         
+        results = bundle.run()
+        total_students = results['roster']['total_students']
+        if not total_students:
+            return jsonify({"message": "No students found"}), 200
+        
+        class_mastery = results['class_mastery']
+        engagement_index = results['engagement_index']
+        at_risk_students = results['at_risk_students']
+        topic_mastery = results['topic_mastery']
+        engagement_distribution = results['engagement_distribution']
+        recent_quizzes = results['recent_quizzes']
+        
         # Generate AI insights
         insights = []
         
@@ -145,7 +198,6 @@ def dashboard(current_user):
         for dist in engagement_distribution:
             engagement_dist[dist['level']] = dist['count']
         
-        total_students = len(student_ids)
         engagement_percentages = {
             "high": round((engagement_dist['high'] / total_students * 100), 1) if total_students > 0 else 0,
             "medium": round((engagement_dist['medium'] / total_students * 100), 1) if total_students > 0 else 0,
@@ -185,7 +237,7 @@ def dashboard(current_user):
                     "subject": q['subject'],
                     "topic": q['topic'],
                     "score": q['quiz_score'],
-                    "date": q['timestamp']
+                    "date": to_iso(q['timestamp'])
                 } for q in recent_quizzes[:10]
             ],
             "ai_insights": insights
@@ -199,23 +251,36 @@ def dashboard(current_user):
 
 @teacher_bp.route("/classes", methods=["GET"])
 @token_required
+@conditional_get("teacher_classes", etag_func=class_etag)
 def get_classes(current_user):
     """Get teacher's classes with performance metrics"""
     try:
-        # Get classes with student count and average mastery
-        query = """
+        # Get classes with student count and average mastery. Topic sums are
+        # per roster class, each read from its own primary key range instead
+        # of grouping the whole class_topic_rollups table
+        class_filter, class_args = StudentScope(current_user).class_filter('c')
+        query = f"""
             SELECT 
-                s.grade, 
-                s.section, 
-                COUNT(DISTINCT s.student_id) as student_count,
-                ROUND(AVG(m.final_mastery_score), 1) as avg_mastery
-            FROM students s
-            LEFT JOIN mastery_scores m ON s.student_id = m.student_id
-            GROUP BY s.grade, s.section
-            ORDER BY s.grade, s.section
+                t.grade, 
+                t.section, 
+                SUM(t.student_count) as student_count,
+                ROUND(CAST(SUM(t.mastery_sum) AS REAL) / SUM(t.mastery_count), 1) as avg_mastery
+            FROM (
+                SELECT c.grade, c.section, c.student_count,
+                    (SELECT SUM(r.mastery_sum) FROM class_topic_rollups r
+                     WHERE r.institution_id = c.institution_id
+                     AND r.grade = c.grade AND r.section = c.section) as mastery_sum,
+                    (SELECT SUM(r.mastery_count) FROM class_topic_rollups r
+                     WHERE r.institution_id = c.institution_id
+                     AND r.grade = c.grade AND r.section = c.section) as mastery_count
+                FROM class_rollups c
+                WHERE {class_filter}
+            ) t
+            GROUP BY t.grade, t.section
+            ORDER BY t.grade, t.section
         """
         
-        classes = execute_query(query)
+        classes = execute_query(query, class_args)
         
         return jsonify({
             "classes": [
@@ -230,3 +295,148 @@ def get_classes(current_user):
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+@teacher_bp.route("/class-forecast", methods=["GET"])
+@token_required
+def class_forecast(current_user):
+    """Predicted mastery, engagement and task difficulty for every student in a section"""
+    try:
+        grade = request.args.get('grade', type=int)
+        section = request.args.get('section')
+        institution_id = request.args.get('institution_id')
+        
+        if grade is None or not section:
+            return jsonify({"error": "grade and section are required"}), 400
+        
+        predictor = get_predictor()
+        if predictor is None:
+            return jsonify({"error": "ML models are not available yet"}), 503
+        
+        class_filter, class_args = StudentScope(current_user).class_filter('s')
+        institution_clause = "AND s.institution_id = ?" if institution_id else ""
+        
+        # One row of model inputs per student, aggregated per table
+        students = execute_query(
+            f"""SELECT 
+                s.student_id, s.student_name, s.grade, s.section,
+                s.baseline_proficiency, s.learning_pace, s.preferred_learning_style,
+                (SELECT AVG(m.final_mastery_score) FROM mastery_scores m
+                 WHERE m.student_id = s.student_id) as avg_mastery,
+                q.quiz_score, q.time_taken_seconds, q.number_of_attempts,
+                q.difficulty_level, q.subject, q.topic, q.timestamp as attempted_at,
+                pm.predicted_mastery_score, pm.predicted_model_version, pm.predicted_at,
+                p.total_tasks, p.avg_peer, p.avg_comm, p.avg_collab,
+                p.avg_creat, p.avg_completion, p.role_in_team
+               FROM students s
+               LEFT JOIN quiz_attempts q ON q.attempt_id = (
+                   SELECT q2.attempt_id FROM quiz_attempts q2
+                   WHERE q2.student_id = s.student_id
+                   ORDER BY q2.timestamp DESC
+                   LIMIT 1
+               )
+               LEFT JOIN mastery_scores pm ON pm.student_id = s.student_id
+                   AND pm.subject = q.subject AND pm.topic = q.topic
+               LEFT JOIN (
+                   SELECT 
+                    pa.student_id,
+                    SUM(pa.tasks_completed) as total_tasks,
+                    AVG(pa.peer_review_score) as avg_peer,
+                    AVG(pa.communication_score) as avg_comm,
+                    AVG(pa.collaboration_score) as avg_collab,
+                    AVG(pa.creativity_score) as avg_creat,
+                    AVG(pa.project_completion_pct) as avg_completion,
+                    (SELECT pr.role_in_team FROM project_activity pr
+                     WHERE pr.student_id = pa.student_id
+                     ORDER BY pr.created_at DESC LIMIT 1) as role_in_team
+                   FROM project_activity pa
+                   JOIN students ps ON ps.student_id = pa.student_id
+                   WHERE ps.grade = ? AND ps.section = ?
+                   GROUP BY pa.student_id
+               ) p ON p.student_id = s.student_id
+               WHERE s.grade = ? AND s.section = ?
+               {institution_clause}
+               AND {class_filter}
+               ORDER BY s.student_name""",
+            (grade, section, grade, section) + ((institution_id,) if institution_id else ()) + class_args
+        )
+        
+        if not students:
+            return jsonify({"message": "No students found"}), 200
+        
+        # Stored predictions from the batch scoring job where current; only
+        # the remaining students' mastery is predicted live
+        predicted_mastery = [stored_mastery_prediction(s, s['attempted_at']) for s in students]
+        mastery_inputs = []
+        engagement_inputs = []
+        recommendation_inputs = []
+        for s, stored in zip(students, predicted_mastery):
+            profile = {
+                'grade': s['grade'],
+                'learning_pace': s['learning_pace'],
+                'preferred_learning_style': s['preferred_learning_style'],
+                'baseline_proficiency': s['baseline_proficiency'] or 70
+            }
+            recommendation_inputs.append(dict(
+                profile,
+                avg_mastery_score=s['avg_mastery'] or 0,
+                total_tasks=s['total_tasks'] or 0,
+                avg_peer_score=s['avg_peer'] or 0
+            ))
+            if stored is None:
+                mastery_inputs.append(dict(
+                    profile,
+                    quiz_score=s['quiz_score'] or 0,
+                    time_taken_seconds=s['time_taken_seconds'] or 300,
+                    number_of_attempts=s['number_of_attempts'] or 1,
+                    previous_mastery_score=s['avg_mastery'] or 0,
+                    subject=s['subject'],
+                    topic=s['topic'],
+                    difficulty_level=s['difficulty_level']
+                ))
+            engagement_inputs.append(dict(
+                profile,
+                tasks_completed=s['total_tasks'] or 5,
+                peer_review_score=s['avg_peer'] or 4.0,
+                communication_score=s['avg_comm'] or 4.0,
+                collaboration_score=s['avg_collab'] or 4.0,
+                creativity_score=s['avg_creat'] or 4.0,
+                project_completion_pct=s['avg_completion'] or 75.0,
+                role_in_team=s['role_in_team'] or 'Member'
+            ))
+        
+        # One model call per model for the whole section
+        live_mastery = iter(predictor.predict_mastery_batch(mastery_inputs))
+        predicted_mastery = [next(live_mastery) if stored is None else stored for stored in predicted_mastery]
+        predicted_engagement = predictor.predict_engagement_batch(engagement_inputs)
+        recommendations = predictor.recommend_tasks_batch(recommendation_inputs)
+        
+        forecast = []
+        difficulty_mix = {"easy": 0, "medium": 0, "hard": 0}
+        for s, mastery, engagement, rec in zip(students, predicted_mastery, predicted_engagement, recommendations):
+            difficulty_mix[rec['difficulty_level']] += 1
+            forecast.append({
+                "student_id": s['student_id'],
+                "name": s['student_name'],
+                "current_mastery": int(s['avg_mastery'] or 0),
+                "predicted_mastery": mastery if s['quiz_score'] is not None else None,
+                "predicted_engagement": engagement,
+                "recommended_difficulty": rec['difficulty_level'],
+                "confidence": rec['confidence']
+            })
+        
+        scored_mastery = [f['predicted_mastery'] for f in forecast if f['predicted_mastery'] is not None]
+        
+        return jsonify({
+            "class": {"grade": grade, "section": section},
+            "summary": {
+                "student_count": len(forecast),
+                "avg_predicted_mastery": round(sum(scored_mastery) / len(scored_mastery), 1) if scored_mastery else None,
+                "avg_predicted_engagement": round(sum(predicted_engagement) / len(predicted_engagement), 1),
+                "difficulty_mix": difficulty_mix
+            },
+            "students": forecast
+        }), 200
+        
+    except Exception as e:
+        print(f"Error in class forecast: {str(e)}")
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,136 @@
+"""
+In-process response cache for per-user read endpoints
+
+Rendered JSON bodies are kept in a bounded LRU with a TTL, keyed by
+(user_id, endpoint). Write paths call invalidate_user() after committing so
+the next view is recomputed. Under conditional_get (utils/versions.py) each
+entry also remembers the data ETag it was rendered for and is only served
+while that ETag is current, which catches writes made by other processes;
+otherwise the TTL bounds that staleness.
+"""
+import os
+import sys
+import time
+import threading
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, g
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from config import Config
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU of rendered responses with per-entry expiry
+
+    Entries are stored as bytes rather than Response objects so every hit
+    builds a fresh response that after_request hooks (CORS) can decorate.
+    """
+
+    def __init__(self, max_entries=1024, ttl=60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'invalidations': 0
+        }
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return value
+
+    def set(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def invalidate_user(self, user_id):
+        """Drop every cached endpoint for one user"""
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == user_id]
+            for key in stale:
+                del self._entries[key]
+            self._stats['invalidations'] += len(stale)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        stats['max_entries'] = self.max_entries
+        stats['ttl'] = self.ttl
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+response_cache = ResponseCache(
+    max_entries=Config.RESPONSE_CACHE_SIZE,
+    ttl=Config.RESPONSE_CACHE_TTL
+)
+
+
+def cached_response(endpoint):
+    """
+    Decorator for routes taking current_user (place below token_required
+    and conditional_get); caches successful (200) JSON responses per user
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(current_user, *args, **kwargs):
+            key = (current_user.get('user_id'), endpoint)
+            etag = g.get('data_etag')
+            cached = response_cache.get(key)
+            if cached is not None:
+                body, status, cached_etag = cached
+                if cached_etag == etag:
+                    return current_app.response_class(body, status=status, mimetype='application/json')
+
+            rv = f(current_user, *args, **kwargs)
+            response, status = rv if isinstance(rv, tuple) else (rv, 200)
+            if status == 200 and hasattr(response, 'get_data'):
+                response_cache.set(key, (response.get_data(), status, etag))
+            return rv
+        return decorated
+    return decorator
+
+
+def invalidate_user(user_id):
+    """Call after a write that changes what a user's cached views show"""
+    return response_cache.invalidate_user(user_id)
+
+
+def cache_metrics():
+    return response_cache.metrics()
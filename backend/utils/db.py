@@ -1,6 +1,13 @@
 import sqlite3
 import os
 import sys
+import queue
+import threading
+import time
+import atexit
+import pathlib
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from contextlib import contextmanager
 
 # Ensure we can import config from parent directory
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -10,15 +17,520 @@ if parent_dir not in sys.path:
 
 from config import Config
 
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes free within the timeout"""
+
+
+class WriteTimeout(Exception):
+    """
+    Raised when the writer thread does not commit a write in time
+
+    `pending` is False when the job was cancelled before the writer picked
+    it up, so it will never be applied. It is True when the job was already
+    part of a batch that had not finished: that write may still commit.
+    """
+
+    def __init__(self, message, pending=False):
+        super().__init__(message)
+        self.pending = pending
+
+
+class ConnectionPool:
+    """
+    Bounded pool of reusable SQLite connections
+
+    Connections are created lazily up to `size` and handed back out in LIFO
+    order, so a warm connection (and its prepared statement cache) is reused
+    by the next request instead of being torn down. With `read_only` the
+    connections are opened with `mode=ro` and can never take the write lock.
+    """
+
+    def __init__(self, database, size=8, timeout=5.0, cached_statements=256,
+                 health_check_interval=30.0, read_only=False):
+        self.database = database
+        self.read_only = read_only
+        self.size = size
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self.health_check_interval = health_check_interval
+
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self._created = 0
+        self._stats = {
+            'connections_created': 0,
+            'connections_discarded': 0,
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'timeouts': 0
+        }
+
+    def _connect(self):
+        if self.read_only:
+            target = pathlib.Path(self.database).resolve().as_uri() + '?mode=ro'
+        else:
+            target = self.database
+        conn = sqlite3.connect(
+            target,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+            uri=self.read_only
+        )
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _is_healthy(self, conn):
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._created -= 1
+            self._stats['connections_discarded'] += 1
+
+    def acquire(self):
+        """Check a connection out of the pool, creating one if there is room"""
+        while True:
+            try:
+                conn, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                conn = None
+                with self._lock:
+                    if self._created < self.size:
+                        self._created += 1
+                        create = True
+                    else:
+                        create = False
+
+                if create:
+                    try:
+                        conn = self._connect()
+                    except Exception:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+                    with self._lock:
+                        self._stats['connections_created'] += 1
+                        self._stats['checkouts'] += 1
+                    return conn
+
+                # Pool exhausted - wait for another request to release one
+                started = time.perf_counter()
+                try:
+                    conn, last_used = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._stats['timeouts'] += 1
+                    raise PoolTimeout(
+                        f"No database connection available after {self.timeout}s "
+                        f"(pool size {self.size})"
+                    )
+                waited = time.perf_counter() - started
+                with self._lock:
+                    self._stats['waits'] += 1
+                    self._stats['wait_time_total'] += waited
+                    self._stats['wait_time_max'] = max(self._stats['wait_time_max'], waited)
+
+            # Only ping connections that have been idle for a while
+            if time.monotonic() - last_used >= self.health_check_interval and not self._is_healthy(conn):
+                self._discard(conn)
+                continue
+
+            with self._lock:
+                self._stats['checkouts'] += 1
+            return conn
+
+    def release(self, conn):
+        """Return a connection to the pool, rolling back any open transaction"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+
+        try:
+            self._idle.put_nowait((conn, time.monotonic()))
+        except queue.Full:
+            self._discard(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def metrics(self):
+        """Snapshot of pool usage counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = self.size
+            stats['open_connections'] = self._created
+        stats['idle_connections'] = self._idle.qsize()
+        stats['wait_time_avg'] = (
+            stats['wait_time_total'] / stats['waits'] if stats['waits'] else 0.0
+        )
+        return stats
+
+    def close_all(self):
+        """Close every idle connection (checked-out ones close on release)"""
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+
+def _is_insert(query):
+    return query.lstrip().upper().startswith(('INSERT', 'REPLACE'))
+
+
+class SingleWriter:
+    """
+    Dedicated writer thread that owns the only read-write connection
+
+    Request threads enqueue their statements and block on a Future. The
+    writer drains whatever is queued (up to `batch_size` jobs), runs each job
+    inside its own savepoint and commits the whole batch once, so a burst of
+    logins costs one fsync instead of one per UPDATE. A failing job only
+    rolls back its own savepoint; the rest of the batch still commits.
+    """
+
+    _STOP = object()
+
+    def __init__(self, database, batch_size=64, commit_timeout=10.0, busy_timeout=5.0):
+        self.database = database
+        self.batch_size = batch_size
+        self.commit_timeout = commit_timeout
+        self.busy_timeout = busy_timeout
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stats = {
+            'batches': 0,
+            'statements': 0,
+            'failed_statements': 0,
+            'max_batch_size': 0,
+            'commit_time_total': 0.0
+        }
+
+        self._conn = self._connect()
+        self._thread = threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.database,
+            timeout=self.busy_timeout,
+            isolation_level=None,
+            check_same_thread=False
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def submit(self, statements):
+        """
+        Queue a job and wait for it to be committed
+        params:
+            statements: list of (query, args) run atomically as one job
+        returns:
+            lastrowid of the final statement, or None if it was not an INSERT
+        raises:
+            WriteTimeout: if the job is not committed within commit_timeout.
+                A job still waiting in the queue is cancelled first and never
+                runs; one the writer already started may still commit
+                (WriteTimeout.pending is True)
+        """
+        future = Future()
+        self._queue.put((statements, future))
+        try:
+            return future.result(timeout=self.commit_timeout)
+        except FutureTimeout:
+            if future.cancel():
+                raise WriteTimeout(
+                    f"Write not committed within {self.commit_timeout}s (cancelled, not applied)"
+                )
+            raise WriteTimeout(
+                f"Write not committed within {self.commit_timeout}s (still in progress, may commit)",
+                pending=True
+            )
+
+    def _next_batch(self):
+        job = self._queue.get()
+        if job is self._STOP:
+            return None
+        batch = [job]
+        while len(batch) < self.batch_size:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is self._STOP:
+                self._queue.put(job)
+                break
+            batch.append(job)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                break
+            # Skip jobs whose caller already gave up; the rest can no longer
+            # be cancelled, so a timed-out caller knows they may still land
+            batch = [job for job in batch if job[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                self._commit_batch(batch)
+            except Exception as e:
+                # Never let one bad batch kill the only writer: fail whatever
+                # it left unresolved and keep serving the queue
+                print(f"Database Error: writer batch failed: {e}")
+                self._abort_batch(batch, e)
+        self._conn.close()
+
+    def _abort_batch(self, batch, error):
+        if self._conn.in_transaction:
+            try:
+                self._conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    def _commit_batch(self, batch):
+        started = time.perf_counter()
+        results = []
+        cursor = self._conn.cursor()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+        except sqlite3.Error as e:
+            cursor.close()
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        failed = 0
+        for statements, future in batch:
+            cursor.execute("SAVEPOINT job")
+            try:
+                lastrowid = None
+                for query, args in statements:
+                    cursor.execute(query, args)
+                    # The connection-wide rowid belongs to whichever job
+                    # inserted last; only report it for this job's INSERT
+                    lastrowid = cursor.lastrowid if _is_insert(query) else None
+                cursor.execute("RELEASE job")
+                results.append((future, lastrowid))
+            except Exception as e:
+                cursor.execute("ROLLBACK TO job")
+                cursor.execute("RELEASE job")
+                failed += 1
+                future.set_exception(e)
+
+        try:
+            cursor.execute("COMMIT")
+        except sqlite3.Error as e:
+            try:
+                cursor.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            for future, _ in results:
+                future.set_exception(e)
+            return
+        finally:
+            cursor.close()
+
+        for future, last_id in results:
+            future.set_result(last_id)
+
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._stats['batches'] += 1
+            self._stats['statements'] += sum(len(s) for s, _ in batch)
+            self._stats['failed_statements'] += failed
+            self._stats['max_batch_size'] = max(self._stats['max_batch_size'], len(batch))
+            self._stats['commit_time_total'] += elapsed
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['queued'] = self._queue.qsize()
+        stats['avg_batch_size'] = (
+            stats['statements'] / stats['batches'] if stats['batches'] else 0.0
+        )
+        return stats
+
+    def stop(self):
+        self._queue.put(self._STOP)
+        self._thread.join(timeout=self.commit_timeout)
+
+
+_pool = None
+_writer = None
+_pool_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    # A forked worker must not share the parent's SQLite connections, and
+    # the writer thread does not survive the fork; both are rebuilt lazily
+    global _pool, _writer, _pool_lock
+    _pool = None
+    _writer = None
+    _pool_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_writer():
+    """Return the process-wide writer thread, starting it on first use"""
+    global _writer
+    if _writer is None:
+        with _pool_lock:
+            if _writer is None:
+                _writer = SingleWriter(
+                    Config.DATABASE_PATH,
+                    batch_size=Config.DB_WRITE_BATCH_SIZE,
+                    commit_timeout=Config.DB_WRITE_TIMEOUT,
+                    busy_timeout=Config.DB_POOL_TIMEOUT
+                )
+                atexit.register(_writer.stop)
+    return _writer
+
+
+def get_pool():
+    """Return the process-wide read-only connection pool, creating it on first use"""
+    global _pool
+    if _pool is None:
+        # The writer switches the database to WAL before any reader opens it
+        get_writer()
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    Config.DATABASE_PATH,
+                    size=Config.DB_POOL_SIZE,
+                    timeout=Config.DB_POOL_TIMEOUT,
+                    cached_statements=Config.DB_STATEMENT_CACHE_SIZE,
+                    health_check_interval=Config.DB_POOL_HEALTH_CHECK_INTERVAL,
+                    read_only=True
+                )
+    return _pool
+
+
+def init_db():
+    """Create the database or bring its schema up to date"""
+    from utils.migrations import migrate
+    return migrate(Config.DATABASE_PATH)
+
+
+def pool_metrics():
+    return {
+        'readers': get_pool().metrics(),
+        'writer': get_writer().metrics()
+    }
+
+
+@contextmanager
 def get_db():
-    conn = sqlite3.connect(Config.DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Borrow a pooled read-only connection for the duration of a `with` block"""
+    with get_pool().connection() as conn:
+        yield conn
+
+
+def execute_writes(statements):
+    """
+    Commit several statements atomically through the writer thread
+    params:
+        statements: list of (query, args) tuples
+    returns:
+        lastrowid of the final statement, or None if it was not an INSERT
+    """
+    try:
+        return get_writer().submit(list(statements))
+    except Exception as e:
+        print(f"Database Error: {e}")
+        raise e
+
+
+class QueryBundle:
+    """
+    Named set of read queries that run together in one connection
+
+    Usage:
+        results = (QueryBundle()
+                   .add('mastery', "SELECT ...", (student_id,), fetch_one=True)
+                   .add('quizzes', "SELECT ...", (student_id,))
+                   .run())
+    """
+
+    def __init__(self):
+        self.queries = {}
+
+    def add(self, name, query, args=(), fetch_one=False):
+        self.queries[name] = (query, args, fetch_one)
+        return self
+
+    def run(self):
+        return execute_many_reads(self.queries)
+
+
+def execute_many_reads(queries):
+    """
+    Run a set of read queries in one connection and one read snapshot
+    params:
+        queries: QueryBundle or dict of name -> (query, args, fetch_one)
+    returns:
+        dict of name -> dict (fetch_one) or list of dicts
+    """
+    if isinstance(queries, QueryBundle):
+        queries = queries.queries
+
+    results = {}
+    with get_db() as conn:
+        cursor = conn.cursor()
+        try:
+            # A deferred transaction pins every query to the same WAL snapshot
+            cursor.execute("BEGIN DEFERRED")
+            for name, (query, args, fetch_one) in queries.items():
+                cursor.execute(query, args)
+                if fetch_one:
+                    row = cursor.fetchone()
+                    results[name] = dict(row) if row else None
+                else:
+                    results[name] = [dict(row) for row in cursor.fetchall()]
+            conn.commit()
+            return results
+
+        except Exception as e:
+            print(f"Database Error: {e}")
+            raise e
+        finally:
+            cursor.close()
+
 
 def execute_query(query, args=(), fetch_one=False, commit=False):
     """
     Execute a secure SQL query
-    params: 
+    params:
         query: SQL string
         args: tuple of parameters
         fetch_one: return single result (dict)
@@ -28,25 +540,23 @@ def execute_query(query, args=(), fetch_one=False, commit=False):
         dict if fetch_one=True
         list of dicts otherwise
     """
-    conn = get_db()
-    cursor = conn.cursor()
-    try:
-        cursor.execute(query, args)
-        
-        if commit:
-            conn.commit()
-            last_id = cursor.lastrowid
-            return last_id
-        
-        if fetch_one:
-            row = cursor.fetchone()
-            return dict(row) if row else None
-            
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows]
-        
-    except Exception as e:
-        print(f"Database Error: {e}")
-        raise e
-    finally:
-        conn.close()
+    if commit:
+        return execute_writes([(query, args)])
+
+    with get_db() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query, args)
+
+            if fetch_one:
+                row = cursor.fetchone()
+                return dict(row) if row else None
+
+            rows = cursor.fetchall()
+            return [dict(row) for row in rows]
+
+        except Exception as e:
+            print(f"Database Error: {e}")
+            raise e
+        finally:
+            cursor.close()
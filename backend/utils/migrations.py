@@ -0,0 +1,112 @@
+"""
+Versioned schema migrations for the SQLite database
+
+Migrations live in database/migrations as NNNN_description.sql and are
+applied in version order, each inside its own transaction. Applied
+versions are recorded in the schema_migrations table.
+
+Usage (from the backend directory):
+    python -m utils.migrations            apply pending migrations
+    python -m utils.migrations --status   list applied/pending migrations
+"""
+import os
+import re
+import sys
+import sqlite3
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from config import Config
+
+MIGRATIONS_PATH = os.path.join(os.path.dirname(parent_dir), 'database', 'migrations')
+
+_FILENAME = re.compile(r'^(\d+)_(\w+)\.sql$')
+
+
+def discover_migrations(migrations_path=MIGRATIONS_PATH):
+    """Return [(version, name, path)] sorted by version"""
+    migrations = []
+    for filename in os.listdir(migrations_path):
+        match = _FILENAME.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(migrations_path, filename)))
+    migrations.sort()
+
+    versions = [m[0] for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Duplicate migration versions in {migrations_path}")
+    return migrations
+
+
+def _ensure_table(conn):
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS schema_migrations (
+               version INTEGER PRIMARY KEY,
+               name TEXT NOT NULL,
+               applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+           )"""
+    )
+
+
+def applied_versions(conn):
+    _ensure_table(conn)
+    return {row[0] for row in conn.execute("SELECT version FROM schema_migrations")}
+
+
+def migrate(db_path=None, migrations_path=MIGRATIONS_PATH, target=None):
+    """
+    Apply every pending migration up to `target` (all by default)
+    returns:
+        list of (version, name) that were applied
+    """
+    db_path = db_path or Config.DATABASE_PATH
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    applied = []
+    try:
+        done = applied_versions(conn)
+        for version, name, path in discover_migrations(migrations_path):
+            if version in done or (target is not None and version > target):
+                continue
+
+            with open(path, 'r') as f:
+                sql = f.read()
+
+            # DDL is transactional in SQLite, so a failed migration leaves no trace
+            try:
+                conn.executescript(
+                    "BEGIN;\n" + sql +
+                    f"\nINSERT INTO schema_migrations (version, name) VALUES ({version}, '{name}');\nCOMMIT;"
+                )
+            except sqlite3.Error as e:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise RuntimeError(f"Migration {version:04d}_{name} failed: {e}") from e
+
+            print(f"Applied migration {version:04d}_{name}")
+            applied.append((version, name))
+    finally:
+        conn.close()
+    return applied
+
+
+def status(db_path=None, migrations_path=MIGRATIONS_PATH):
+    """Return [(version, name, is_applied)] for every known migration"""
+    db_path = db_path or Config.DATABASE_PATH
+    conn = sqlite3.connect(db_path)
+    try:
+        done = applied_versions(conn)
+    finally:
+        conn.close()
+    return [(version, name, version in done) for version, name, _ in discover_migrations(migrations_path)]
+
+
+if __name__ == "__main__":
+    if '--status' in sys.argv:
+        for version, name, is_applied in status():
+            print(f"{version:04d}_{name}: {'applied' if is_applied else 'pending'}")
+    else:
+        applied = migrate()
+        print(f"{len(applied)} migration(s) applied to {Config.DATABASE_PATH}")
@@ -0,0 +1,393 @@
+"""
+Shared ML predictor for the route modules
+
+Loading the predictor imports numpy/pandas/sklearn and unpickles the tree
+ensembles, so it is kept out of the app import graph. Depending on
+Config.ML_LOAD_MODE the predictor is
+    background  warmed on a daemon thread started by app.py (default)
+    lazy        loaded on a background thread by the first request needing it
+    eager       loaded synchronously at startup (e.g. before forking workers)
+Routes call get_predictor() and fall back to their rule-based output while
+it returns None.
+
+New model versions from the registry (ml/models/registry) are swapped into
+the running predictor by reload_models(), which loads and validates them on
+a background thread while requests keep using the active set.
+
+With several worker processes, the registry's CURRENT pointer is what they
+agree on: a reload handled by one worker moves CURRENT once the version is
+active there, and every worker checks CURRENT every
+Config.ML_REGISTRY_POLL_SECONDS (on a watcher thread, and before serving
+ML output) and hot-swaps itself when it names another version. Each worker writes its state to a
+status file so registry_status() can report all of them.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import threading
+
+BACKEND_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_PATH not in sys.path:
+    sys.path.append(BACKEND_PATH)
+
+from config import Config
+
+ML_SRC_PATH = os.path.join(os.path.dirname(BACKEND_PATH), 'ml', 'src')
+if ML_SRC_PATH not in sys.path:
+    sys.path.append(ML_SRC_PATH)
+
+ML_MODELS_PATH = os.path.join(Config.ML_MODELS_PATH, '')
+
+# Standard library only, so importing it keeps numpy/sklearn out of startup
+from model_registry import CURRENT_FILE, REGISTRY_DIR, current_version, list_versions, load_manifest, set_current
+
+ML_REGISTRY_PATH = os.path.join(ML_MODELS_PATH, REGISTRY_DIR)
+ML_WORKER_STATUS_PATH = Config.ML_WORKER_STATUS_PATH or os.path.join(ML_REGISTRY_PATH, '.workers')
+
+_predictor = None
+_state = 'idle'  # idle -> loading -> ready | failed
+_error = None
+_load_seconds = None
+_lock = threading.Lock()
+_loaded = threading.Event()
+_reload = {'state': 'idle', 'requested_version': None, 'error': None, 'started_at': None, 'finished_at': None}
+
+# CURRENT as last seen by this process, and the process that reports a
+# status file (None until it serves; a preloading master never does)
+_follow = {'checked_at': 0.0, 'mtime_ns': None}
+_worker_pid = None
+
+
+def _reset_after_fork():
+    # A loader thread running in the parent does not exist in a forked
+    # worker; let the worker start its own load instead of waiting forever
+    global _state, _lock, _loaded, _worker_pid
+    _lock = threading.Lock()
+    _worker_pid = None
+    _follow.update(checked_at=0.0, mtime_ns=None)
+    if _state == 'loading':
+        _state = 'idle'
+        _loaded = threading.Event()
+    if _reload['state'] == 'running':
+        _reload.update(state='idle')
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def create_predictor(version=None, prediction_cache_size=None):
+    """A new AMEPPredictor configured from Config (not the shared one)"""
+    from predict import AMEPPredictor
+    from inference_policy import InferencePolicy
+    if prediction_cache_size is None:
+        prediction_cache_size = Config.ML_PREDICTION_CACHE_SIZE
+    return AMEPPredictor(
+        models_path=ML_MODELS_PATH,
+        prediction_cache_size=prediction_cache_size,
+        version=version,
+        inference_policy=InferencePolicy(
+            n_jobs=Config.ML_INFERENCE_N_JOBS,
+            chunk_rows=Config.ML_BATCH_CHUNK_ROWS,
+            max_workers=Config.ML_BATCH_WORKERS
+        ),
+        flat_trees=Config.ML_FLAT_TREES
+    )
+
+
+def _load(version=None):
+    global _predictor, _state, _error, _load_seconds
+    started = time.perf_counter()
+    try:
+        _predictor = create_predictor(version)
+        _error = None
+        _state = 'ready'
+        print(f"ML predictor ready in {time.perf_counter() - started:.2f}s")
+    except Exception as e:
+        _error = str(e)
+        _state = 'failed'
+        print(f"Warning: Could not initialize ML Predictor: {e}")
+    finally:
+        _load_seconds = round(time.perf_counter() - started, 3)
+        _loaded.set()
+        _write_worker_status()
+
+
+def start_loading(background=True):
+    """Begin loading the predictor once; later calls are no-ops"""
+    global _state
+    with _lock:
+        if _state != 'idle':
+            return
+        _state = 'loading'
+
+    if background:
+        threading.Thread(target=_load, name='ml-loader', daemon=True).start()
+    else:
+        _load()
+
+
+def get_predictor():
+    """The loaded predictor, or None while it is loading or unavailable"""
+    if _predictor is None and _state == 'idle':
+        start_loading()
+    follow_current()
+    return _predictor
+
+
+def wait_until_ready(timeout=None):
+    """Block until loading finished; True if a predictor is available"""
+    if _state == 'idle':
+        start_loading()
+    _loaded.wait(timeout)
+    return _predictor is not None
+
+
+def ml_ready():
+    return _predictor is not None
+
+
+def ml_version():
+    """Model version the responses are computed with (None without ML)"""
+    follow_current()
+    return _predictor.model_version if _predictor is not None else None
+
+
+def stored_mastery_prediction(row, attempted_at=None):
+    """
+    Mastery prediction written by the batch scoring job (utils/scoring.py)
+
+    row needs predicted_mastery_score, predicted_model_version and
+    predicted_at. The stored score is used unless it predates the latest
+    quiz attempt or was computed by another model than the active one.
+
+    Returns:
+        int | None: None if a live prediction is needed
+    """
+    if row is None or row['predicted_mastery_score'] is None:
+        return None
+    if attempted_at is not None and (row['predicted_at'] or 0) < attempted_at:
+        return None
+    predictor = _predictor
+    if predictor is not None and row['predicted_model_version'] != predictor.model_version:
+        return None
+    return row['predicted_mastery_score']
+
+
+def reload_models(version=None):
+    """
+    Start a background hot-swap to a registry version (default: CURRENT)
+
+    A named version becomes CURRENT once it is active, so restarts keep it.
+    If the predictor never loaded, this retries the initial load instead.
+
+    Returns:
+        bool: False if a load or reload is already running
+
+    Raises:
+        RegistryError: if the version is not in the registry
+    """
+    global _state
+    if version:
+        load_manifest(ML_REGISTRY_PATH, version)
+
+    with _lock:
+        if _state == 'loading' or _reload['state'] == 'running':
+            return False
+        _reload.update(state='running', requested_version=version, error=None,
+                       started_at=time.time(), finished_at=None)
+        initial = _predictor is None
+        if initial:
+            _state = 'loading'
+            _loaded.clear()
+
+    threading.Thread(target=_run_reload, args=(version, initial), name='ml-reload', daemon=True).start()
+    return True
+
+
+def _run_reload(version, initial):
+    _write_worker_status()
+    try:
+        if initial:
+            _load(version)
+            if _predictor is None:
+                raise RuntimeError(_error)
+        else:
+            _predictor.reload(version)
+        # Rewriting CURRENT (even unchanged) makes every other worker check
+        # it again: they move to this version, or retry a failed reload
+        if version or current_version(ML_REGISTRY_PATH):
+            set_current(ML_REGISTRY_PATH, version or _predictor.model_version)
+        _reload.update(state='succeeded', finished_at=time.time())
+    except Exception as e:
+        print(f"Model reload failed: {e}")
+        _reload.update(state='failed', error=str(e), finished_at=time.time())
+    _write_worker_status()
+
+
+def follow_current():
+    """
+    Start a background reload if CURRENT changed since this process last
+    looked and names a version other than the active one. Cheap enough for
+    every request: one stat() per ML_REGISTRY_POLL_SECONDS.
+    """
+    if _worker_pid != os.getpid():
+        register_worker()
+    now = time.monotonic()
+    if now - _follow['checked_at'] < Config.ML_REGISTRY_POLL_SECONDS:
+        return
+    _follow['checked_at'] = now
+
+    try:
+        mtime_ns = os.stat(os.path.join(ML_REGISTRY_PATH, CURRENT_FILE)).st_mtime_ns
+    except OSError:
+        return
+    if mtime_ns == _follow['mtime_ns']:
+        return
+    _follow['mtime_ns'] = mtime_ns
+
+    # The initial load reads CURRENT itself
+    if _state in ('idle', 'loading'):
+        _follow['mtime_ns'] = None
+        return
+    current = current_version(ML_REGISTRY_PATH)
+    if current is None or (_predictor is not None and _predictor.model_version == current):
+        return
+    if not reload_models():
+        # This worker is busy with another reload; look again next time
+        _follow['mtime_ns'] = None
+
+
+def register_worker():
+    """
+    Report this process in the worker status files and start its CURRENT
+    watcher (called in every gunicorn worker after the fork, and by the
+    first request otherwise)
+    """
+    global _worker_pid
+    _worker_pid = os.getpid()
+    _write_worker_status()
+    threading.Thread(target=_watch_current, name='ml-registry-watch', daemon=True).start()
+
+
+def _watch_current():
+    # Workers that serve no ML requests still follow CURRENT
+    while True:
+        time.sleep(Config.ML_REGISTRY_POLL_SECONDS)
+        try:
+            follow_current()
+        except Exception as e:
+            print(f"Warning: Model registry check failed: {e}")
+
+
+def unregister_worker(pid=None):
+    """Drop a worker's status file (gunicorn calls this when one exits)"""
+    try:
+        os.remove(_worker_status_file(pid or os.getpid()))
+    except OSError:
+        pass
+
+
+def _worker_status_file(pid, host=None):
+    return os.path.join(ML_WORKER_STATUS_PATH, f'{host or socket.gethostname()}-{pid}.json')
+
+
+def _write_worker_status():
+    # Only serving processes report, and only with a registry to follow
+    if _worker_pid != os.getpid() or not os.path.isdir(ML_REGISTRY_PATH):
+        return
+    status = {
+        'pid': _worker_pid,
+        'host': socket.gethostname(),
+        'state': _state,
+        'model_version': _predictor.model_version if _predictor is not None else None,
+        'error': _error,
+        'reload': dict(_reload),
+        'updated_at': time.time()
+    }
+    try:
+        os.makedirs(ML_WORKER_STATUS_PATH, exist_ok=True)
+        path = _worker_status_file(_worker_pid)
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(status, f)
+        os.replace(f'{path}.tmp', path)
+    except OSError as e:
+        print(f"Warning: Could not write ML worker status: {e}")
+
+
+def worker_statuses():
+    """Every worker's last reported state; files of dead local workers are removed"""
+    host = socket.gethostname()
+    statuses = []
+    try:
+        names = sorted(os.listdir(ML_WORKER_STATUS_PATH))
+    except OSError:
+        return statuses
+    for name in names:
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(ML_WORKER_STATUS_PATH, name)) as f:
+                status = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if status.get('host') == host and not _pid_alive(status.get('pid')):
+            unregister_worker(status.get('pid'))
+            continue
+        statuses.append(status)
+    return statuses
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, TypeError):
+        return pid is not None
+    return True
+
+
+def registry_status():
+    """
+    Registry versions, CURRENT, and what every worker process serves; the
+    active model and last reload are those of the worker answering
+    """
+    active = _predictor.active_model_info() if _predictor is not None else None
+    current = current_version(ML_REGISTRY_PATH)
+    workers = worker_statuses()
+
+    versions = []
+    for version in list_versions(ML_REGISTRY_PATH):
+        manifest = load_manifest(ML_REGISTRY_PATH, version)
+        versions.append({
+            "version": version,
+            "created_at": manifest.get('created_at'),
+            "metrics": manifest.get('metrics')
+        })
+
+    return {
+        "active": active,
+        "current": current,
+        "versions": versions,
+        "reload": dict(_reload),
+        "worker_pid": os.getpid(),
+        "workers": workers,
+        # Every reporting worker serves the version CURRENT names
+        "converged": bool(workers) and all(w['model_version'] == current for w in workers)
+    }
+
+
+def ml_status():
+    """Load state and prediction cache counters for /api/health"""
+    return {
+        "state": _state,
+        "ready": _predictor is not None,
+        "model_version": ml_version(),
+        "error": _error,
+        "load_seconds": _load_seconds,
+        "inference": _predictor.inference_policy.describe() if _predictor is not None else None,
+        "prediction_cache": _predictor.prediction_cache_stats() if _predictor is not None else None
+    }
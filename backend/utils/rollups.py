@@ -0,0 +1,105 @@
+"""
+Backfill/rebuild commands for the rollup tables
+
+Rollups are kept current by triggers (see database/migrations); this module
+rebuilds them from the raw rows, e.g. after a bulk import that bypassed the
+triggers or to repair drift.
+
+Usage (from the backend directory):
+    python -m utils.rollups                  rebuild every rollup table
+    python -m utils.rollups student_daily_quiz
+"""
+import os
+import sys
+import time
+import sqlite3
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from config import Config
+
+REBUILD_STATEMENTS = {
+    'student_daily_engagement': [
+        "DELETE FROM student_daily_engagement",
+        """INSERT INTO student_daily_engagement
+           SELECT student_id, day_bucket, COUNT(*), COUNT(engagement_score),
+                  COALESCE(SUM(engagement_score), 0), MIN(engagement_score),
+                  MAX(engagement_score), COALESCE(SUM(duration_seconds), 0)
+           FROM engagement_logs
+           GROUP BY student_id, day_bucket"""
+    ],
+    'student_daily_quiz': [
+        "DELETE FROM student_daily_quiz",
+        """INSERT INTO student_daily_quiz
+           SELECT student_id, day_bucket, COUNT(*), SUM(quiz_score),
+                  MIN(quiz_score), MAX(quiz_score)
+           FROM quiz_attempts
+           GROUP BY student_id, day_bucket"""
+    ],
+    'class_rollups': [
+        "DELETE FROM class_rollups",
+        """INSERT INTO class_rollups
+           SELECT institution_id, grade, section, COUNT(*)
+           FROM students
+           GROUP BY institution_id, grade, section"""
+    ],
+    'class_topic_rollups': [
+        "DELETE FROM class_topic_rollups",
+        """INSERT INTO class_topic_rollups
+           SELECT s.institution_id, s.grade, s.section, m.subject, m.topic,
+                  SUM(m.final_mastery_score), COUNT(*)
+           FROM mastery_scores m
+           JOIN students s ON s.student_id = m.student_id
+           GROUP BY s.institution_id, s.grade, s.section, m.subject, m.topic"""
+    ],
+    'class_daily_engagement': [
+        "DELETE FROM class_daily_engagement",
+        """INSERT INTO class_daily_engagement
+           SELECT s.institution_id, s.grade, s.section, e.day_bucket, COUNT(*),
+                  COUNT(e.engagement_score), COALESCE(SUM(e.engagement_score), 0)
+           FROM engagement_logs e
+           JOIN students s ON s.student_id = e.student_id
+           GROUP BY s.institution_id, s.grade, s.section, e.day_bucket"""
+    ]
+}
+
+
+def rebuild_rollups(db_path=None, tables=None):
+    """
+    Recompute rollup tables from the raw event tables in one transaction
+    returns:
+        dict of table -> row count after the rebuild
+    """
+    db_path = db_path or Config.DATABASE_PATH
+    tables = tables or list(REBUILD_STATEMENTS)
+    unknown = set(tables) - set(REBUILD_STATEMENTS)
+    if unknown:
+        raise ValueError(f"Unknown rollup table(s): {', '.join(sorted(unknown))}")
+
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    counts = {}
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for table in tables:
+                for statement in REBUILD_STATEMENTS[table]:
+                    conn.execute(statement)
+                counts[table] = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+    return counts
+
+
+if __name__ == "__main__":
+    started = time.perf_counter()
+    counts = rebuild_rollups(tables=sys.argv[1:] or None)
+    for table, count in counts.items():
+        print(f"{table}: {count} rows")
+    print(f"Rebuilt {len(counts)} rollup table(s) in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,63 @@
+"""
+Row scoping for the teacher and admin views
+
+A StudentScope turns the current user into SQL fragments that restrict a
+query to the students that user may see. Fragments are subqueries/joins
+over the teacher_classes roster, so the number of bound parameters stays
+constant no matter how many students are in scope.
+"""
+
+
+class StudentScope:
+    """
+    Students visible to a user
+        admin   -> every student
+        teacher -> students in the classes listed in teacher_classes
+        other   -> nobody
+    """
+
+    def __init__(self, current_user):
+        self.user_id = current_user.get('user_id')
+        self.role = current_user.get('role')
+
+    @property
+    def is_global(self):
+        return self.role == 'admin'
+
+    def class_filter(self, alias):
+        """
+        Predicate on a row carrying institution_id/grade/section columns
+        (students, class_* rollups), e.g. class_filter('s')
+        returns:
+            (sql, args)
+        """
+        if self.is_global:
+            return "1 = 1", ()
+        if self.role != 'teacher':
+            return "0 = 1", ()
+        return (
+            f"""({alias}.institution_id, {alias}.grade, {alias}.section) IN (
+                   SELECT institution_id, grade, section
+                   FROM teacher_classes WHERE teacher_id = ?)""",
+            (self.user_id,)
+        )
+
+    def student_filter(self, column):
+        """
+        Predicate on a student_id column, e.g. student_filter('m.student_id')
+        returns:
+            (sql, args)
+        """
+        if self.is_global:
+            return "1 = 1", ()
+        if self.role != 'teacher':
+            return "0 = 1", ()
+        return (
+            f"""{column} IN (
+                   SELECT s.student_id
+                   FROM teacher_classes tc
+                   JOIN students s ON s.institution_id = tc.institution_id
+                       AND s.grade = tc.grade AND s.section = tc.section
+                   WHERE tc.teacher_id = ?)""",
+            (self.user_id,)
+        )
@@ -0,0 +1,171 @@
+"""
+Batch scoring job for mastery predictions
+
+Scores every (student, subject, topic) row of mastery_scores with the
+mastery model and stores the result in predicted_mastery_score, together
+with the model version and the time it was computed, so request paths read
+a precomputed prediction instead of running the model (see
+utils.ml.stored_mastery_prediction). Meant to run nightly, e.g. from cron.
+
+Rows are streamed by mastery_id in chunks: each chunk is one query joining
+the student profile and the latest quiz attempt on the topic, one
+vectorized model call and one short write transaction, so the job never
+holds a long read snapshot or blocks the API's writer for long. Rows
+without a quiz attempt on their topic have no prediction (NULL).
+
+Usage (from the backend directory):
+    python -m utils.scoring                      score with the CURRENT model
+    python -m utils.scoring --chunk-rows 2000 --version v20250101-120000
+"""
+import os
+import sys
+import time
+import sqlite3
+import argparse
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from config import Config
+
+CHUNK_QUERY = """
+    SELECT m.mastery_id, m.subject, m.topic, m.final_mastery_score,
+           m.predicted_mastery_score,
+           s.grade, s.baseline_proficiency, s.learning_pace, s.preferred_learning_style,
+           q.quiz_score, q.time_taken_seconds, q.number_of_attempts, q.difficulty_level
+    FROM mastery_scores m
+    JOIN students s ON s.student_id = m.student_id
+    LEFT JOIN quiz_attempts q ON q.attempt_id = (
+        SELECT q2.attempt_id FROM quiz_attempts q2
+        WHERE q2.student_id = m.student_id
+          AND q2.subject = m.subject AND q2.topic = m.topic
+        ORDER BY q2.timestamp DESC
+        LIMIT 1
+    )
+    WHERE m.mastery_id > ?
+    ORDER BY m.mastery_id
+    LIMIT ?
+"""
+
+# Only rows whose score changed rewrite predicted_mastery_score, which is
+# what bumps the student's data version (and so their ETags)
+UPDATE_SCORE = """
+    UPDATE mastery_scores
+    SET predicted_mastery_score = ?, predicted_model_version = ?, predicted_at = ?
+    WHERE mastery_id = ?
+"""
+UPDATE_STAMP = """
+    UPDATE mastery_scores
+    SET predicted_model_version = ?, predicted_at = ?
+    WHERE mastery_id = ?
+"""
+
+
+def mastery_input(row):
+    """Mastery model input for one chunk row (same fields as the class forecast)"""
+    return {
+        'grade': row['grade'],
+        'learning_pace': row['learning_pace'],
+        'preferred_learning_style': row['preferred_learning_style'],
+        'baseline_proficiency': row['baseline_proficiency'] or 70,
+        'quiz_score': row['quiz_score'],
+        'time_taken_seconds': row['time_taken_seconds'] or 300,
+        'number_of_attempts': row['number_of_attempts'] or 1,
+        'previous_mastery_score': row['final_mastery_score'],
+        'subject': row['subject'],
+        'topic': row['topic'],
+        'difficulty_level': row['difficulty_level']
+    }
+
+
+def score_mastery(db_path=None, chunk_rows=None, version=None, predictor=None):
+    """
+    Predict and store mastery for every mastery_scores row
+    returns:
+        dict of row counts, phase timings and rows/sec
+    """
+    from utils.ml import create_predictor
+
+    db_path = db_path or Config.DATABASE_PATH
+    chunk_rows = max(1, int(chunk_rows or Config.ML_SCORING_CHUNK_ROWS))
+
+    started = time.perf_counter()
+    # The job's rows are all distinct, so a prediction cache would only churn
+    predictor = predictor or create_predictor(version, prediction_cache_size=0)
+    model_version = predictor.model_version
+    load_seconds = time.perf_counter() - started
+
+    stats = {'rows': 0, 'scored': 0, 'changed': 0, 'chunks': 0, 'model_version': model_version}
+    timings = {'read': 0.0, 'predict': 0.0, 'write': 0.0}
+
+    conn = sqlite3.connect(db_path, timeout=Config.DB_WRITE_TIMEOUT, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    try:
+        last_id = 0
+        while True:
+            t0 = time.perf_counter()
+            predicted_at = time.time()
+            rows = conn.execute(CHUNK_QUERY, (last_id, chunk_rows)).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1]['mastery_id']
+            t1 = time.perf_counter()
+
+            with_quiz = [row for row in rows if row['quiz_score'] is not None]
+            scores = predictor.predict_mastery_batch([mastery_input(row) for row in with_quiz])
+            predictions = dict(zip((row['mastery_id'] for row in with_quiz), (int(round(s)) for s in scores)))
+            t2 = time.perf_counter()
+
+            changed, unchanged = [], []
+            for row in rows:
+                score = predictions.get(row['mastery_id'])
+                if score != row['predicted_mastery_score']:
+                    changed.append((score, model_version, predicted_at, row['mastery_id']))
+                else:
+                    unchanged.append((model_version, predicted_at, row['mastery_id']))
+
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(UPDATE_SCORE, changed)
+                conn.executemany(UPDATE_STAMP, unchanged)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            t3 = time.perf_counter()
+
+            stats['rows'] += len(rows)
+            stats['scored'] += len(with_quiz)
+            stats['changed'] += len(changed)
+            stats['chunks'] += 1
+            timings['read'] += t1 - t0
+            timings['predict'] += t2 - t1
+            timings['write'] += t3 - t2
+    finally:
+        conn.close()
+
+    elapsed = time.perf_counter() - started
+    scoring_seconds = elapsed - load_seconds
+    stats.update(
+        load_seconds=round(load_seconds, 3),
+        seconds=round(elapsed, 3),
+        rows_per_second=round(stats['rows'] / scoring_seconds, 1) if scoring_seconds > 0 else None,
+        **{f'{phase}_seconds': round(seconds, 3) for phase, seconds in timings.items()}
+    )
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score mastery_scores rows with the mastery model")
+    parser.add_argument('--chunk-rows', type=int, default=None,
+                        help=f"rows per read/predict/write chunk (default {Config.ML_SCORING_CHUNK_ROWS})")
+    parser.add_argument('--version', default=None, help="registry model version (default CURRENT)")
+    args = parser.parse_args()
+
+    stats = score_mastery(chunk_rows=args.chunk_rows, version=args.version)
+    print(f"Scored {stats['scored']} of {stats['rows']} rows with model {stats['model_version']} "
+          f"({stats['changed']} changed) in {stats['chunks']} chunk(s)")
+    print(f"{stats['rows_per_second']} rows/s; load {stats['load_seconds']}s, read {stats['read_seconds']}s, "
+          f"predict {stats['predict_seconds']}s, write {stats['write_seconds']}s, total {stats['seconds']}s")
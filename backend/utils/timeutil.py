@@ -0,0 +1,84 @@
+"""
+Helpers for the integer epoch time columns
+
+Event times are stored as UTC epoch seconds (REAL, sub-second precision
+for quiz/engagement events) with generated integer buckets:
+    day_bucket  = timestamp / 86400               (days since 1970-01-01)
+    week_bucket = (timestamp / 86400 + 3) / 7     (Monday-based weeks)
+These helpers compute matching cutoffs, turn buckets back into labels and
+render times in the text formats the API returned before the migration.
+"""
+import time
+from datetime import datetime, timezone, timedelta
+
+SECONDS_PER_DAY = 86400
+
+
+def now_epoch():
+    return int(time.time())
+
+
+def epoch_days_ago(days):
+    """Epoch second exactly `days` days before now"""
+    return now_epoch() - days * SECONDS_PER_DAY
+
+
+def day_bucket(epoch):
+    return int(epoch) // SECONDS_PER_DAY
+
+
+def week_bucket(epoch):
+    return (int(epoch) // SECONDS_PER_DAY + 3) // 7
+
+
+def today_bucket():
+    return day_bucket(now_epoch())
+
+
+def current_week_bucket():
+    return week_bucket(now_epoch())
+
+
+def to_iso(epoch):
+    """
+    Epoch seconds -> 'YYYY-MM-DDTHH:MM:SS.ffffff' in UTC (None stays None)
+
+    Same shape as the legacy datetime.isoformat() strings: no zone suffix,
+    microseconds kept (and omitted when zero).
+    """
+    if epoch is None:
+        return None
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).replace(tzinfo=None).isoformat()
+
+
+def to_sql_datetime(epoch):
+    """Epoch seconds -> 'YYYY-MM-DD HH:MM:SS' in UTC, the CURRENT_TIMESTAMP format"""
+    if epoch is None:
+        return None
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def month_ranges(count):
+    """
+    [(label, start, end)] for the current UTC month and the `count - 1`
+    before it, oldest first: 'YYYY-MM' with epoch bounds [start, end)
+    """
+    today = datetime.now(timezone.utc)
+    year, month = today.year, today.month
+    ranges = []
+    for _ in range(count):
+        start = datetime(year, month, 1, tzinfo=timezone.utc)
+        end = datetime(year + month // 12, month % 12 + 1, 1, tzinfo=timezone.utc)
+        ranges.append((start.strftime('%Y-%m'), int(start.timestamp()), int(end.timestamp())))
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return ranges[::-1]
+
+
+def day_label(bucket):
+    """day_bucket -> 'YYYY-MM-DD'"""
+    return (datetime(1970, 1, 1) + timedelta(days=bucket)).strftime('%Y-%m-%d')
+
+
+def week_label(bucket):
+    """week_bucket -> 'YYYY-WW' of the week's Monday (strftime %W numbering)"""
+    return (datetime(1970, 1, 1) + timedelta(days=bucket * 7 - 3)).strftime('%Y-%W')
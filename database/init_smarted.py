@@ -1,22 +1,21 @@
-import sqlite3
 import os
+import sys
 
-def init_db():
-    db_path = 'c:/Users/SAGAR/OneDrive/Desktop/smart_Ed/database/smarted.db'
-    schema_path = 'c:/Users/SAGAR/OneDrive/Desktop/smart_Ed/database/schema.sql'
+DATABASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(os.path.dirname(DATABASE_DIR), 'backend'))
+
+from utils.migrations import migrate
+
+def init_db(reset=True):
+    db_path = os.path.join(DATABASE_DIR, 'smarted.db')
     
-    if os.path.exists(db_path):
+    if reset and os.path.exists(db_path):
         os.remove(db_path)
         print(f"Removed existing {db_path}")
 
-    conn = sqlite3.connect(db_path)
-    with open(schema_path, 'r') as f:
-        schema = f.read()
-        conn.executescript(schema)
-    
-    conn.commit()
-    conn.close()
-    print(f"Initialized {db_path} with schema.")
+    applied = migrate(db_path)
+    print(f"Initialized {db_path} with {len(applied)} migration(s).")
 
 if __name__ == "__main__":
-    init_db()
+    # --upgrade keeps the existing data and only applies pending migrations
+    init_db(reset='--upgrade' not in sys.argv)
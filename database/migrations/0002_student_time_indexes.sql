@@ -0,0 +1,25 @@
+-- Composite indexes for per-student, time-ordered range scans
+-- Routes filter on student_id and then range/sort on a time column, so the
+-- time column is the second key; the trailing columns make the common
+-- aggregates index-only.
+
+CREATE INDEX IF NOT EXISTS idx_quiz_student_time
+    ON quiz_attempts(student_id, timestamp, quiz_score);
+
+CREATE INDEX IF NOT EXISTS idx_engagement_student_time
+    ON engagement_logs(student_id, timestamp, engagement_score, duration_seconds);
+
+CREATE INDEX IF NOT EXISTS idx_project_student_created
+    ON project_activity(student_id, created_at);
+
+CREATE INDEX IF NOT EXISTS idx_mastery_student_score
+    ON mastery_scores(student_id, final_mastery_score);
+
+CREATE INDEX IF NOT EXISTS idx_mastery_student_subject_score
+    ON mastery_scores(student_id, subject, final_mastery_score DESC);
+
+-- Superseded by the composite indexes above (same leading column)
+DROP INDEX IF EXISTS idx_student_id;
+DROP INDEX IF EXISTS idx_engagement_student;
+DROP INDEX IF EXISTS idx_project_student;
+DROP INDEX IF EXISTS idx_mastery_student;
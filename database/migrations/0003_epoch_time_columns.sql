@@ -0,0 +1,148 @@
+-- Epoch time columns with generated day/week buckets
+-- Event times become UTC epoch seconds. day_bucket is days since the epoch
+-- and week_bucket counts Monday-based weeks (1970-01-01 was a Thursday,
+-- hence the +3), so daily/weekly trends group on an indexed integer
+-- instead of evaluating DATE()/strftime() per row.
+--
+-- Quiz/engagement timestamps are REAL so the microseconds of the legacy
+-- ISO strings survive (recent-quiz ordering depends on them). Those strings
+-- carry no zone and are read as UTC as stored: no 'utc'/'localtime'
+-- modifier, which would shift them by the offset of whichever machine runs
+-- the migration. The whole seconds are parsed separately from the fraction
+-- because strftime('%s') rounds to milliseconds. created_at/updated_at came
+-- from CURRENT_TIMESTAMP (whole UTC seconds) and stay INTEGER.
+
+-- Quiz Attempts
+CREATE TABLE quiz_attempts_new (
+    attempt_id TEXT PRIMARY KEY,
+    student_id TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    quiz_id TEXT NOT NULL,
+    quiz_score INTEGER NOT NULL CHECK(quiz_score >= 0 AND quiz_score <= 100),
+    time_taken_seconds INTEGER NOT NULL,
+    number_of_attempts INTEGER NOT NULL,
+    difficulty_level TEXT CHECK(difficulty_level IN ('easy', 'medium', 'hard')),
+    previous_mastery_score INTEGER DEFAULT 0,
+    timestamp REAL NOT NULL,
+    day_bucket INTEGER GENERATED ALWAYS AS (CAST(timestamp AS INTEGER) / 86400) STORED,
+    week_bucket INTEGER GENERATED ALWAYS AS ((CAST(timestamp AS INTEGER) / 86400 + 3) / 7) STORED,
+    FOREIGN KEY (student_id) REFERENCES students(student_id) ON DELETE CASCADE
+);
+
+INSERT INTO quiz_attempts_new (
+    attempt_id, student_id, subject, topic, quiz_id, quiz_score, time_taken_seconds,
+    number_of_attempts, difficulty_level, previous_mastery_score, timestamp
+)
+SELECT
+    attempt_id, student_id, subject, topic, quiz_id, quiz_score, time_taken_seconds,
+    number_of_attempts, difficulty_level, previous_mastery_score,
+    CAST(strftime('%s', substr(timestamp, 1, 19)) AS INTEGER)
+        + CASE WHEN substr(timestamp, 20, 1) = '.' THEN CAST('0' || substr(timestamp, 20) AS REAL) ELSE 0.0 END
+FROM quiz_attempts;
+
+DROP TABLE quiz_attempts;
+ALTER TABLE quiz_attempts_new RENAME TO quiz_attempts;
+
+-- Engagement Logs
+CREATE TABLE engagement_logs_new (
+    log_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    student_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    activity_type TEXT NOT NULL,
+    duration_seconds INTEGER,
+    interaction_count INTEGER DEFAULT 0,
+    timestamp REAL NOT NULL,
+    engagement_score INTEGER CHECK(engagement_score >= 0 AND engagement_score <= 100),
+    day_bucket INTEGER GENERATED ALWAYS AS (CAST(timestamp AS INTEGER) / 86400) STORED,
+    week_bucket INTEGER GENERATED ALWAYS AS ((CAST(timestamp AS INTEGER) / 86400 + 3) / 7) STORED,
+    FOREIGN KEY (student_id) REFERENCES students(student_id) ON DELETE CASCADE
+);
+
+INSERT INTO engagement_logs_new (
+    log_id, student_id, session_id, activity_type, duration_seconds,
+    interaction_count, timestamp, engagement_score
+)
+SELECT
+    log_id, student_id, session_id, activity_type, duration_seconds,
+    interaction_count,
+    CAST(strftime('%s', substr(timestamp, 1, 19)) AS INTEGER)
+        + CASE WHEN substr(timestamp, 20, 1) = '.' THEN CAST('0' || substr(timestamp, 20) AS REAL) ELSE 0.0 END,
+    engagement_score
+FROM engagement_logs;
+
+DROP TABLE engagement_logs;
+ALTER TABLE engagement_logs_new RENAME TO engagement_logs;
+
+-- Project Activity
+CREATE TABLE project_activity_new (
+    activity_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    project_id TEXT NOT NULL,
+    student_id TEXT NOT NULL,
+    team_id TEXT NOT NULL,
+    role_in_team TEXT NOT NULL,
+    tasks_completed INTEGER DEFAULT 0,
+    peer_review_score REAL CHECK(peer_review_score >= 0 AND peer_review_score <= 5),
+    communication_score REAL CHECK(communication_score >= 0 AND communication_score <= 5),
+    collaboration_score REAL CHECK(collaboration_score >= 0 AND collaboration_score <= 5),
+    creativity_score REAL CHECK(creativity_score >= 0 AND creativity_score <= 5),
+    project_completion_pct INTEGER CHECK(project_completion_pct >= 0 AND project_completion_pct <= 100),
+    created_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+    FOREIGN KEY (student_id) REFERENCES students(student_id) ON DELETE CASCADE
+);
+
+INSERT INTO project_activity_new (
+    activity_id, project_id, student_id, team_id, role_in_team, tasks_completed,
+    peer_review_score, communication_score, collaboration_score, creativity_score,
+    project_completion_pct, created_at
+)
+SELECT
+    activity_id, project_id, student_id, team_id, role_in_team, tasks_completed,
+    peer_review_score, communication_score, collaboration_score, creativity_score,
+    project_completion_pct, COALESCE(CAST(strftime('%s', created_at) AS INTEGER), CAST(strftime('%s', 'now') AS INTEGER))
+FROM project_activity;
+
+DROP TABLE project_activity;
+ALTER TABLE project_activity_new RENAME TO project_activity;
+
+-- Mastery Scores
+CREATE TABLE mastery_scores_new (
+    mastery_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    student_id TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    final_mastery_score INTEGER NOT NULL CHECK(final_mastery_score >= 0 AND final_mastery_score <= 100),
+    mastery_level TEXT CHECK(mastery_level IN ('beginner', 'intermediate', 'advanced')),
+    predicted_mastery_score INTEGER CHECK(predicted_mastery_score >= 0 AND predicted_mastery_score <= 100),
+    updated_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+    FOREIGN KEY (student_id) REFERENCES students(student_id) ON DELETE CASCADE,
+    UNIQUE(student_id, subject, topic)
+);
+
+INSERT INTO mastery_scores_new (
+    mastery_id, student_id, subject, topic, final_mastery_score, mastery_level,
+    predicted_mastery_score, updated_at
+)
+SELECT
+    mastery_id, student_id, subject, topic, final_mastery_score, mastery_level,
+    predicted_mastery_score, COALESCE(CAST(strftime('%s', updated_at) AS INTEGER), CAST(strftime('%s', 'now') AS INTEGER))
+FROM mastery_scores;
+
+DROP TABLE mastery_scores;
+ALTER TABLE mastery_scores_new RENAME TO mastery_scores;
+
+-- Indexes (dropped together with the old tables)
+CREATE INDEX idx_quiz_student_time ON quiz_attempts(student_id, timestamp, quiz_score);
+CREATE INDEX idx_quiz_student_day ON quiz_attempts(student_id, day_bucket, quiz_score);
+CREATE INDEX idx_quiz_student_week ON quiz_attempts(student_id, week_bucket, quiz_score);
+CREATE INDEX idx_quiz_subject_topic ON quiz_attempts(subject, topic);
+
+CREATE INDEX idx_engagement_student_time ON engagement_logs(student_id, timestamp, engagement_score, duration_seconds);
+CREATE INDEX idx_engagement_student_day ON engagement_logs(student_id, day_bucket, engagement_score, duration_seconds);
+CREATE INDEX idx_engagement_student_week ON engagement_logs(student_id, week_bucket, engagement_score, duration_seconds);
+
+CREATE INDEX idx_project_student_created ON project_activity(student_id, created_at);
+
+CREATE INDEX idx_mastery_student_score ON mastery_scores(student_id, final_mastery_score);
+CREATE INDEX idx_mastery_student_subject_score ON mastery_scores(student_id, subject, final_mastery_score DESC);
+CREATE INDEX idx_mastery_subject_topic ON mastery_scores(subject, topic);
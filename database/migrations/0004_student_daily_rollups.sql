@@ -0,0 +1,146 @@
+-- Per-student daily rollups of engagement and quiz activity
+-- Trend panels read one row per (student, day) instead of every raw event.
+-- Inserts are folded in incrementally; updates and deletes recompute the
+-- affected day from the raw rows (one indexed day per student), since
+-- min/max cannot be decremented.
+
+CREATE TABLE IF NOT EXISTS student_daily_engagement (
+    student_id TEXT NOT NULL,
+    day_bucket INTEGER NOT NULL,
+    event_count INTEGER NOT NULL DEFAULT 0,
+    score_count INTEGER NOT NULL DEFAULT 0,
+    score_sum INTEGER NOT NULL DEFAULT 0,
+    score_min INTEGER,
+    score_max INTEGER,
+    duration_sum INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (student_id, day_bucket)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS student_daily_quiz (
+    student_id TEXT NOT NULL,
+    day_bucket INTEGER NOT NULL,
+    attempt_count INTEGER NOT NULL DEFAULT 0,
+    score_sum INTEGER NOT NULL DEFAULT 0,
+    score_min INTEGER,
+    score_max INTEGER,
+    PRIMARY KEY (student_id, day_bucket)
+) WITHOUT ROWID;
+
+-- Engagement triggers
+CREATE TRIGGER IF NOT EXISTS trg_engagement_rollup_insert
+AFTER INSERT ON engagement_logs
+BEGIN
+    INSERT INTO student_daily_engagement (
+        student_id, day_bucket, event_count, score_count, score_sum,
+        score_min, score_max, duration_sum
+    )
+    VALUES (
+        NEW.student_id, NEW.day_bucket, 1, NEW.engagement_score IS NOT NULL,
+        COALESCE(NEW.engagement_score, 0), NEW.engagement_score, NEW.engagement_score,
+        COALESCE(NEW.duration_seconds, 0)
+    )
+    ON CONFLICT(student_id, day_bucket) DO UPDATE SET
+        event_count = event_count + 1,
+        score_count = score_count + excluded.score_count,
+        score_sum = score_sum + excluded.score_sum,
+        score_min = CASE WHEN score_min IS NULL OR excluded.score_min < score_min
+                         THEN excluded.score_min ELSE score_min END,
+        score_max = CASE WHEN score_max IS NULL OR excluded.score_max > score_max
+                         THEN excluded.score_max ELSE score_max END,
+        duration_sum = duration_sum + excluded.duration_sum;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_engagement_rollup_delete
+AFTER DELETE ON engagement_logs
+BEGIN
+    DELETE FROM student_daily_engagement
+    WHERE student_id = OLD.student_id AND day_bucket = OLD.day_bucket;
+
+    INSERT INTO student_daily_engagement
+    SELECT student_id, day_bucket, COUNT(*), COUNT(engagement_score),
+           COALESCE(SUM(engagement_score), 0), MIN(engagement_score),
+           MAX(engagement_score), COALESCE(SUM(duration_seconds), 0)
+    FROM engagement_logs
+    WHERE student_id = OLD.student_id AND day_bucket = OLD.day_bucket
+    GROUP BY student_id, day_bucket;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_engagement_rollup_update
+AFTER UPDATE OF student_id, timestamp, engagement_score, duration_seconds ON engagement_logs
+BEGIN
+    DELETE FROM student_daily_engagement
+    WHERE (student_id = OLD.student_id AND day_bucket = OLD.day_bucket)
+       OR (student_id = NEW.student_id AND day_bucket = NEW.day_bucket);
+
+    INSERT INTO student_daily_engagement
+    SELECT student_id, day_bucket, COUNT(*), COUNT(engagement_score),
+           COALESCE(SUM(engagement_score), 0), MIN(engagement_score),
+           MAX(engagement_score), COALESCE(SUM(duration_seconds), 0)
+    FROM engagement_logs
+    WHERE (student_id = OLD.student_id AND day_bucket = OLD.day_bucket)
+       OR (student_id = NEW.student_id AND day_bucket = NEW.day_bucket)
+    GROUP BY student_id, day_bucket;
+END;
+
+-- Quiz triggers
+CREATE TRIGGER IF NOT EXISTS trg_quiz_rollup_insert
+AFTER INSERT ON quiz_attempts
+BEGIN
+    INSERT INTO student_daily_quiz (
+        student_id, day_bucket, attempt_count, score_sum, score_min, score_max
+    )
+    VALUES (
+        NEW.student_id, NEW.day_bucket, 1, NEW.quiz_score, NEW.quiz_score, NEW.quiz_score
+    )
+    ON CONFLICT(student_id, day_bucket) DO UPDATE SET
+        attempt_count = attempt_count + 1,
+        score_sum = score_sum + excluded.score_sum,
+        score_min = MIN(score_min, excluded.score_min),
+        score_max = MAX(score_max, excluded.score_max);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_quiz_rollup_delete
+AFTER DELETE ON quiz_attempts
+BEGIN
+    DELETE FROM student_daily_quiz
+    WHERE student_id = OLD.student_id AND day_bucket = OLD.day_bucket;
+
+    INSERT INTO student_daily_quiz
+    SELECT student_id, day_bucket, COUNT(*), SUM(quiz_score),
+           MIN(quiz_score), MAX(quiz_score)
+    FROM quiz_attempts
+    WHERE student_id = OLD.student_id AND day_bucket = OLD.day_bucket
+    GROUP BY student_id, day_bucket;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_quiz_rollup_update
+AFTER UPDATE OF student_id, timestamp, quiz_score ON quiz_attempts
+BEGIN
+    DELETE FROM student_daily_quiz
+    WHERE (student_id = OLD.student_id AND day_bucket = OLD.day_bucket)
+       OR (student_id = NEW.student_id AND day_bucket = NEW.day_bucket);
+
+    INSERT INTO student_daily_quiz
+    SELECT student_id, day_bucket, COUNT(*), SUM(quiz_score),
+           MIN(quiz_score), MAX(quiz_score)
+    FROM quiz_attempts
+    WHERE (student_id = OLD.student_id AND day_bucket = OLD.day_bucket)
+       OR (student_id = NEW.student_id AND day_bucket = NEW.day_bucket)
+    GROUP BY student_id, day_bucket;
+END;
+
+-- Backfill from existing rows
+DELETE FROM student_daily_engagement;
+INSERT INTO student_daily_engagement
+SELECT student_id, day_bucket, COUNT(*), COUNT(engagement_score),
+       COALESCE(SUM(engagement_score), 0), MIN(engagement_score),
+       MAX(engagement_score), COALESCE(SUM(duration_seconds), 0)
+FROM engagement_logs
+GROUP BY student_id, day_bucket;
+
+DELETE FROM student_daily_quiz;
+INSERT INTO student_daily_quiz
+SELECT student_id, day_bucket, COUNT(*), SUM(quiz_score),
+       MIN(quiz_score), MAX(quiz_score)
+FROM quiz_attempts
+GROUP BY student_id, day_bucket;
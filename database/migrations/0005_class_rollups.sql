@@ -0,0 +1,270 @@
+-- Class/section rollups for the teacher views
+-- A class is (institution_id, grade, section). Teacher aggregates read these
+-- tables, whose size is classes x topics (or classes x days), instead of
+-- scanning every student's mastery and engagement rows.
+--
+--   class_rollups           roster size per class
+--   class_topic_rollups     running mastery sum/count per class, subject, topic
+--   class_daily_engagement  engagement sums per class and day; rolling
+--                           windows are a range over day_bucket
+--
+-- Kept current by triggers on mastery_scores, engagement_logs and students
+-- (a student changing section moves their contributions between classes).
+
+CREATE TABLE IF NOT EXISTS class_rollups (
+    institution_id TEXT NOT NULL,
+    grade INTEGER NOT NULL,
+    section TEXT NOT NULL,
+    student_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (institution_id, grade, section)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS class_topic_rollups (
+    institution_id TEXT NOT NULL,
+    grade INTEGER NOT NULL,
+    section TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    mastery_sum INTEGER NOT NULL DEFAULT 0,
+    mastery_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (institution_id, grade, section, subject, topic)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS class_daily_engagement (
+    institution_id TEXT NOT NULL,
+    grade INTEGER NOT NULL,
+    section TEXT NOT NULL,
+    day_bucket INTEGER NOT NULL,
+    event_count INTEGER NOT NULL DEFAULT 0,
+    score_count INTEGER NOT NULL DEFAULT 0,
+    score_sum INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (institution_id, grade, section, day_bucket)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_students_class ON students(institution_id, grade, section);
+
+-- Mastery
+CREATE TRIGGER IF NOT EXISTS trg_class_mastery_insert
+AFTER INSERT ON mastery_scores
+BEGIN
+    INSERT INTO class_topic_rollups (institution_id, grade, section, subject, topic, mastery_sum, mastery_count)
+    SELECT institution_id, grade, section, NEW.subject, NEW.topic, NEW.final_mastery_score, 1
+    FROM students WHERE student_id = NEW.student_id
+    ON CONFLICT(institution_id, grade, section, subject, topic) DO UPDATE SET
+        mastery_sum = mastery_sum + excluded.mastery_sum,
+        mastery_count = mastery_count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_class_mastery_delete
+AFTER DELETE ON mastery_scores
+BEGIN
+    UPDATE class_topic_rollups
+    SET mastery_sum = mastery_sum - OLD.final_mastery_score,
+        mastery_count = mastery_count - 1
+    WHERE (institution_id, grade, section) = (SELECT institution_id, grade, section FROM students WHERE student_id = OLD.student_id)
+      AND subject = OLD.subject AND topic = OLD.topic;
+
+    DELETE FROM class_topic_rollups
+    WHERE mastery_count <= 0 AND subject = OLD.subject AND topic = OLD.topic;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_class_mastery_update
+AFTER UPDATE OF student_id, subject, topic, final_mastery_score ON mastery_scores
+BEGIN
+    UPDATE class_topic_rollups
+    SET mastery_sum = mastery_sum - OLD.final_mastery_score,
+        mastery_count = mastery_count - 1
+    WHERE (institution_id, grade, section) = (SELECT institution_id, grade, section FROM students WHERE student_id = OLD.student_id)
+      AND subject = OLD.subject AND topic = OLD.topic;
+
+    DELETE FROM class_topic_rollups
+    WHERE mastery_count <= 0 AND subject = OLD.subject AND topic = OLD.topic;
+
+    INSERT INTO class_topic_rollups (institution_id, grade, section, subject, topic, mastery_sum, mastery_count)
+    SELECT institution_id, grade, section, NEW.subject, NEW.topic, NEW.final_mastery_score, 1
+    FROM students WHERE student_id = NEW.student_id
+    ON CONFLICT(institution_id, grade, section, subject, topic) DO UPDATE SET
+        mastery_sum = mastery_sum + excluded.mastery_sum,
+        mastery_count = mastery_count + 1;
+END;
+
+-- Engagement
+CREATE TRIGGER IF NOT EXISTS trg_class_engagement_insert
+AFTER INSERT ON engagement_logs
+BEGIN
+    INSERT INTO class_daily_engagement (institution_id, grade, section, day_bucket, event_count, score_count, score_sum)
+    SELECT institution_id, grade, section, NEW.day_bucket, 1,
+           NEW.engagement_score IS NOT NULL, COALESCE(NEW.engagement_score, 0)
+    FROM students WHERE student_id = NEW.student_id
+    ON CONFLICT(institution_id, grade, section, day_bucket) DO UPDATE SET
+        event_count = event_count + 1,
+        score_count = score_count + excluded.score_count,
+        score_sum = score_sum + excluded.score_sum;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_class_engagement_delete
+AFTER DELETE ON engagement_logs
+BEGIN
+    UPDATE class_daily_engagement
+    SET event_count = event_count - 1,
+        score_count = score_count - (OLD.engagement_score IS NOT NULL),
+        score_sum = score_sum - COALESCE(OLD.engagement_score, 0)
+    WHERE (institution_id, grade, section) = (SELECT institution_id, grade, section FROM students WHERE student_id = OLD.student_id)
+      AND day_bucket = OLD.day_bucket;
+
+    DELETE FROM class_daily_engagement
+    WHERE event_count <= 0 AND day_bucket = OLD.day_bucket;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_class_engagement_update
+AFTER UPDATE OF student_id, timestamp, engagement_score ON engagement_logs
+BEGIN
+    UPDATE class_daily_engagement
+    SET event_count = event_count - 1,
+        score_count = score_count - (OLD.engagement_score IS NOT NULL),
+        score_sum = score_sum - COALESCE(OLD.engagement_score, 0)
+    WHERE (institution_id, grade, section) = (SELECT institution_id, grade, section FROM students WHERE student_id = OLD.student_id)
+      AND day_bucket = OLD.day_bucket;
+
+    DELETE FROM class_daily_engagement
+    WHERE event_count <= 0 AND day_bucket = OLD.day_bucket;
+
+    INSERT INTO class_daily_engagement (institution_id, grade, section, day_bucket, event_count, score_count, score_sum)
+    SELECT institution_id, grade, section, NEW.day_bucket, 1,
+           NEW.engagement_score IS NOT NULL, COALESCE(NEW.engagement_score, 0)
+    FROM students WHERE student_id = NEW.student_id
+    ON CONFLICT(institution_id, grade, section, day_bucket) DO UPDATE SET
+        event_count = event_count + 1,
+        score_count = score_count + excluded.score_count,
+        score_sum = score_sum + excluded.score_sum;
+END;
+
+-- Roster changes
+CREATE TRIGGER IF NOT EXISTS trg_class_student_insert
+AFTER INSERT ON students
+BEGIN
+    INSERT INTO class_rollups (institution_id, grade, section, student_count)
+    VALUES (NEW.institution_id, NEW.grade, NEW.section, 1)
+    ON CONFLICT(institution_id, grade, section) DO UPDATE SET
+        student_count = student_count + 1;
+END;
+
+-- BEFORE DELETE: cascaded child deletes run after the student row is gone
+-- and can no longer resolve the class, so the student's share leaves here.
+CREATE TRIGGER IF NOT EXISTS trg_class_student_delete
+BEFORE DELETE ON students
+BEGIN
+    UPDATE class_rollups SET student_count = student_count - 1
+    WHERE institution_id = OLD.institution_id AND grade = OLD.grade AND section = OLD.section;
+
+    UPDATE class_topic_rollups
+    SET mastery_sum = mastery_sum - (
+            SELECT m.final_mastery_score FROM mastery_scores m
+            WHERE m.student_id = OLD.student_id
+              AND m.subject = class_topic_rollups.subject AND m.topic = class_topic_rollups.topic),
+        mastery_count = mastery_count - 1
+    WHERE institution_id = OLD.institution_id AND grade = OLD.grade AND section = OLD.section
+      AND EXISTS (
+            SELECT 1 FROM mastery_scores m
+            WHERE m.student_id = OLD.student_id
+              AND m.subject = class_topic_rollups.subject AND m.topic = class_topic_rollups.topic);
+
+    UPDATE class_daily_engagement
+    SET event_count = event_count - (
+            SELECT d.event_count FROM student_daily_engagement d
+            WHERE d.student_id = OLD.student_id AND d.day_bucket = class_daily_engagement.day_bucket),
+        score_count = score_count - (
+            SELECT d.score_count FROM student_daily_engagement d
+            WHERE d.student_id = OLD.student_id AND d.day_bucket = class_daily_engagement.day_bucket),
+        score_sum = score_sum - (
+            SELECT d.score_sum FROM student_daily_engagement d
+            WHERE d.student_id = OLD.student_id AND d.day_bucket = class_daily_engagement.day_bucket)
+    WHERE institution_id = OLD.institution_id AND grade = OLD.grade AND section = OLD.section
+      AND day_bucket IN (SELECT day_bucket FROM student_daily_engagement WHERE student_id = OLD.student_id);
+
+    DELETE FROM class_rollups WHERE student_count <= 0;
+    DELETE FROM class_topic_rollups WHERE mastery_count <= 0;
+    DELETE FROM class_daily_engagement WHERE event_count <= 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_class_student_move
+AFTER UPDATE OF institution_id, grade, section ON students
+WHEN OLD.institution_id IS NOT NEW.institution_id OR OLD.grade IS NOT NEW.grade OR OLD.section IS NOT NEW.section
+BEGIN
+    -- Leave the old class
+    UPDATE class_rollups SET student_count = student_count - 1
+    WHERE institution_id = OLD.institution_id AND grade = OLD.grade AND section = OLD.section;
+
+    UPDATE class_topic_rollups
+    SET mastery_sum = mastery_sum - (
+            SELECT m.final_mastery_score FROM mastery_scores m
+            WHERE m.student_id = OLD.student_id
+              AND m.subject = class_topic_rollups.subject AND m.topic = class_topic_rollups.topic),
+        mastery_count = mastery_count - 1
+    WHERE institution_id = OLD.institution_id AND grade = OLD.grade AND section = OLD.section
+      AND EXISTS (
+            SELECT 1 FROM mastery_scores m
+            WHERE m.student_id = OLD.student_id
+              AND m.subject = class_topic_rollups.subject AND m.topic = class_topic_rollups.topic);
+
+    UPDATE class_daily_engagement
+    SET event_count = event_count - (
+            SELECT d.event_count FROM student_daily_engagement d
+            WHERE d.student_id = OLD.student_id AND d.day_bucket = class_daily_engagement.day_bucket),
+        score_count = score_count - (
+            SELECT d.score_count FROM student_daily_engagement d
+            WHERE d.student_id = OLD.student_id AND d.day_bucket = class_daily_engagement.day_bucket),
+        score_sum = score_sum - (
+            SELECT d.score_sum FROM student_daily_engagement d
+            WHERE d.student_id = OLD.student_id AND d.day_bucket = class_daily_engagement.day_bucket)
+    WHERE institution_id = OLD.institution_id AND grade = OLD.grade AND section = OLD.section
+      AND day_bucket IN (SELECT day_bucket FROM student_daily_engagement WHERE student_id = OLD.student_id);
+
+    DELETE FROM class_rollups WHERE student_count <= 0;
+    DELETE FROM class_topic_rollups WHERE mastery_count <= 0;
+    DELETE FROM class_daily_engagement WHERE event_count <= 0;
+
+    -- Join the new class
+    INSERT INTO class_rollups (institution_id, grade, section, student_count)
+    VALUES (NEW.institution_id, NEW.grade, NEW.section, 1)
+    ON CONFLICT(institution_id, grade, section) DO UPDATE SET
+        student_count = student_count + 1;
+
+    INSERT INTO class_topic_rollups (institution_id, grade, section, subject, topic, mastery_sum, mastery_count)
+    SELECT NEW.institution_id, NEW.grade, NEW.section, subject, topic, final_mastery_score, 1
+    FROM mastery_scores WHERE student_id = NEW.student_id
+    ON CONFLICT(institution_id, grade, section, subject, topic) DO UPDATE SET
+        mastery_sum = mastery_sum + excluded.mastery_sum,
+        mastery_count = mastery_count + 1;
+
+    INSERT INTO class_daily_engagement (institution_id, grade, section, day_bucket, event_count, score_count, score_sum)
+    SELECT NEW.institution_id, NEW.grade, NEW.section, day_bucket, event_count, score_count, score_sum
+    FROM student_daily_engagement WHERE student_id = NEW.student_id
+    ON CONFLICT(institution_id, grade, section, day_bucket) DO UPDATE SET
+        event_count = event_count + excluded.event_count,
+        score_count = score_count + excluded.score_count,
+        score_sum = score_sum + excluded.score_sum;
+END;
+
+-- Backfill from existing rows
+DELETE FROM class_rollups;
+INSERT INTO class_rollups
+SELECT institution_id, grade, section, COUNT(*)
+FROM students
+GROUP BY institution_id, grade, section;
+
+DELETE FROM class_topic_rollups;
+INSERT INTO class_topic_rollups
+SELECT s.institution_id, s.grade, s.section, m.subject, m.topic,
+       SUM(m.final_mastery_score), COUNT(*)
+FROM mastery_scores m
+JOIN students s ON s.student_id = m.student_id
+GROUP BY s.institution_id, s.grade, s.section, m.subject, m.topic;
+
+DELETE FROM class_daily_engagement;
+INSERT INTO class_daily_engagement
+SELECT s.institution_id, s.grade, s.section, e.day_bucket, COUNT(*),
+       COUNT(e.engagement_score), COALESCE(SUM(e.engagement_score), 0)
+FROM engagement_logs e
+JOIN students s ON s.student_id = e.student_id
+GROUP BY s.institution_id, s.grade, s.section, e.day_bucket;
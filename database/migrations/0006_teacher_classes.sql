@@ -0,0 +1,16 @@
+-- Teacher-to-class roster
+-- Each row grants a teacher one class (institution_id, grade, section).
+-- Teacher views scope their aggregates by joining through this table
+-- (see backend/utils/scope.py) instead of expanding student id lists.
+
+CREATE TABLE IF NOT EXISTS teacher_classes (
+    teacher_id TEXT NOT NULL,
+    institution_id TEXT NOT NULL,
+    grade INTEGER NOT NULL,
+    section TEXT NOT NULL,
+    created_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+    PRIMARY KEY (teacher_id, institution_id, grade, section),
+    FOREIGN KEY (teacher_id) REFERENCES users(user_id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_teacher_classes_class ON teacher_classes(institution_id, grade, section);
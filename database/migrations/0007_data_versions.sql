@@ -0,0 +1,193 @@
+-- Data version counters for conditional GETs
+-- student_data_versions.version increases on every write touching one of
+-- the student's rows; class_data_versions.version increases whenever any
+-- student in the class changes. Routes turn these into ETags (see
+-- backend/utils/versions.py) and answer If-None-Match with 304 before
+-- running any aggregate query.
+--
+-- Version rows are never deleted, so a counter only ever goes up.
+
+CREATE TABLE IF NOT EXISTS student_data_versions (
+    student_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS class_data_versions (
+    institution_id TEXT NOT NULL,
+    grade INTEGER NOT NULL,
+    section TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (institution_id, grade, section)
+) WITHOUT ROWID;
+
+-- Per-student bumps (only for students that exist, so cascaded deletes
+-- after a student is removed do not recreate their counter)
+
+CREATE TRIGGER IF NOT EXISTS trg_version_quiz_attempts_insert
+AFTER INSERT ON quiz_attempts
+BEGIN
+    INSERT INTO student_data_versions (student_id, version)
+    SELECT student_id, 1 FROM students WHERE student_id = NEW.student_id
+    ON CONFLICT(student_id) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_version_quiz_attempts_delete
+AFTER DELETE ON quiz_attempts
+BEGIN
+    INSERT INTO student_data_versions (student_id, version)
+    SELECT student_id, 1 FROM students WHERE student_id = OLD.student_id
+    ON CONFLICT(student_id) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_version_quiz_attempts_update
+AFTER UPDATE ON quiz_attempts
+BEGIN
+    INSERT INTO student_data_versions (student_id, version)
+    SELECT student_id, 1 FROM students WHERE student_id = OLD.student_id
+    ON CONFLICT(student_id) DO UPDATE SET version = version + 1;
+    UPDATE student_data_versions SET version = version + 1
+    WHERE student_id = NEW.student_id AND NEW.student_id IS NOT OLD.student_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_version_engagement_logs_insert
+AFTER INSERT ON engagement_logs
+BEGIN
+    INSERT INTO student_data_versions (student_id, version)
+    SELECT student_id, 1 FROM students WHERE student_id = NEW.student_id
+    ON CONFLICT(student_id) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_version_engagement_logs_delete
+AFTER DELETE ON engagement_logs
+BEGIN
+    INSERT INTO student_data_versions (student_id, version)
+    SELECT student_id, 1 FROM students WHERE student_id = OLD.student_id
+    ON CONFLICT(student_id) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_version_engagement_logs_update
+AFTER UPDATE ON engagement_logs
+BEGIN
+    INSERT INTO student_data_versions (student_id, version)
+    SELECT student_id, 1 FROM students WHERE student_id = OLD.student_id
+    ON CONFLICT(student_id) DO UPDATE SET version = version + 1;
+    UPDATE student_data_versions SET version = version + 1
+    WHERE student_id = NEW.student_id AND NEW.student_id IS NOT OLD.student_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_version_project_activity_insert
+AFTER INSERT ON project_activity
+BEGIN
+    INSERT INTO student_data_versions (student_id, version)
+    SELECT student_id, 1 FROM students WHERE student_id = NEW.student_id
+    ON CONFLICT(student_id) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_version_project_activity_delete
+AFTER DELETE ON project_activity
+BEGIN
+    INSERT INTO student_data_versions (student_id, version)
+    SELECT student_id, 1 FROM students WHERE student_id = OLD.student_id
+    ON CONFLICT(student_id) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_version_project_activity_update
+AFTER UPDATE ON project_activity
+BEGIN
+    INSERT INTO student_data_versions (student_id, version)
+    SELECT student_id, 1 FROM students WHERE student_id = OLD.student_id
+    ON CONFLICT(student_id) DO UPDATE SET version = version + 1;
+    UPDATE student_data_versions SET version = version + 1
+    WHERE student_id = NEW.student_id AND NEW.student_id IS NOT OLD.student_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_version_mastery_scores_insert
+AFTER INSERT ON mastery_scores
+BEGIN
+    INSERT INTO student_data_versions (student_id, version)
+    SELECT student_id, 1 FROM students WHERE student_id = NEW.student_id
+    ON CONFLICT(student_id) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_version_mastery_scores_delete
+AFTER DELETE ON mastery_scores
+BEGIN
+    INSERT INTO student_data_versions (student_id, version)
+    SELECT student_id, 1 FROM students WHERE student_id = OLD.student_id
+    ON CONFLICT(student_id) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_version_mastery_scores_update
+AFTER UPDATE ON mastery_scores
+BEGIN
+    INSERT INTO student_data_versions (student_id, version)
+    SELECT student_id, 1 FROM students WHERE student_id = OLD.student_id
+    ON CONFLICT(student_id) DO UPDATE SET version = version + 1;
+    UPDATE student_data_versions SET version = version + 1
+    WHERE student_id = NEW.student_id AND NEW.student_id IS NOT OLD.student_id;
+END;
+
+-- Profile changes
+CREATE TRIGGER IF NOT EXISTS trg_version_students_insert
+AFTER INSERT ON students
+BEGIN
+    INSERT INTO student_data_versions (student_id, version)
+    SELECT student_id, 1 FROM students WHERE student_id = NEW.student_id
+    ON CONFLICT(student_id) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_version_students_update
+AFTER UPDATE ON students
+BEGIN
+    INSERT INTO student_data_versions (student_id, version)
+    SELECT student_id, 1 FROM students WHERE student_id = NEW.student_id
+    ON CONFLICT(student_id) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_version_users_update
+AFTER UPDATE OF full_name, email ON users
+BEGIN
+    INSERT INTO student_data_versions (student_id, version)
+    SELECT student_id, 1 FROM students WHERE user_id = NEW.user_id
+    ON CONFLICT(student_id) DO UPDATE SET version = version + 1;
+END;
+
+-- Per-class bumps follow every student bump
+CREATE TRIGGER IF NOT EXISTS trg_class_version_insert
+AFTER INSERT ON student_data_versions
+BEGIN
+    INSERT INTO class_data_versions (institution_id, grade, section, version)
+    SELECT institution_id, grade, section, 1 FROM students WHERE student_id = NEW.student_id
+    ON CONFLICT(institution_id, grade, section) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_class_version_update
+AFTER UPDATE ON student_data_versions
+BEGIN
+    INSERT INTO class_data_versions (institution_id, grade, section, version)
+    SELECT institution_id, grade, section, 1 FROM students WHERE student_id = NEW.student_id
+    ON CONFLICT(institution_id, grade, section) DO UPDATE SET version = version + 1;
+END;
+
+-- A student leaving a class changes it too (the new class is bumped above)
+CREATE TRIGGER IF NOT EXISTS trg_class_version_student_move
+AFTER UPDATE OF institution_id, grade, section ON students
+WHEN OLD.institution_id IS NOT NEW.institution_id OR OLD.grade IS NOT NEW.grade OR OLD.section IS NOT NEW.section
+BEGIN
+    UPDATE class_data_versions SET version = version + 1
+    WHERE institution_id = OLD.institution_id AND grade = OLD.grade AND section = OLD.section;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_class_version_student_delete
+BEFORE DELETE ON students
+BEGIN
+    UPDATE class_data_versions SET version = version + 1
+    WHERE institution_id = OLD.institution_id AND grade = OLD.grade AND section = OLD.section;
+END;
+
+-- Backfill
+INSERT OR IGNORE INTO student_data_versions (student_id, version)
+SELECT student_id, 1 FROM students;
+
+INSERT OR IGNORE INTO class_data_versions (institution_id, grade, section, version)
+SELECT DISTINCT institution_id, grade, section, 1 FROM students;
@@ -0,0 +1,27 @@
+-- Precomputed mastery predictions
+-- The batch scoring job (backend/utils/scoring.py) fills
+-- mastery_scores.predicted_mastery_score for every (student, subject,
+-- topic) row and records which model version produced it and when, so
+-- request paths can tell whether a stored prediction is still usable.
+
+ALTER TABLE mastery_scores ADD COLUMN predicted_model_version TEXT;
+ALTER TABLE mastery_scores ADD COLUMN predicted_at INTEGER;
+
+-- Latest attempt per (student, subject, topic), the job's model input
+CREATE INDEX IF NOT EXISTS idx_quiz_student_topic_time
+    ON quiz_attempts(student_id, subject, topic, timestamp);
+
+-- Restamping predicted_at/predicted_model_version changes nothing a view
+-- shows, so only the other columns bump the student's data version
+DROP TRIGGER IF EXISTS trg_version_mastery_scores_update;
+
+CREATE TRIGGER trg_version_mastery_scores_update
+AFTER UPDATE OF student_id, subject, topic, final_mastery_score, mastery_level,
+                predicted_mastery_score, updated_at ON mastery_scores
+BEGIN
+    INSERT INTO student_data_versions (student_id, version)
+    SELECT student_id, 1 FROM students WHERE student_id = OLD.student_id
+    ON CONFLICT(student_id) DO UPDATE SET version = version + 1;
+    UPDATE student_data_versions SET version = version + 1
+    WHERE student_id = NEW.student_id AND NEW.student_id IS NOT OLD.student_id;
+END;
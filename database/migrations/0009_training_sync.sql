@@ -0,0 +1,19 @@
+-- Incremental training snapshots
+-- ml/src/db_source.py mirrors the app's tables into a local training
+-- snapshot and only pulls rows past a high-water mark. Event tables are
+-- append-only and pulled in integer-id order (quiz_attempts, whose key is
+-- the TEXT attempt_id, by rowid); mastery_scores rows are updated in
+-- place, so they are pulled in (updated_at, mastery_id) order.
+
+CREATE INDEX IF NOT EXISTS idx_mastery_updated
+    ON mastery_scores(updated_at);
+
+-- A label change must move updated_at, or the next sync would miss it;
+-- writers that already set it are left alone
+CREATE TRIGGER IF NOT EXISTS trg_mastery_scores_touch
+AFTER UPDATE OF final_mastery_score, mastery_level ON mastery_scores
+WHEN NEW.updated_at IS OLD.updated_at
+BEGIN
+    UPDATE mastery_scores SET updated_at = CAST(strftime('%s', 'now') AS INTEGER)
+    WHERE mastery_id = NEW.mastery_id;
+END;
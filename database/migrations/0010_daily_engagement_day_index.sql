@@ -0,0 +1,8 @@
+-- Institution-wide engagement windows
+-- The admin dashboard averages student_daily_engagement over the last N
+-- days for every student at once. The primary key leads with student_id, so
+-- that window needs its own (day_bucket, ...) index to be a range instead
+-- of a scan of the rollup's whole history.
+
+CREATE INDEX IF NOT EXISTS idx_daily_engagement_day
+    ON student_daily_engagement(day_bucket, score_sum, score_count);
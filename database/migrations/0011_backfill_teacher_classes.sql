@@ -0,0 +1,12 @@
+-- Backfill the teacher roster
+-- Before 0006 every teacher saw every student, so an empty teacher_classes
+-- left existing teachers with empty dashboards. Each teacher without a
+-- roster gets every class that has students, which is what they saw
+-- before; admins narrow it with PUT /api/admin/teachers/<id>/classes.
+
+INSERT OR IGNORE INTO teacher_classes (teacher_id, institution_id, grade, section)
+SELECT u.user_id, c.institution_id, c.grade, c.section
+FROM users u
+CROSS JOIN (SELECT DISTINCT institution_id, grade, section FROM students) c
+WHERE u.role = 'teacher'
+AND NOT EXISTS (SELECT 1 FROM teacher_classes tc WHERE tc.teacher_id = u.user_id);
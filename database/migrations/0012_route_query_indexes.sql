@@ -0,0 +1,14 @@
+-- Indexes for the remaining admin route queries
+-- tests/test_query_plans.py checks every route query's plan for table scans
+-- and temp B-trees; these cover the ones an index can serve.
+--
+--   users(role, last_login)    teacher adoption/usage panels (covering)
+--   users(created_at)          user list, newest first, without a sort
+--   mastery_scores(subject, student_id, final_mastery_score)
+--                              per-subject performance read from the index
+--                              alone instead of every table row
+
+CREATE INDEX IF NOT EXISTS idx_users_role_login ON users(role, last_login);
+CREATE INDEX IF NOT EXISTS idx_users_created ON users(created_at);
+CREATE INDEX IF NOT EXISTS idx_mastery_subject_student
+    ON mastery_scores(subject, student_id, final_mastery_score);
@@ -0,0 +1,17 @@
+-- Deleted mastery labels for the training snapshot
+-- ml/src/db_source.py pulls mastery_scores past an (updated_at, mastery_id)
+-- mark, which a delete never moves. Each delete leaves the row's id here,
+-- pulled like an event table, so the snapshot drops the label as well.
+-- mastery_id is AUTOINCREMENT, so a tombstoned id is never reused.
+
+CREATE TABLE IF NOT EXISTS mastery_score_deletes (
+    delete_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    mastery_id INTEGER NOT NULL,
+    deleted_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_mastery_scores_deleted
+AFTER DELETE ON mastery_scores
+BEGIN
+    INSERT INTO mastery_score_deletes (mastery_id) VALUES (OLD.mastery_id);
+END;
@@ -1,4 +1,5 @@
 import sqlite3
+import os
 import uuid
 import random
 import bcrypt
@@ -8,7 +9,7 @@ def hash_password(password):
     return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
 
 def seed_data():
-    db_path = 'c:/Users/SAGAR/OneDrive/Desktop/smart_Ed/database/smarted.db'
+    db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'smarted.db')
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
 
@@ -17,6 +18,7 @@ def seed_data():
     cursor.execute("DELETE FROM engagement_logs")
     cursor.execute("DELETE FROM quiz_attempts")
     cursor.execute("DELETE FROM students")
+    cursor.execute("DELETE FROM teacher_classes")
     cursor.execute("DELETE FROM users")
     cursor.execute("DELETE FROM mastery_scores")
 
@@ -77,7 +79,7 @@ def seed_data():
                     cursor.execute("""
                         INSERT INTO quiz_attempts (attempt_id, student_id, subject, topic, quiz_id, quiz_score, time_taken_seconds, number_of_attempts, difficulty_level, timestamp)
                         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (attempt_id, student_id, sub, top, f"QUIZ_{random.randint(100,999)}", score, time_taken, i+1, difficulty, (datetime.now() - timedelta(days=random.randint(0, 30))).isoformat()))
+                    """, (attempt_id, student_id, sub, top, f"QUIZ_{random.randint(100,999)}", score, time_taken, i+1, difficulty, (datetime.now() - timedelta(days=random.randint(0, 30))).timestamp()))
                 
                 # Mastery Score for this topic
                 level = 'advanced' if last_score > 80 else 'intermediate' if last_score > 50 else 'beginner'
@@ -91,7 +93,7 @@ def seed_data():
             cursor.execute("""
                 INSERT INTO engagement_logs (student_id, session_id, activity_type, duration_seconds, interaction_count, timestamp, engagement_score)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (student_id, str(uuid.uuid4()), random.choice(['video', 'reading', 'quiz', 'forum']), random.randint(60, 3000), random.randint(5, 50), (datetime.now() - timedelta(hours=random.randint(1, 500))).isoformat(), random.randint(40, 100)))
+            """, (student_id, str(uuid.uuid4()), random.choice(['video', 'reading', 'quiz', 'forum']), random.randint(60, 3000), random.randint(5, 50), (datetime.now() - timedelta(hours=random.randint(1, 500))).timestamp(), random.randint(40, 100)))
 
         # Seed Project Activity
         cursor.execute("""
@@ -99,6 +101,19 @@ def seed_data():
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (f"PROJ_{random.randint(1,10)}", student_id, f"TEAM_{random.randint(1,5)}", random.choice(['Leader', 'Coder', 'Designer']), random.randint(1, 10), random.uniform(3, 5), random.uniform(3, 5), random.uniform(3, 5), random.uniform(3, 5), random.randint(50, 100)))
 
+    # Seed a demo teacher whose roster covers the seeded sections
+    print("Seeding teacher roster...")
+    teacher_id = str(uuid.uuid4())
+    cursor.execute("""
+        INSERT INTO users (user_id, email, password_hash, full_name, role, subject)
+        VALUES (?, ?, ?, ?, 'teacher', ?)
+    """, (teacher_id, "teacher@smarted.com", hash_password("password123"), "Demo Teacher", "Mathematics"))
+    for grade, section in sorted({(info[3], info[4]) for info in students_info}):
+        cursor.execute("""
+            INSERT INTO teacher_classes (teacher_id, institution_id, grade, section)
+            VALUES (?, 'INST001', ?, ?)
+        """, (teacher_id, grade, section))
+
     conn.commit()
     conn.close()
     print("Successfully seeded 10 students with historical data and mastery levels.")
@@ -0,0 +1,199 @@
+"""
+Compare the model backends on a large synthetic dataset
+
+For every model and installed backend (model_backends.py), with the
+backend's default settings: fit time, how much the fit raised peak RSS,
+single-row predict latency on the path AMEPPredictor serves (the flat
+evaluator for sklearn, the model's own predict otherwise), batch
+throughput, pickled size and test RMSE / accuracy. Every fit runs in a
+fresh process, so its peak RSS is its own.
+
+The synthetic rows have the columns AMEPDataProcessor produces for each
+model, with plausible ranges, and a noisy non-linear target.
+
+Usage (from ml/src):
+    python compare_backends.py                    200k rows, every installed backend
+    python compare_backends.py --rows 1000000 --models mastery --backends hist,lightgbm --output report.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(__file__))
+from model_backends import BACKENDS, DEFAULT_BACKEND, available_backends, make_estimator, thread_limit
+from model_search import measure_latency, model_size
+from stage_report import peak_rss_mib, reset_peak_rss
+from train_model import TRAIN_METHODS, train_split
+
+BATCH_REPEAT = 3
+
+# As in predict.py: served inputs are arrays in the fitted column order
+warnings.filterwarnings('ignore', message='X does not have valid feature names')
+
+
+def synthetic_dataset(model_name, n_rows, seed=42):
+    """(X, y) shaped like AMEPDataProcessor's dataset for model_name"""
+    rng = np.random.default_rng(seed)
+    grade = rng.integers(6, 13, n_rows)
+    pace = rng.integers(0, 3, n_rows)
+    style = rng.integers(0, 4, n_rows)
+
+    if model_name == 'mastery':
+        X = pd.DataFrame({
+            'quiz_score': rng.uniform(0, 100, n_rows).round(),
+            'time_taken_seconds': rng.integers(30, 1800, n_rows),
+            'number_of_attempts': rng.integers(1, 6, n_rows),
+            'previous_mastery_score': rng.uniform(0, 100, n_rows).round(),
+            'baseline_proficiency': rng.uniform(40, 100, n_rows).round(),
+            'grade': grade,
+            'subject_encoded': rng.integers(0, 6, n_rows),
+            'topic_encoded': rng.integers(0, 30, n_rows),
+            'difficulty_level_encoded': rng.integers(0, 3, n_rows),
+            'learning_pace_encoded': pace,
+            'preferred_learning_style_encoded': style
+        })
+        topic_effect = rng.normal(0, 4, 30)[X['topic_encoded']]
+        y = (0.45 * X['quiz_score'] + 0.3 * X['previous_mastery_score'] + 0.15 * X['baseline_proficiency']
+             + 4 * X['difficulty_level_encoded'] * (X['quiz_score'] > 70) - 3 * (X['number_of_attempts'] - 1)
+             - 5 * np.log1p(X['time_taken_seconds'] / 600) + 2 * (pace - 1) + topic_effect
+             + rng.normal(0, 5, n_rows))
+        return X, y.clip(0, 100)
+
+    if model_name == 'engagement':
+        X = pd.DataFrame({
+            'tasks_completed': rng.integers(0, 21, n_rows),
+            'peer_review_score': rng.uniform(1, 5, n_rows).round(1),
+            'communication_score': rng.uniform(1, 5, n_rows).round(1),
+            'collaboration_score': rng.uniform(1, 5, n_rows).round(1),
+            'creativity_score': rng.uniform(1, 5, n_rows).round(1),
+            'project_completion_pct': rng.uniform(0, 100, n_rows).round(),
+            'role_in_team_encoded': rng.integers(0, 4, n_rows),
+            'grade': grade,
+            'learning_pace_encoded': pace,
+            'preferred_learning_style_encoded': style
+        })
+        y = (X['tasks_completed'] * 2 + X['peer_review_score'] * 10 + X['communication_score'] * 8
+             + X['collaboration_score'] * 8 + 0.05 * X['project_completion_pct'] * X['creativity_score']
+             + rng.normal(0, 4, n_rows))
+        return X, y.clip(0, 100)
+
+    if model_name == 'recommendation':
+        X = pd.DataFrame({
+            'avg_mastery_score': rng.uniform(20, 100, n_rows).round(1),
+            'grade': grade,
+            'learning_pace_encoded': pace,
+            'preferred_learning_style_encoded': style,
+            'avg_peer_score': rng.uniform(1, 5, n_rows).round(2),
+            'total_tasks': rng.integers(0, 80, n_rows)
+        })
+        latent = (X['avg_mastery_score'] + 3 * (X['avg_peer_score'] - 3) + 0.05 * X['total_tasks']
+                  + 2 * (pace - 1) + rng.normal(0, 5, n_rows))
+        y = pd.Series(np.digitize(latent, [50, 75]), name='recommended_difficulty')
+        return X, y
+
+    raise ValueError(f"Unknown model {model_name!r}")
+
+
+def measure_backend(model_name, backend, n_rows, n_jobs=-1, seed=42):
+    """Fit one backend's estimator for a model and measure it (run in a fresh process)"""
+    classification = model_name == 'recommendation'
+    X, y = synthetic_dataset(model_name, n_rows, seed)
+    X_train, X_test, y_train, y_test = train_split(X, y, stratify=classification)
+    del X, y
+
+    model = make_estimator(backend, model_name, n_jobs=n_jobs)
+    # Building the dataset peaked higher than most fits; measure from here
+    reset_peak_rss()
+    rss_before = peak_rss_mib()
+    started = time.perf_counter()
+    with thread_limit(backend, n_jobs):
+        model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - started
+    rss_after = peak_rss_mib()
+
+    # Served inputs are plain arrays from the feature plans
+    X_batch = X_test.to_numpy(dtype=np.float64)
+    predicted = model.predict(X_batch)
+    predict = model.predict_proba if classification else model.predict
+    best = float('inf')
+    for _ in range(BATCH_REPEAT):
+        batch_started = time.perf_counter()
+        predict(X_batch)
+        best = min(best, time.perf_counter() - batch_started)
+
+    if classification:
+        score = {'accuracy': float(np.mean(predicted == y_test.to_numpy()))}
+    else:
+        score = {'rmse': float(np.sqrt(np.mean((np.clip(predicted, 0, 100) - y_test.to_numpy()) ** 2)))}
+
+    size_bytes, _ = model_size(model)
+    return dict(
+        score,
+        model=model_name,
+        backend=backend,
+        estimator=type(model).__name__,
+        train_rows=len(X_train),
+        fit_seconds=round(fit_seconds, 3),
+        fit_rss_mib=None if rss_before is None else round(rss_after - rss_before, 1),
+        latency_ms=round(measure_latency(model, X_batch) * 1000, 4),
+        batch_rows_per_second=round(len(X_batch) / best),
+        size_kib=round(size_bytes / 1024, 1)
+    )
+
+
+def compare_backends(models=None, backends=None, n_rows=200000, n_jobs=-1, seed=42):
+    """measure_backend() for every (model, backend) pair, each in its own process"""
+    results = []
+    for model_name in models or TRAIN_METHODS:
+        for backend in backends or available_backends():
+            print(f"  {model_name} / {backend} ...", flush=True)
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                results.append(pool.submit(measure_backend, model_name, backend, n_rows, n_jobs, seed).result())
+    return results
+
+
+def format_comparison(results):
+    """Report lines, one per (model, backend)"""
+    lines = [
+        f"  {'model':<15} {'backend':<9} {'fit s':>8} {'fit +RSS MiB':>13} {'1-row ms':>9} "
+        f"{'batch rows/s':>13} {'size KiB':>9} {'test score':>16}"
+    ]
+    for r in results:
+        score = f"acc {r['accuracy']:.4f}" if 'accuracy' in r else f"rmse {r['rmse']:.3f}"
+        rss = '-' if r['fit_rss_mib'] is None else f"{r['fit_rss_mib']:.1f}"
+        lines.append(
+            f"  {r['model']:<15} {r['backend']:<9} {r['fit_seconds']:>8.2f} {rss:>13} {r['latency_ms']:>9.3f} "
+            f"{r['batch_rows_per_second']:>13,} {r['size_kib']:>9,.0f} {score:>16}"
+        )
+    return lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare model backends on synthetic data")
+    parser.add_argument('--rows', type=int, default=200000, help="synthetic rows per model (default 200000)")
+    parser.add_argument('--models', default=','.join(TRAIN_METHODS), help="comma-separated models")
+    parser.add_argument('--backends', default=None,
+                        help=f"comma-separated backends (default: every installed one of {', '.join(BACKENDS)})")
+    parser.add_argument('--n-jobs', type=int, default=-1, help="fit/predict threads (default all cores)")
+    parser.add_argument('--output', default=None, help="also write the results as JSON here")
+    args = parser.parse_args()
+
+    backends = args.backends.split(',') if args.backends else available_backends()
+    print(f"Comparing {', '.join(backends)} on {args.rows:,} synthetic rows per model "
+          f"(default backend: {DEFAULT_BACKEND})")
+    results = compare_backends(args.models.split(','), backends, args.rows, args.n_jobs)
+    print()
+    for line in format_comparison(results):
+        print(line)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✅ Results saved: {args.output}")
@@ -3,36 +3,248 @@ Data Preprocessing Pipeline for AMEP Platform
 Handles data loading, cleaning, and feature engineering
 """
 
+import sys
+
 import pandas as pd
 import numpy as np
 from sklearn.preprocessing import LabelEncoder, StandardScaler
 from sklearn.model_selection import train_test_split
 
+# Dataset attribute -> (CSV file in data_path, DatabaseSource table)
+DATASETS = {
+    'students': ('students_ml.csv', 'students'),
+    'quiz_attempts': ('quiz_attempts_ml.csv', 'quiz_attempts'),
+    'mastery_labels': ('mastery_labels_ml.csv', 'mastery_scores'),
+    'project_activities': ('project_activities_ml.csv', 'project_activity'),
+    'engagement_logs': ('engagement_logs_ml.csv', 'engagement_logs')
+}
+
+# Column dtypes per dataset. Repeated strings (IDs, enumerations) are
+# categoricals; integers are narrowed only where the schema bounds them
+# (read_csv wraps out-of-range values silently) and must be NOT NULL;
+# nullable or REAL bounded fields are float32. Columns not listed (row
+# ids, timestamps, names) keep pandas' defaults.
+PROFILE_DTYPES = {
+    'grade': 'uint8',
+    'section': 'category',
+    'institution_id': 'category',
+    'baseline_proficiency': 'float32',
+    'learning_pace': 'category',
+    'preferred_learning_style': 'category'
+}
+
+# The CSVs in ml/datasets repeat the student profile on every dataset
+SCHEMAS = {
+    'students': dict(PROFILE_DTYPES, student_id='category'),
+    'quiz_attempts': dict(
+        PROFILE_DTYPES,
+        student_id='category',
+        subject='category',
+        topic='category',
+        quiz_id='category',
+        difficulty_level='category',
+        quiz_score='uint8',
+        time_taken_seconds='int32',
+        number_of_attempts='int32',
+        previous_mastery_score='float32'
+    ),
+    'mastery_labels': dict(
+        PROFILE_DTYPES,
+        student_id='category',
+        subject='category',
+        topic='category',
+        mastery_level='category',
+        final_mastery_score='uint8',
+        predicted_mastery_score='float32'
+    ),
+    'project_activities': dict(
+        PROFILE_DTYPES,
+        project_id='category',
+        student_id='category',
+        team_id='category',
+        role_in_team='category',
+        tasks_completed='float32',
+        peer_review_score='float32',
+        communication_score='float32',
+        collaboration_score='float32',
+        creativity_score='float32',
+        project_completion_pct='float32'
+    ),
+    'engagement_logs': dict(
+        PROFILE_DTYPES,
+        student_id='category',
+        session_id='category',
+        activity_type='category',
+        duration_seconds='float32',
+        interaction_count='float32',
+        engagement_score='float32'
+    )
+}
+
+# Student profile columns the features use
+PROFILE_FEATURES = ['grade', 'learning_pace', 'preferred_learning_style', 'baseline_proficiency']
+
+
+def memory_footprint(df):
+    """
+    Deep bytes of df as loaded, and what it would take read with pandas'
+    default dtypes: 8 per number, and a pointer plus a string object per
+    text value
+
+    Returns:
+        (bytes, default_bytes)
+    """
+    usage = df.memory_usage(deep=True)
+    default_bytes = usage['Index']
+    for column in df.columns:
+        series = df[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            categories = series.cat.categories.to_numpy(dtype=object)
+            default_bytes += 8 * len(series)
+            # Text that all parses as numbers would have been read as numbers
+            # (the first category usually settles it)
+            numeric = (pd.to_numeric(pd.Series(categories[:1]), errors='coerce').notna().all()
+                       and pd.to_numeric(pd.Series(categories), errors='coerce').notna().all())
+            if not numeric:
+                # Code -1 (missing) picks the NaN at the end
+                sizes = np.fromiter(map(sys.getsizeof, categories), dtype=np.int64, count=len(categories))
+                sizes = np.append(sizes, sys.getsizeof(np.nan))
+                default_bytes += int(sizes[series.cat.codes.to_numpy()].sum())
+        elif series.dtype.kind in 'iuf':
+            default_bytes += 8 * len(series)
+        else:
+            default_bytes += usage[column]
+    return int(usage.sum()), int(default_bytes)
+
+
+def label_encode(series, encoder=None):
+    """
+    LabelEncoder codes for series.astype(str), fitting a new encoder when
+    none is given. Categoricals are converted and encoded once per
+    category present rather than once per row; the codes and classes are
+    the same either way.
+
+    Returns:
+        (codes, encoder)
+    """
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        if encoder is None:
+            encoder = LabelEncoder()
+            return encoder.fit_transform(series.astype(str)), encoder
+        return encoder.transform(series.astype(str)), encoder
+    
+    codes = series.cat.codes.to_numpy()
+    present = np.unique(codes)
+    labels = pd.Series(pd.Categorical.from_codes(present, dtype=series.dtype)).astype(str)
+    if encoder is None:
+        encoder = LabelEncoder().fit(labels)
+    # Shifted by one so code -1 (missing) has a slot
+    lookup = np.zeros(len(series.cat.categories) + 1, dtype=np.int64)
+    lookup[present + 1] = encoder.transform(labels)
+    return lookup[codes + 1], encoder
+
+
 class AMEPDataProcessor:
     """Centralized data processor for all AMEP datasets"""
     
-    def __init__(self, data_path='../datasets/'):
+    def __init__(self, data_path='../datasets/', source=None):
+        """
+        Args:
+            source (DatabaseSource): read the app database's tables through
+                                     this snapshot instead of the CSVs in
+                                     data_path (see db_source.py)
+        """
         self.data_path = data_path
+        self.source = source
         self.label_encoders = {}
         self.scalers = {}
         
-    def load_datasets(self):
-        """Load all CSV datasets"""
+    def load_datasets(self, sync=True):
+        """Load all datasets (CSVs, or the database snapshot; see load_from_source)"""
+        if self.source is not None:
+            return self.load_from_source(sync)
+        
         print("Loading datasets...")
         
-        self.students = pd.read_csv(f'{self.data_path}students_ml.csv')
-        self.quiz_attempts = pd.read_csv(f'{self.data_path}quiz_attempts_ml.csv')
-        self.mastery_labels = pd.read_csv(f'{self.data_path}mastery_labels_ml.csv')
-        self.project_activities = pd.read_csv(f'{self.data_path}project_activities_ml.csv')
-        self.engagement_logs = pd.read_csv(f'{self.data_path}engagement_logs_ml.csv')
+        for name, (file_name, _) in DATASETS.items():
+            setattr(self, name, pd.read_csv(f'{self.data_path}{file_name}', dtype=SCHEMAS[name]))
         
+        self.align_categories()
+        self.print_counts()
+        self.print_memory_report()
+        return self
+    
+    def load_from_source(self, sync=True):
+        """Pull new rows from the database into the snapshot (unless sync=False), then load it"""
+        if sync:
+            self.sync_source()
+        
+        for name, (_, table) in DATASETS.items():
+            setattr(self, name, self.source.read(table, dtype=SCHEMAS[name]))
+        
+        self.align_categories()
+        self.print_counts()
+        self.print_memory_report()
+        return self
+    
+    def sync_source(self):
+        """Pull the database's new rows into the source's snapshot"""
+        from db_source import format_sync
+        
+        print(f"Syncing training snapshot from {self.source.db_path}...")
+        stats = self.source.sync()
+        for line in format_sync(stats):
+            print(line)
+        return stats
+    
+    def align_categories(self):
+        """
+        Give a categorical column the same categories in every dataset
+        that has it, so merges on it (and the merged frames) stay
+        categorical instead of falling back to strings
+        """
+        frames = [getattr(self, name) for name in DATASETS]
+        columns = {c for df in frames for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)}
+        for column in columns:
+            # Empty datasets are never merged; skip carrying the categories
+            shared = [df for df in frames if len(df) and column in df.columns
+                      and isinstance(df[column].dtype, pd.CategoricalDtype)]
+            if len(shared) < 2:
+                continue
+            categories = shared[0][column].cat.categories
+            for df in shared[1:]:
+                categories = categories.union(df[column].cat.categories)
+            for df in shared:
+                if not df[column].cat.categories.equals(categories):
+                    df[column] = df[column].cat.set_categories(categories)
+    
+    def memory_report(self):
+        """Deep bytes per dataset as loaded, and with pandas' default dtypes"""
+        report = {}
+        for name in DATASETS:
+            df = getattr(self, name)
+            size, default_size = memory_footprint(df)
+            report[name] = {'rows': len(df), 'default_bytes': default_size, 'bytes': size}
+        return report
+    
+    def print_memory_report(self):
+        report = self.memory_report()
+        print("Memory by dataset (deep; default dtypes -> schema dtypes):")
+        for name, entry in report.items():
+            change = entry['bytes'] / entry['default_bytes'] - 1 if entry['default_bytes'] else 0
+            print(f"  {name:<20} {entry['default_bytes'] / 2**20:>10.1f} MiB -> "
+                  f"{entry['bytes'] / 2**20:>8.1f} MiB  ({change:+.0%})")
+        before = sum(e['default_bytes'] for e in report.values())
+        after = sum(e['bytes'] for e in report.values())
+        print(f"  {'total':<20} {before / 2**20:>10.1f} MiB -> {after / 2**20:>8.1f} MiB")
+        return report
+    
+    def print_counts(self):
         print(f"Students: {len(self.students)} records")
         print(f"Quiz Attempts: {len(self.quiz_attempts)} records")
         print(f"Mastery Labels: {len(self.mastery_labels)} records")
         print(f"Project Activities: {len(self.project_activities)} records")
         print(f"Engagement Logs: {len(self.engagement_logs)} records")
-        
-        return self
     
     def prepare_mastery_features(self):
         """
@@ -41,10 +253,19 @@ class AMEPDataProcessor:
         """
         print("\n=== Preparing Mastery Prediction Dataset ===")
         
+        # Only the columns the features use go through the merges; the
+        # reindex and each merge build new frames, so the loaded quiz
+        # attempts are never copied whole or modified
+        quiz_columns = [
+            'student_id', 'subject', 'topic', 'quiz_score', 'time_taken_seconds', 'number_of_attempts',
+            'difficulty_level', 'previous_mastery_score', 'final_mastery_score'
+        ] + PROFILE_FEATURES
+        df = self.quiz_attempts.reindex(columns=[c for c in quiz_columns if c in self.quiz_attempts.columns])
+        
         # Merge quiz attempts with student data (if not already merged)
-        df = self.quiz_attempts.copy()
         if 'grade' not in df.columns:
-            df = df.merge(self.students, on='student_id', how='left')
+            profile = ['student_id'] + [c for c in PROFILE_FEATURES if c in self.students.columns]
+            df = df.merge(self.students[profile], on='student_id', how='left')
         
         # Merge with mastery labels
         if 'final_mastery_score' not in df.columns:
@@ -55,16 +276,14 @@ class AMEPDataProcessor:
             )
         
         # Feature engineering
-        features = df.copy()
+        features = df
         
         # Encode categorical variables
         categorical_cols = ['subject', 'topic', 'difficulty_level', 'learning_pace', 'preferred_learning_style']
         
         for col in categorical_cols:
             if col in features.columns:
-                le = LabelEncoder()
-                features[f'{col}_encoded'] = le.fit_transform(features[col].astype(str))
-                self.label_encoders[col] = le
+                features[f'{col}_encoded'], self.label_encoders[col] = label_encode(features[col])
         
         # Select numeric features
         feature_columns = [
@@ -97,7 +316,10 @@ class AMEPDataProcessor:
         """
         print("\n=== Preparing Engagement Prediction Dataset ===")
         
-        df = self.project_activities.merge(self.students, on='student_id', how='left')
+        # Student columns the features and encoders below use
+        profile = [c for c in ['student_id', 'grade', 'section', 'preferred_learning_style', 'learning_pace']
+                   if c in self.students.columns]
+        df = self.project_activities.merge(self.students[profile], on='student_id', how='left')
         
         # Calculate Engagement Index (0-100)
         df['engagement_index'] = (
@@ -113,12 +335,7 @@ class AMEPDataProcessor:
         
         for col in categorical_cols:
             if col in df.columns:
-                if col not in self.label_encoders:
-                    le = LabelEncoder()
-                    df[f'{col}_encoded'] = le.fit_transform(df[col].astype(str))
-                    self.label_encoders[col] = le
-                else:
-                    df[f'{col}_encoded'] = self.label_encoders[col].transform(df[col].astype(str))
+                df[f'{col}_encoded'], self.label_encoders[col] = label_encode(df[col], self.label_encoders.get(col))
         
         feature_columns = [
             'tasks_completed', 'peer_review_score', 'communication_score',
@@ -144,7 +361,7 @@ class AMEPDataProcessor:
         print("\n=== Preparing Task Recommendation Dataset ===")
         
         # Aggregate student performance
-        mastery_avg = self.mastery_labels.groupby('student_id').agg({
+        mastery_avg = self.mastery_labels.groupby('student_id', observed=True).agg({
             'final_mastery_score': 'mean'
         }).reset_index()
         mastery_avg.columns = ['student_id', 'avg_mastery_score']
@@ -154,7 +371,7 @@ class AMEPDataProcessor:
         
         # Add project performance if available
         if len(self.project_activities) > 0:
-            project_avg = self.project_activities.groupby('student_id').agg({
+            project_avg = self.project_activities.groupby('student_id', observed=True).agg({
                 'peer_review_score': 'mean',
                 'tasks_completed': 'sum'
             }).reset_index()
@@ -173,12 +390,7 @@ class AMEPDataProcessor:
         categorical_cols = ['grade', 'section', 'preferred_learning_style', 'learning_pace']
         
         for col in categorical_cols:
-            if col not in self.label_encoders:
-                le = LabelEncoder()
-                df[f'{col}_encoded'] = le.fit_transform(df[col].astype(str))
-                self.label_encoders[col] = le
-            else:
-                df[f'{col}_encoded'] = self.label_encoders[col].transform(df[col].astype(str))
+            df[f'{col}_encoded'], self.label_encoders[col] = label_encode(df[col], self.label_encoders.get(col))
         
         feature_columns = [
             'avg_mastery_score', 'grade',
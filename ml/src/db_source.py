@@ -0,0 +1,346 @@
+"""
+Database-backed training data for the AMEP models
+
+DatabaseSource mirrors the app's tables from smarted.db into a local
+training snapshot (one CSV per dataset, named like the files in
+ml/datasets/) and AMEPDataProcessor reads the snapshot instead of the
+hand-maintained CSVs.
+
+Every table is streamed in chunks of chunk_rows with keyset queries, each
+a short read of its own, and written straight to the snapshot file, so
+peak memory depends on the chunk size and not on the table size. A
+high-water mark per table (sync_state.json) makes later runs pull only
+what is new:
+
+    append   event tables (quiz_attempts, project_activity,
+             engagement_logs): rows past the last integer id / rowid are
+             appended
+    updated  mastery_scores, which is updated in place: rows past the last
+             (updated_at, mastery_id) are appended and later copies of a
+             row replace earlier ones when the snapshot is read. Deletes
+             leave a tombstone in mastery_score_deletes (migration 0013),
+             pulled as an append table; read() drops those labels
+    refresh  students (profiles change and carry no change time; one row
+             per student): streamed again in full every run
+
+The state records each file's size after every committed chunk, so a run
+that dies mid-chunk is truncated back to the last good row next time. A
+table whose mark no longer matches the database (the mark's row gone or
+its rowid renumbered by VACUUM, another database) is rebuilt from scratch.
+Event tables are append-only: an event row deleted from the middle of a
+table stays in the snapshot until the next --full sync.
+
+The database must be migrated through SYNC_SCHEMA_VERSION (epoch time
+columns, the updated_at index and the delete tombstones); sync() raises
+SchemaError otherwise rather than pulling from text timestamps.
+
+Usage (from ml/src):
+    python db_source.py                       sync the snapshot
+    python db_source.py --full --chunk-rows 20000 --db ../../database/smarted.db
+"""
+
+import os
+import csv
+import json
+import time
+import sqlite3
+import argparse
+
+import pandas as pd
+
+from stage_report import peak_rss_mib
+
+_ML_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DB_PATH = os.environ.get('DATABASE_PATH') or os.path.join(os.path.dirname(_ML_DIR), 'database', 'smarted.db')
+DEFAULT_SNAPSHOT_PATH = os.path.join(_ML_DIR, 'datasets', 'snapshot', '')
+DEFAULT_CHUNK_ROWS = int(os.environ.get('AMEP_SYNC_CHUNK_ROWS', 20000))
+
+STATE_FILE = 'sync_state.json'
+
+# Lowest schema_migrations version the sync can read (0013_mastery_score_deletes)
+SYNC_SCHEMA_VERSION = 13
+
+# mastery_scores rows stamped this recently may still have uncommitted
+# neighbours with the same or an earlier updated_at; leave them for the
+# next run
+SETTLE_SECONDS = 60
+
+# Snapshot file, pulled columns and sync mode per table; cursor is the
+# high-water column, identity a column whose value pins the cursor row
+TABLES = {
+    'students': {
+        'file': 'students_ml.csv',
+        'mode': 'refresh',
+        'cursor': 'student_id',
+        'columns': ['student_id', 'grade', 'section', 'institution_id', 'baseline_proficiency',
+                    'learning_pace', 'preferred_learning_style', 'created_at']
+    },
+    'quiz_attempts': {
+        'file': 'quiz_attempts_ml.csv',
+        'mode': 'append',
+        'cursor': 'rowid',
+        'identity': 'attempt_id',
+        'columns': ['attempt_id', 'student_id', 'subject', 'topic', 'quiz_id', 'quiz_score', 'time_taken_seconds',
+                    'number_of_attempts', 'difficulty_level', 'previous_mastery_score', 'timestamp']
+    },
+    'mastery_scores': {
+        'file': 'mastery_labels_ml.csv',
+        'mode': 'updated',
+        'cursor': 'mastery_id',
+        'columns': ['mastery_id', 'student_id', 'subject', 'topic', 'final_mastery_score', 'mastery_level',
+                    'updated_at']
+    },
+    'mastery_score_deletes': {
+        'file': 'mastery_label_deletes_ml.csv',
+        'mode': 'append',
+        'cursor': 'delete_id',
+        'columns': ['delete_id', 'mastery_id', 'deleted_at']
+    },
+    'project_activity': {
+        'file': 'project_activities_ml.csv',
+        'mode': 'append',
+        'cursor': 'activity_id',
+        'columns': ['activity_id', 'project_id', 'student_id', 'team_id', 'role_in_team', 'tasks_completed',
+                    'peer_review_score', 'communication_score', 'collaboration_score', 'creativity_score',
+                    'project_completion_pct', 'created_at']
+    },
+    'engagement_logs': {
+        'file': 'engagement_logs_ml.csv',
+        'mode': 'append',
+        'cursor': 'log_id',
+        'columns': ['log_id', 'student_id', 'session_id', 'activity_type', 'duration_seconds', 'interaction_count',
+                    'engagement_score', 'timestamp']
+    }
+}
+
+
+class SchemaError(Exception):
+    """Database not migrated far enough for the training sync"""
+
+
+class DatabaseSource:
+    """Incremental, chunked mirror of the training tables"""
+
+    def __init__(self, db_path=None, snapshot_path=None, chunk_rows=None):
+        self.db_path = db_path or DEFAULT_DB_PATH
+        self.snapshot_path = os.path.join(snapshot_path or DEFAULT_SNAPSHOT_PATH, '')
+        self.chunk_rows = max(1, int(chunk_rows or DEFAULT_CHUNK_ROWS))
+        os.makedirs(self.snapshot_path, exist_ok=True)
+
+    def sync(self, full=False):
+        """
+        Bring the snapshot up to date (from scratch with full=True)
+
+        Returns:
+            dict: per-table rows pulled, snapshot rows and seconds, plus
+                  total seconds and peak RSS
+        Raises:
+            SchemaError: the database is missing migrations the sync needs
+        """
+        started = time.perf_counter()
+        state = self._load_state()
+        if full or state.get('database') != os.path.abspath(self.db_path):
+            state = {'database': os.path.abspath(self.db_path), 'tables': {}}
+
+        conn = sqlite3.connect(f'file:{self.db_path}?mode=ro', uri=True)
+        stats = {'tables': {}}
+        try:
+            self._check_schema(conn)
+            for table, spec in TABLES.items():
+                table_started = time.perf_counter()
+                if spec['mode'] == 'refresh':
+                    table_stats = self._refresh(conn, table, spec, state)
+                else:
+                    table_stats = self._pull(conn, table, spec, state)
+                table_stats['seconds'] = round(time.perf_counter() - table_started, 3)
+                stats['tables'][table] = table_stats
+        finally:
+            conn.close()
+
+        state['synced_at'] = int(time.time())
+        self._save_state(state)
+        stats['seconds'] = round(time.perf_counter() - started, 3)
+        stats['peak_rss_mib'] = peak_rss_mib()
+        return stats
+
+    def read(self, table, dtype=None):
+        """
+        The table's snapshot as a DataFrame, latest copy of each updated
+        row and none of the deleted ones; dtype is passed to read_csv
+        """
+        spec = TABLES[table]
+        df = pd.read_csv(self._path(spec), dtype=dtype)
+        if spec['mode'] == 'updated':
+            df = df.drop_duplicates(subset=spec['cursor'], keep='last')
+            deletes = self._path(TABLES['mastery_score_deletes'])
+            if os.path.exists(deletes):
+                deleted = pd.read_csv(deletes, usecols=['mastery_id'])['mastery_id']
+                df = df[~df[spec['cursor']].isin(deleted)]
+            df = df.reset_index(drop=True)
+        return df
+
+    def _check_schema(self, conn):
+        """Raise SchemaError unless the database has SYNC_SCHEMA_VERSION applied"""
+        try:
+            (version,) = conn.execute("SELECT MAX(version) FROM schema_migrations").fetchone()
+        except sqlite3.OperationalError:
+            version = None
+        if version is None or version < SYNC_SCHEMA_VERSION:
+            raise SchemaError(
+                f"{self.db_path} is at schema version {version or 0}; the training sync needs "
+                f"migration {SYNC_SCHEMA_VERSION:04d} or later; apply them from backend/ with "
+                f"DATABASE_PATH={self.db_path} python -m utils.migrations"
+            )
+
+    def _pull(self, conn, table, spec, state):
+        """Append the rows past the table's mark (append / updated modes)"""
+        path = self._path(spec)
+        mark = state['tables'].get(table)
+        rebuilt = mark is None or not self._mark_valid(conn, table, spec, mark, path)
+        if rebuilt:
+            mark = {'cursor': None, 'identity': None, 'bytes': 0, 'rows': 0}
+
+        cursor = spec['cursor']
+        select = ', '.join([cursor] + [c for c in spec['columns'] if c != cursor])
+        if spec['mode'] == 'updated':
+            # Finish the rows sharing the mark's updated_at, then move on;
+            # each half is an index seek (one row-value range is not)
+            query = (f"SELECT updated_at, {select} FROM {table} "
+                     f"WHERE updated_at = ? AND {cursor} > ? ORDER BY {cursor} LIMIT ?")
+            next_query = (f"SELECT updated_at, {select} FROM {table} "
+                          f"WHERE updated_at > ? AND updated_at <= ? ORDER BY updated_at, {cursor} LIMIT ?")
+            position = mark['cursor'] or [-1, -1]
+            settled = int(time.time()) - SETTLE_SECONDS
+        else:
+            query = f"SELECT {select} FROM {table} WHERE {cursor} > ? ORDER BY {cursor} LIMIT ?"
+            position = -1 if mark['cursor'] is None else mark['cursor']
+        # Which pulled column goes where in the snapshot's column order
+        offset = 1 if spec['mode'] == 'updated' else 0
+        pulled_columns = select.split(', ')
+        order = [pulled_columns.index(c) + offset for c in spec['columns']]
+
+        pulled = 0
+        with open(path, 'a+', newline='') as f:
+            f.truncate(mark['bytes'])
+            f.seek(mark['bytes'])
+            writer = csv.writer(f)
+            if mark['bytes'] == 0:
+                writer.writerow(spec['columns'])
+            while True:
+                if spec['mode'] == 'updated':
+                    rows = (conn.execute(query, (position[0], position[1], self.chunk_rows)).fetchall()
+                            or conn.execute(next_query, (position[0], settled, self.chunk_rows)).fetchall())
+                else:
+                    rows = conn.execute(query, (position, self.chunk_rows)).fetchall()
+                if not rows:
+                    break
+                writer.writerows([row[i] for i in order] for row in rows)
+                last = rows[-1]
+                position = [last[0], last[1]] if spec['mode'] == 'updated' else last[0]
+                pulled += len(rows)
+
+                # Commit the chunk: data on disk first, then the mark
+                f.flush()
+                os.fsync(f.fileno())
+                mark = {
+                    'cursor': position,
+                    'identity': last[pulled_columns.index(spec['identity']) + offset] if spec.get('identity') else None,
+                    'bytes': f.tell(),
+                    'rows': mark['rows'] + len(rows)
+                }
+                state['tables'][table] = mark
+                self._save_state(state)
+            if mark['bytes'] == 0:
+                # Empty table: keep the header as the committed state
+                f.flush()
+                mark = dict(mark, bytes=f.tell())
+                state['tables'][table] = mark
+
+        return {'mode': spec['mode'], 'pulled': pulled, 'rows': mark['rows'], 'rebuilt': rebuilt}
+
+    def _mark_valid(self, conn, table, spec, mark, path):
+        """False if the snapshot file or the database moved out from under the mark"""
+        if not os.path.exists(path) or os.path.getsize(path) < mark['bytes']:
+            return False
+        if mark['cursor'] is None:
+            return True
+        cursor = spec['cursor']
+        if spec['mode'] == 'updated':
+            # Rewritten labels make the mark drift from the live table size;
+            # rebuild once the snapshot holds twice as many rows as the table
+            (count,) = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
+            return mark['rows'] <= 2 * max(count, 1)
+        (highest,) = conn.execute(f"SELECT MAX({cursor}) FROM {table}").fetchone()
+        if highest is None or highest < mark['cursor']:
+            return False
+        if spec.get('identity'):
+            row = conn.execute(f"SELECT {cursor} FROM {table} WHERE {spec['identity']} = ?",
+                               (mark['identity'],)).fetchone()
+            return row is not None and row[0] == mark['cursor']
+        return True
+
+    def _refresh(self, conn, table, spec, state):
+        """Stream the whole table into a new file and swap it in"""
+        path = self._path(spec)
+        cursor = spec['cursor']
+        query = (f"SELECT {', '.join(spec['columns'])} FROM {table} "
+                 f"WHERE {cursor} > ? ORDER BY {cursor} LIMIT ?")
+        position = spec['columns'].index(cursor)
+
+        pulled, last = 0, ''
+        with open(path + '.tmp', 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(spec['columns'])
+            while True:
+                rows = conn.execute(query, (last, self.chunk_rows)).fetchall()
+                if not rows:
+                    break
+                writer.writerows(rows)
+                last = rows[-1][position]
+                pulled += len(rows)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+        state['tables'][table] = {'cursor': None, 'identity': None, 'bytes': os.path.getsize(path), 'rows': pulled}
+        return {'mode': spec['mode'], 'pulled': pulled, 'rows': pulled, 'rebuilt': True}
+
+    def _path(self, spec):
+        return f"{self.snapshot_path}{spec['file']}"
+
+    def _load_state(self):
+        try:
+            with open(f'{self.snapshot_path}{STATE_FILE}') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _save_state(self, state):
+        path = f'{self.snapshot_path}{STATE_FILE}'
+        with open(path + '.tmp', 'w') as f:
+            json.dump(state, f, indent=2)
+        os.replace(path + '.tmp', path)
+
+
+def format_sync(stats):
+    """Report lines for a sync"""
+    lines = [f"  {'table':<22} {'mode':<8} {'pulled':>10} {'snapshot rows':>14} {'seconds':>8}"]
+    for table, s in stats['tables'].items():
+        note = ' (rebuilt)' if s['rebuilt'] and s['mode'] != 'refresh' else ''
+        lines.append(f"  {table:<22} {s['mode']:<8} {s['pulled']:>10,} {s['rows']:>14,} {s['seconds']:>8.2f}{note}")
+    lines.append(f"  total {stats['seconds']:.2f}s, peak RSS {stats['peak_rss_mib']} MiB")
+    return lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync the local training snapshot from the app database")
+    parser.add_argument('--db', default=None, help=f"database (default {DEFAULT_DB_PATH})")
+    parser.add_argument('--snapshot', default=None, help=f"snapshot folder (default {DEFAULT_SNAPSHOT_PATH})")
+    parser.add_argument('--chunk-rows', type=int, default=None,
+                        help=f"rows per read/write chunk (default {DEFAULT_CHUNK_ROWS}, or AMEP_SYNC_CHUNK_ROWS)")
+    parser.add_argument('--full', action='store_true', help="discard the snapshot and pull everything")
+    args = parser.parse_args()
+
+    source = DatabaseSource(args.db, args.snapshot, args.chunk_rows)
+    print(f"Syncing {source.db_path} -> {source.snapshot_path}")
+    for line in format_sync(source.sync(full=args.full)):
+        print(line)
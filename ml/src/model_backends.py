@@ -0,0 +1,164 @@
+"""
+Model backends for the AMEP models
+
+A backend is a family of estimators the trainer can fit for each model:
+
+    sklearn    GradientBoostingRegressor / RandomForest* (exact splits; the
+               original models, served through tree_export's flat evaluator)
+    hist       sklearn's HistGradientBoosting* (binned features, OpenMP)
+    lightgbm   LGBMRegressor / LGBMClassifier
+    xgboost    XGBRegressor / XGBClassifier (tree_method='hist')
+
+Every backend's estimators follow the sklearn fit/predict/predict_proba
+API and pickle with joblib. Classes are imported on first use, so the
+optional libraries are only needed by whoever trains or serves a model on
+them. The backend each model was trained on is recorded in the model
+metadata and the registry manifest, which is how AMEPPredictor knows what
+it needs before unpickling anything.
+"""
+
+import importlib
+from contextlib import nullcontext
+
+DEFAULT_BACKEND = 'sklearn'
+
+# backend -> model name -> (module, estimator class, default params)
+BACKENDS = {
+    'sklearn': {
+        'mastery': ('sklearn.ensemble', 'GradientBoostingRegressor',
+                    dict(n_estimators=100, learning_rate=0.1, max_depth=5, random_state=42)),
+        'engagement': ('sklearn.ensemble', 'RandomForestRegressor',
+                       dict(n_estimators=100, max_depth=10, min_samples_split=5, random_state=42)),
+        'recommendation': ('sklearn.ensemble', 'RandomForestClassifier',
+                           dict(n_estimators=100, max_depth=8, min_samples_split=5, random_state=42))
+    },
+    'hist': {
+        'mastery': ('sklearn.ensemble', 'HistGradientBoostingRegressor',
+                    dict(max_iter=200, learning_rate=0.1, max_leaf_nodes=31, early_stopping=False, random_state=42)),
+        'engagement': ('sklearn.ensemble', 'HistGradientBoostingRegressor',
+                       dict(max_iter=200, learning_rate=0.1, max_leaf_nodes=31, early_stopping=False, random_state=42)),
+        'recommendation': ('sklearn.ensemble', 'HistGradientBoostingClassifier',
+                           dict(max_iter=200, learning_rate=0.1, max_leaf_nodes=31, early_stopping=False,
+                                random_state=42))
+    },
+    'lightgbm': {
+        'mastery': ('lightgbm', 'LGBMRegressor',
+                    dict(n_estimators=200, learning_rate=0.1, num_leaves=31, random_state=42, verbose=-1)),
+        'engagement': ('lightgbm', 'LGBMRegressor',
+                       dict(n_estimators=200, learning_rate=0.1, num_leaves=31, random_state=42, verbose=-1)),
+        'recommendation': ('lightgbm', 'LGBMClassifier',
+                           dict(n_estimators=200, learning_rate=0.1, num_leaves=31, random_state=42, verbose=-1))
+    },
+    'xgboost': {
+        'mastery': ('xgboost', 'XGBRegressor',
+                    dict(n_estimators=200, learning_rate=0.1, max_depth=6, tree_method='hist', random_state=42)),
+        'engagement': ('xgboost', 'XGBRegressor',
+                       dict(n_estimators=200, learning_rate=0.1, max_depth=6, tree_method='hist', random_state=42)),
+        'recommendation': ('xgboost', 'XGBClassifier',
+                           dict(n_estimators=200, learning_rate=0.1, max_depth=6, tree_method='hist',
+                                random_state=42))
+    }
+}
+
+# Backends whose models tree_export can flatten and serve memory-mapped
+FLAT_BACKENDS = ('sklearn',)
+
+# Backends whose estimators have no n_jobs and size OpenMP's global pool
+OPENMP_BACKENDS = ('hist',)
+
+
+class BackendUnavailable(ImportError):
+    """A model backend whose library is not installed"""
+
+
+def backend_module(backend):
+    """The library a backend needs"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown model backend {backend!r} (choose from {', '.join(BACKENDS)})")
+    return next(iter(BACKENDS[backend].values()))[0].split('.')[0]
+
+
+def available_backends():
+    """Backends whose library imports here"""
+    available = []
+    for backend in BACKENDS:
+        try:
+            importlib.import_module(backend_module(backend))
+        except ImportError:
+            continue
+        available.append(backend)
+    return available
+
+
+def require_backends(backends):
+    """
+    Import the libraries of the given backends ({model name: backend})
+
+    Raises:
+        BackendUnavailable: naming the first model whose library is missing
+    """
+    for model_name, backend in (backends or {}).items():
+        module = backend_module(backend)
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            raise BackendUnavailable(
+                f"The {model_name} model was trained on the {backend} backend; install {module} to load it"
+            ) from e
+
+
+def estimator_class(backend, model_name):
+    module, class_name, _ = BACKENDS[backend][model_name]
+    require_backends({model_name: backend})
+    return getattr(importlib.import_module(module), class_name)
+
+
+def make_estimator(backend, model_name, params=None, n_jobs=None):
+    """
+    An unfitted estimator for a model on a backend: the backend's defaults
+    updated with params (in the backend's own parameter names), plus
+    n_jobs where the estimator has one
+    """
+    if model_name not in BACKENDS.get(backend, {}):
+        backend_module(backend)
+        raise ValueError(f"Unknown model {model_name!r}")
+    cls = estimator_class(backend, model_name)
+    settings = dict(BACKENDS[backend][model_name][2])
+    settings.update(params or {})
+    if n_jobs is not None and 'n_jobs' in cls().get_params():
+        settings['n_jobs'] = n_jobs
+    return cls(**settings)
+
+
+def thread_limit(backend, n_jobs):
+    """
+    Context capping OpenMP threads for backends without an n_jobs knob
+    (a no-op for the others, or for n_jobs of None / -1)
+    """
+    if backend not in OPENMP_BACKENDS or n_jobs is None or n_jobs < 1:
+        return nullcontext()
+    from threadpoolctl import threadpool_limits
+    return threadpool_limits(limits=n_jobs, user_api='openmp')
+
+
+def parse_backends(spec, model_names=None):
+    """
+    '--backend' value -> {model name: backend}: either one backend for
+    every model ('hist') or per-model choices ('mastery=lightgbm,engagement=hist')
+    """
+    model_names = list(model_names or BACKENDS[DEFAULT_BACKEND])
+    if not spec:
+        return {}
+    if '=' not in spec:
+        backend_module(spec)
+        return {model_name: spec for model_name in model_names}
+
+    backends = {}
+    for part in spec.split(','):
+        model_name, _, backend = part.partition('=')
+        model_name, backend = model_name.strip(), backend.strip()
+        if model_name not in model_names:
+            raise ValueError(f"Unknown model {model_name!r} in backend spec (choose from {', '.join(model_names)})")
+        backend_module(backend)
+        backends[model_name] = backend
+    return backends
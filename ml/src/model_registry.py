@@ -0,0 +1,233 @@
+"""
+Versioned model registry for the AMEP platform
+
+Layout under ml/models/registry/:
+    CURRENT                 name of the active version
+    <version>/              one immutable folder per training run
+        manifest.json       files (size + sha256), feature columns, metrics,
+                            each model's backend (model_backends.py)
+        *.pkl               pickled models, metadata and encoders
+        *.trees             memory-mappable flattened ensembles (tree_export.py),
+                            for the models on a backend it can flatten
+        label_classes.json  encoder classes for the feature plans
+
+A version is written into a hidden staging folder and only renamed into
+place once every artifact and the manifest are on disk, and CURRENT is
+replaced atomically, so readers never see a half-written version.
+"""
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+from datetime import datetime
+
+REGISTRY_DIR = 'registry'
+CURRENT_FILE = 'CURRENT'
+MANIFEST_FILE = 'manifest.json'
+STAGING_PREFIX = '.staging-'
+
+MODEL_ARTIFACTS = (
+    'mastery_predictor.pkl',
+    'engagement_predictor.pkl',
+    'task_recommender.pkl'
+)
+ARTIFACT_FILES = MODEL_ARTIFACTS + ('model_metadata.pkl', 'label_encoders.pkl')
+
+
+class RegistryError(Exception):
+    """Missing, incomplete or corrupted registry version"""
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def version_path(registry_path, version):
+    _check_name(version)
+    return os.path.join(registry_path, version, '')
+
+
+def new_version_id(registry_path):
+    """Timestamped version name that is not taken yet"""
+    base = datetime.utcnow().strftime('v%Y%m%d-%H%M%S')
+    version, n = base, 1
+    while os.path.exists(os.path.join(registry_path, version)):
+        n += 1
+        version = f'{base}-{n}'
+    return version
+
+
+def stage_version(registry_path, version=None):
+    """
+    Create an empty staging folder for a new version
+
+    Returns:
+        tuple: (version, staging folder path with trailing separator)
+    """
+    os.makedirs(registry_path, exist_ok=True)
+    version = version or new_version_id(registry_path)
+    staging = os.path.join(registry_path, STAGING_PREFIX + version, '')
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    return version, staging
+
+
+def publish_version(registry_path, staging, version, feature_columns=None, metrics=None, make_current=True,
+                    backends=None):
+    """
+    Checksum the staged artifacts, write the manifest and move the folder
+    into place; optionally point CURRENT at it. backends records the
+    model_backends backend of each model (omitted means sklearn)
+
+    Returns:
+        dict: the manifest
+    """
+    for filename in ARTIFACT_FILES:
+        if not os.path.exists(os.path.join(staging, filename)):
+            raise RegistryError(f"Staged version {version} is missing {filename}")
+
+    # Every staged file is part of the version, required or not
+    files = {}
+    for filename in sorted(os.listdir(staging)):
+        path = os.path.join(staging, filename)
+        with open(path, 'rb') as f:
+            os.fsync(f.fileno())
+        files[filename] = {'size': os.path.getsize(path), 'sha256': file_sha256(path)}
+
+    manifest = {
+        'version': version,
+        'created_at': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'files': files,
+        'feature_columns': {name: [str(c) for c in cols] for name, cols in (feature_columns or {}).items()},
+        'metrics': _jsonable(metrics or {}),
+        'backends': dict(backends or {})
+    }
+    _write_atomic(os.path.join(staging, MANIFEST_FILE), json.dumps(manifest, indent=2))
+
+    os.rename(staging, os.path.join(registry_path, version))
+    if make_current:
+        set_current(registry_path, version)
+    return manifest
+
+
+def import_flat_models(models_path, registry_path, version=None, make_current=True, export=True):
+    """
+    Snapshot the legacy flat ml/models/*.pkl files as a registry version,
+    adding the memory-mappable tree exports unless export=False
+    """
+    version, staging = stage_version(registry_path, version)
+    for filename in ARTIFACT_FILES:
+        shutil.copy2(os.path.join(models_path, filename), staging)
+    if export:
+        from tree_export import export_models
+        export_models(staging, MODEL_ARTIFACTS, 'label_encoders.pkl')
+    return publish_version(registry_path, staging, version, make_current=make_current)
+
+
+def set_current(registry_path, version):
+    """Atomically point CURRENT at an existing version"""
+    _check_name(version)
+    if not os.path.exists(os.path.join(registry_path, version, MANIFEST_FILE)):
+        raise RegistryError(f"Unknown model version: {version}")
+    _write_atomic(os.path.join(registry_path, CURRENT_FILE), version + '\n')
+
+
+def current_version(registry_path):
+    """Version named by CURRENT, or None when there is no registry"""
+    try:
+        with open(os.path.join(registry_path, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def list_versions(registry_path):
+    """Published versions (staging folders excluded), oldest first"""
+    if not os.path.isdir(registry_path):
+        return []
+    return sorted(
+        name for name in os.listdir(registry_path)
+        if not name.startswith('.')
+        and os.path.exists(os.path.join(registry_path, name, MANIFEST_FILE))
+    )
+
+
+def load_manifest(registry_path, version):
+    _check_name(version)
+    try:
+        with open(os.path.join(registry_path, version, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise RegistryError(f"Unknown model version: {version}")
+
+
+def verify_version(registry_path, version):
+    """
+    Check every artifact against the manifest's size and checksum
+
+    Returns:
+        dict: the manifest
+
+    Raises:
+        RegistryError: if a file is missing or differs from the manifest
+    """
+    manifest = load_manifest(registry_path, version)
+    directory = version_path(registry_path, version)
+    for filename, expected in manifest['files'].items():
+        path = os.path.join(directory, filename)
+        if not os.path.exists(path):
+            raise RegistryError(f"{version}: missing {filename}")
+        if os.path.getsize(path) != expected['size'] or file_sha256(path) != expected['sha256']:
+            raise RegistryError(f"{version}: checksum mismatch for {filename}")
+    return manifest
+
+
+def _check_name(version):
+    # Version names come from admin requests; keep them inside the registry
+    if not version or version.startswith('.') or os.path.basename(version) != version:
+        raise RegistryError(f"Invalid model version name: {version!r}")
+
+
+def _write_atomic(path, text):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _jsonable(value):
+    if isinstance(value, dict):
+        return {k: _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if hasattr(value, 'item'):
+        return value.item()
+    return value
+
+
+if __name__ == "__main__":
+    models_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models')
+    registry_path = os.path.join(models_path, REGISTRY_DIR)
+    command = sys.argv[1] if len(sys.argv) > 1 else 'list'
+
+    if command == 'import':
+        manifest = import_flat_models(models_path, registry_path)
+        print(f"✅ Imported {models_path} as {manifest['version']} (now current)")
+    elif command == 'activate' and len(sys.argv) > 2:
+        verify_version(registry_path, sys.argv[2])
+        set_current(registry_path, sys.argv[2])
+        print(f"✅ CURRENT -> {sys.argv[2]}")
+    elif command == 'list':
+        active = current_version(registry_path)
+        for version in list_versions(registry_path):
+            print(f"{'*' if version == active else ' '} {version}")
+    else:
+        print("Usage: python model_registry.py [list | import | activate <version>]")
@@ -0,0 +1,266 @@
+"""
+Budgeted hyperparameter search for the AMEP models
+
+Each model has a small grid of candidate configurations. Successive
+halving (sklearn's HalvingGridSearchCV) scores every candidate with k-fold
+cross-validation on a fraction of the training rows, keeps the best
+1/factor and repeats with factor times more rows until the last round
+uses all of them, so losing candidates are dropped after cheap rounds.
+CV folds and candidates of a round run in parallel (n_jobs).
+
+Halving prunes on CV score alone, so every candidate is also fitted once
+on the first round's row count and measured for what serving pays:
+single-row predict latency of the flattened evaluator AMEPPredictor uses,
+and model size. The finalists are the last round's survivors plus the
+Pareto front of that first round over (CV score, latency, size); the
+front members halving dropped get a CV score on all rows. Every finalist
+is refit on all training rows and measured again. The result is the
+Pareto front of the finalists and a chosen configuration: the fastest
+front member whose score is within `tolerance` of the best, latency ties
+(within LATENCY_TIE, below timer noise) going to the fewest tree nodes.
+"""
+
+import io
+import time
+import joblib
+import numpy as np
+from sklearn.base import clone, is_classifier
+from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier, GradientBoostingRegressor
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import HalvingGridSearchCV, KFold, StratifiedKFold, cross_val_score
+
+from tree_export import flatten_ensemble, flat_output
+
+# model name -> (base estimator with the fixed settings, candidate grid)
+SEARCH_SPACES = {
+    'mastery': (
+        GradientBoostingRegressor(random_state=42),
+        {
+            'n_estimators': [50, 100, 200],
+            'max_depth': [3, 5, 7],
+            'learning_rate': [0.05, 0.1]
+        }
+    ),
+    'engagement': (
+        RandomForestRegressor(min_samples_split=5, random_state=42, n_jobs=1),
+        {
+            'n_estimators': [25, 50, 100, 200],
+            'max_depth': [6, 10, 14]
+        }
+    ),
+    'recommendation': (
+        RandomForestClassifier(min_samples_split=5, random_state=42, n_jobs=1),
+        {
+            'n_estimators': [25, 50, 100, 200],
+            'max_depth': [4, 8, 12]
+        }
+    )
+}
+
+LATENCY_ROWS = 200
+LATENCY_REPEAT = 5
+
+
+def measure_latency(model, X, rows=LATENCY_ROWS, repeat=LATENCY_REPEAT):
+    """Seconds per single-row predict with the serving evaluator (best of repeat runs)"""
+    try:
+        flat = flatten_ensemble(model)
+        predict = lambda row: flat_output(flat, row)
+    except TypeError:
+        # Not a tree ensemble the flat evaluator handles: time the model itself
+        predict = model.predict_proba if is_classifier(model) else model.predict
+
+    X = np.asarray(X, dtype=np.float64)
+    single_rows = [X[i % len(X):i % len(X) + 1] for i in range(rows)]
+    predict(single_rows[0])
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for row in single_rows:
+            predict(row)
+        best = min(best, time.perf_counter() - started)
+    return best / rows
+
+
+def model_size(model):
+    """Pickled size in bytes, and the flattened node arrays' size if any"""
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+    try:
+        flat_bytes = flatten_ensemble(model).nbytes
+    except TypeError:
+        flat_bytes = None
+    return buffer.tell(), flat_bytes
+
+
+def tree_nodes(model):
+    """Total decision-tree nodes of an ensemble (None for other models)"""
+    try:
+        return flatten_ensemble(model).n_nodes
+    except TypeError:
+        return None
+
+
+def measure(model, X):
+    """Serving cost of a fitted model: latency_ms, size_bytes, flat_bytes, n_nodes"""
+    size_bytes, flat_bytes = model_size(model)
+    return {
+        'latency_ms': round(measure_latency(model, X) * 1000, 4),
+        'size_bytes': size_bytes,
+        'flat_bytes': flat_bytes,
+        'n_nodes': tree_nodes(model)
+    }
+
+
+def pareto_front(candidates):
+    """
+    Candidates no other candidate beats on every objective: higher
+    cv_score, lower latency_ms and lower size_bytes
+    """
+    def dominates(a, b):
+        no_worse = (a['cv_score'] >= b['cv_score'] and a['latency_ms'] <= b['latency_ms']
+                    and a['size_bytes'] <= b['size_bytes'])
+        better = (a['cv_score'] > b['cv_score'] or a['latency_ms'] < b['latency_ms']
+                  or a['size_bytes'] < b['size_bytes'])
+        return no_worse and better
+
+    return [c for c in candidates if not any(dominates(other, c) for other in candidates)]
+
+
+# Latencies within this fraction of the fastest count as equal: best-of-5
+# timings of 200 single-row predicts still move by 10-20% run to run
+LATENCY_TIE = 0.25
+
+
+def choose(front, tolerance):
+    """
+    Fastest front member scoring within tolerance of the best; among
+    equally fast ones the fewest tree nodes (then the smallest pickle),
+    then the most accurate
+    """
+    best = max(c['cv_score'] for c in front)
+    floor = best - tolerance * abs(best)
+    eligible = [c for c in front if c['cv_score'] >= floor]
+    fastest = min(c['latency_ms'] for c in eligible)
+    fast = [c for c in eligible if c['latency_ms'] <= fastest * (1 + LATENCY_TIE)]
+    return min(fast, key=lambda c: (c['n_nodes'] if c['n_nodes'] is not None else float('inf'),
+                                    c['size_bytes'], -c['cv_score']))
+
+
+def _rows(data, index):
+    return data.iloc[index] if hasattr(data, 'iloc') else np.asarray(data)[index]
+
+
+def _key(params):
+    return tuple(sorted(params.items()))
+
+
+def search_model(model_name, X, y, cv=5, factor=3, n_jobs=-1, tolerance=0.01, random_state=42):
+    """
+    Successive-halving search over SEARCH_SPACES[model_name] on (X, y),
+    which should be the training split only
+
+    Returns:
+        dict: every candidate's CV score and halving round (first-round
+              entries with their latency and size on that round's rows),
+              the finalists refit on all rows, their Pareto front and the
+              chosen params
+    """
+    base, grid = SEARCH_SPACES[model_name]
+    classifier = is_classifier(base)
+    scoring = 'accuracy' if classifier else 'neg_root_mean_squared_error'
+    splitter = (StratifiedKFold if classifier else KFold)(n_splits=cv, shuffle=True, random_state=random_state)
+
+    # 'exhaust' sizes the first round so the last one uses every row; a
+    # dataset too small for 2 samples per fold (and class) in the first
+    # round is searched in a single round on all its rows
+    smallest = 2 * cv * (len(np.unique(y)) if classifier else 1)
+    min_resources = 'exhaust' if len(X) >= smallest else len(X)
+
+    started = time.perf_counter()
+    search = HalvingGridSearchCV(
+        base, grid, factor=factor, cv=splitter, scoring=scoring,
+        min_resources=min_resources, n_jobs=n_jobs, refit=False, random_state=random_state
+    )
+    search.fit(X, y)
+
+    results = search.cv_results_
+    last_round = max(results['iter'])
+    candidates = []
+    for i, params in enumerate(results['params']):
+        candidates.append({
+            'params': params,
+            'round': int(results['iter'][i]),
+            'n_samples': int(results['n_resources'][i]),
+            'cv_score': float(results['mean_test_score'][i]),
+            'cv_std': float(results['std_test_score'][i])
+        })
+
+    # Serving cost of every candidate, fitted on the first round's rows
+    first_round = [c for c in candidates if c['round'] == 0]
+    rng = np.random.RandomState(random_state)
+    subsample = rng.choice(len(X), size=min(first_round[0]['n_samples'], len(X)), replace=False)
+    X_first, y_first = _rows(X, subsample), _rows(y, subsample)
+    for candidate in first_round:
+        model = clone(base).set_params(**candidate['params']).fit(X_first, y_first)
+        candidate.update(measure(model, X_first))
+    first_front = pareto_front(first_round)
+
+    # The same params appear once per round they survived; keep the last.
+    # First-round front members halving dropped, and survivors whose last
+    # round did not see every row, are scored again on all rows
+    finalists = {}
+    for candidate in candidates:
+        if candidate['round'] == last_round:
+            finalists[_key(candidate['params'])] = candidate
+    for candidate in first_front:
+        finalists.setdefault(_key(candidate['params']), candidate)
+
+    measured = []
+    for candidate in finalists.values():
+        model = clone(base).set_params(**candidate['params'])
+        candidate = {k: candidate[k] for k in ('params', 'round', 'n_samples', 'cv_score', 'cv_std')}
+        if candidate['n_samples'] < len(X):
+            scores = cross_val_score(model, X, y, cv=splitter, scoring=scoring, n_jobs=n_jobs)
+            candidate.update(n_samples=len(X), cv_score=float(scores.mean()), cv_std=float(scores.std()),
+                             rescored=True)
+        fit_started = time.perf_counter()
+        model.fit(X, y)
+        fit_seconds = time.perf_counter() - fit_started
+        measured.append(dict(candidate, fit_seconds=round(fit_seconds, 3), **measure(model, X)))
+
+    front = sorted(pareto_front(measured), key=lambda c: -c['cv_score'])
+    chosen = choose(front, tolerance)
+    search_seconds = time.perf_counter() - started
+    return {
+        'scoring': scoring,
+        'cv': cv,
+        'factor': factor,
+        'tolerance': tolerance,
+        'rounds': last_round + 1,
+        'n_candidates': len(first_round),
+        'first_round_front': len(first_front),
+        'search_seconds': round(search_seconds, 3),
+        'candidates': candidates,
+        'finalists': measured,
+        'pareto_front': front,
+        'chosen': chosen,
+        'params': dict(chosen['params'])
+    }
+
+
+def format_search(model_name, result):
+    """Report lines for one model's search"""
+    lines = [
+        f"  {model_name}: {result['n_candidates']} candidates, {result['rounds']} halving rounds, "
+        f"{len(result['finalists'])} finalists ({result['first_round_front']} on the first-round front), "
+        f"{result['search_seconds']:.1f}s ({result['scoring']})"
+    ]
+    for c in result['pareto_front']:
+        marker = '*' if c is result['chosen'] else ' '
+        flat_kib = '-' if c['flat_bytes'] is None else f"{c['flat_bytes'] / 1024:.0f}"
+        lines.append(
+            f"   {marker} cv {c['cv_score']:>9.4f}  latency {c['latency_ms']:>7.3f} ms  "
+            f"pickle {c['size_bytes'] / 1024:>7.0f} KiB  flat {flat_kib:>6} KiB  {c['params']}"
+        )
+    return lines
@@ -3,45 +3,164 @@ Prediction Service for AMEP Platform
 Loads trained models and provides prediction APIs
 """
 
-import joblib
 import numpy as np
-import pandas as pd
 import os
+import json
+import hashlib
+import threading
+import warnings
+from feature_plan import LABEL_CLASSES_FILE, compile_feature_plan, encoder_categories
+from prediction_cache import PredictionCache
+from inference_policy import InferencePolicy
+from model_registry import REGISTRY_DIR, current_version, verify_version, version_path
+from model_backends import DEFAULT_BACKEND, FLAT_BACKENDS, require_backends
+from tree_export import export_path, flatten_ensemble, load_flat_ensemble, reference_output, flat_output
+
+# Models fitted on DataFrames warn on every array input; the feature plans
+# always build arrays in the fitted column order
+warnings.filterwarnings('ignore', message='X does not have valid feature names')
+
+# Canned profile used to smoke-test a model set before it is activated
+SMOKE_SAMPLE = {
+    'quiz_score': 85,
+    'time_taken_seconds': 180,
+    'number_of_attempts': 1,
+    'previous_mastery_score': 70,
+    'baseline_proficiency': 75,
+    'subject': 'Math',
+    'topic': 'Algebra',
+    'difficulty_level': 'hard',
+    'grade': 10,
+    'learning_pace': 'fast',
+    'preferred_learning_style': 'visual',
+    'tasks_completed': 10,
+    'peer_review_score': 4.5,
+    'communication_score': 4.3,
+    'collaboration_score': 4.6,
+    'creativity_score': 4.2,
+    'project_completion_pct': 95,
+    'role_in_team': 'Leader',
+    'avg_mastery_score': 75,
+    'section': 'A'
+}
+
+
+class ModelSet:
+    """
+    One loaded model version: compiled feature plans, flattened tree
+    evaluators and, for folders without exports, the sklearn models
+
+    Never mutated after loading; a reload builds a new ModelSet and swaps
+    the predictor's reference, so a request that picked up the old set
+    finishes with it.
+    """
+
+    __slots__ = ('version', 'source', 'models', 'categories', 'feature_columns', 'feature_plans',
+                 'evaluators', 'manifest')
+
+    def __init__(self, version, source, models, categories, feature_columns, feature_plans,
+                 evaluators=None, manifest=None):
+        self.version = version
+        self.source = source
+        self.models = models
+        self.categories = categories
+        self.feature_columns = feature_columns
+        self.feature_plans = feature_plans
+        self.evaluators = evaluators or {}
+        self.manifest = manifest
+
+    def predict_fn(self, model_name, proba=False):
+        """The flattened evaluator's predict (same outputs), else sklearn's"""
+        target = self.evaluators.get(model_name) or self.models[model_name]
+        return target.predict_proba if proba else target.predict
+
+    def classes(self, model_name):
+        evaluator = self.evaluators.get(model_name)
+        return evaluator.classes if evaluator is not None else self.models[model_name].classes_
+
 
 class AMEPPredictor:
     """Unified prediction service for all AMEP models"""
     
-    def __init__(self, models_path='../models/'):
+    MODEL_FILES = {
+        'mastery': 'mastery_predictor.pkl',
+        'engagement': 'engagement_predictor.pkl',
+        'recommendation': 'task_recommender.pkl'
+    }
+    
+    def __init__(self, models_path='../models/', prediction_cache_size=4096, version=None,
+                 inference_policy=None, flat_trees=True):
+        """
+        Args:
+            inference_policy (InferencePolicy): n_jobs / batch chunking;
+                                                defaults to n_jobs=1
+            flat_trees (bool): serve tree ensembles through tree_export's
+                               evaluator; False evaluates with sklearn
+        """
         self.models_path = models_path
-        self.models = {}
-        self.label_encoders = {}
-        self.feature_columns = {}
-        self.load_models()
+        self.registry_path = os.path.join(models_path, REGISTRY_DIR, '')
+        self.inference_policy = inference_policy or InferencePolicy()
+        self.flat_trees = flat_trees
+        self.prediction_cache = PredictionCache(max_entries=prediction_cache_size)
+        self._active = None
+        self._reload_lock = threading.Lock()
+        self.load_models(version)
+    
+    # The active set's parts, for callers that predate ModelSet
+    models = property(lambda self: self._active.models)
+    feature_columns = property(lambda self: self._active.feature_columns)
+    feature_plans = property(lambda self: self._active.feature_plans)
+    model_version = property(lambda self: self._active.version)
     
-    def load_models(self):
+    def load_models(self, version=None):
         """Load all trained models and metadata"""
         print("Loading AMEP models...")
         
         try:
-            # Load models
-            self.models['mastery'] = joblib.load(f'{self.models_path}mastery_predictor.pkl')
-            self.models['engagement'] = joblib.load(f'{self.models_path}engagement_predictor.pkl')
-            self.models['recommendation'] = joblib.load(f'{self.models_path}task_recommender.pkl')
-            
-            # Load metadata
-            metadata = joblib.load(f'{self.models_path}model_metadata.pkl')
-            self.feature_columns = metadata['feature_columns']
-            
-            # Load label encoders
-            self.label_encoders = joblib.load(f'{self.models_path}label_encoders.pkl')
-            
-            print("✅ All models loaded successfully!")
+            self._active = self._load_model_set(version)
+            self._smoke_test(self._active)
+            print(f"✅ All models loaded successfully! (version {self._active.version})")
             
         except FileNotFoundError as e:
             print(f"❌ Error loading models: {e}")
             print("Please run train_model.py first to train the models.")
             raise
     
+    def reload(self, version=None):
+        """
+        Hot-swap to a registry version (default: the one CURRENT names)
+        
+        The candidate is loaded, checksum-verified and smoke-tested next to
+        the active set, which keeps serving until the reference is swapped.
+        On any failure the active set stays in place and the error is raised.
+        
+        Returns:
+            str: the now active model version
+        """
+        with self._reload_lock:
+            candidate = self._load_model_set(version)
+            self._smoke_test(candidate)
+            previous = self._active
+            self._active = candidate
+            
+            # Cached outputs belong to the previous weights
+            self.prediction_cache.clear()
+        
+        print(f"✅ Swapped models {previous.version} -> {candidate.version}")
+        return candidate.version
+    
+    def active_model_info(self):
+        """Version, source folder and manifest summary (metrics, backends) of the active set"""
+        active = self._active
+        manifest = active.manifest or {}
+        return {
+            'version': active.version,
+            'source': active.source,
+            'created_at': manifest.get('created_at'),
+            'metrics': manifest.get('metrics'),
+            'backends': {name: manifest.get('backends', {}).get(name, DEFAULT_BACKEND) for name in self.MODEL_FILES}
+        }
+    
     def predict_mastery_score(self, student_data):
         """
         Predict mastery score for a student
@@ -53,16 +172,7 @@ class AMEPPredictor:
         Returns:
             float: Predicted mastery score (0-100)
         """
-        # Prepare features
-        features = self._prepare_mastery_features(student_data)
-        
-        # Predict
-        mastery_score = self.models['mastery'].predict([features])[0]
-        
-        # Clip to 0-100 range
-        mastery_score = np.clip(mastery_score, 0, 100)
-        
-        return round(float(mastery_score), 2)
+        return self.predict_mastery_batch([student_data])[0]
     
     def predict_engagement_index(self, student_data):
         """
@@ -75,16 +185,7 @@ class AMEPPredictor:
         Returns:
             float: Predicted engagement index (0-100)
         """
-        # Prepare features
-        features = self._prepare_engagement_features(student_data)
-        
-        # Predict
-        engagement_index = self.models['engagement'].predict([features])[0]
-        
-        # Clip to 0-100 range
-        engagement_index = np.clip(engagement_index, 0, 100)
-        
-        return round(float(engagement_index), 2)
+        return self.predict_engagement_batch([student_data])[0]
     
     def recommend_tasks(self, student_data):
         """
@@ -100,27 +201,77 @@ class AMEPPredictor:
                 'confidence': float (0-1)
             }
         """
-        # Prepare features
-        features = self._prepare_recommendation_features(student_data)
+        return self.recommend_tasks_batch([student_data])[0]
+    
+    def predict_mastery_batch(self, students):
+        """
+        Predict mastery scores for many students with one model call
         
-        # Predict
-        difficulty_code = self.models['recommendation'].predict([features])[0]
-        probabilities = self.models['recommendation'].predict_proba([features])[0]
+        Args:
+            students (list[dict] | pd.DataFrame): One row per student, same
+                                                  fields as predict_mastery_score
         
-        # Map code to difficulty level
-        difficulty_map = {0: 'easy', 1: 'medium', 2: 'hard'}
-        difficulty_level = difficulty_map[difficulty_code]
-        confidence = float(probabilities[difficulty_code])
+        Returns:
+            list[float]: Predicted mastery scores (0-100), in input order
+        """
+        active = self._active
+        X = self._prepare_features(active, 'mastery', students)
+        if len(X) == 0:
+            return []
+        scores = np.clip(self._predict_rows(active, 'mastery', X, active.predict_fn('mastery')), 0, 100)
+        return [round(float(score), 2) for score in scores]
+    
+    def predict_engagement_batch(self, students):
+        """
+        Predict engagement indices for many students with one model call
         
-        return {
-            'difficulty_level': difficulty_level,
-            'confidence': round(confidence, 3),
-            'probabilities': {
-                'easy': round(float(probabilities[0]), 3),
-                'medium': round(float(probabilities[1]), 3),
-                'hard': round(float(probabilities[2]), 3)
-            }
-        }
+        Args:
+            students (list[dict] | pd.DataFrame): One row per student, same
+                                                  fields as predict_engagement_index
+        
+        Returns:
+            list[float]: Predicted engagement indices (0-100), in input order
+        """
+        active = self._active
+        X = self._prepare_features(active, 'engagement', students)
+        if len(X) == 0:
+            return []
+        indices = np.clip(self._predict_rows(active, 'engagement', X, active.predict_fn('engagement')), 0, 100)
+        return [round(float(index), 2) for index in indices]
+    
+    def recommend_tasks_batch(self, students):
+        """
+        Recommend task difficulty for many students with one model call
+        
+        Args:
+            students (list[dict] | pd.DataFrame): One row per student, same
+                                                  fields as recommend_tasks
+        
+        Returns:
+            list[dict]: recommend_tasks results, in input order
+        """
+        active = self._active
+        X = self._prepare_features(active, 'recommendation', students)
+        if len(X) == 0:
+            return []
+        
+        # predict() is the argmax of predict_proba, so one call gives both
+        probabilities = np.array(self._predict_rows(active, 'recommendation', X, active.predict_fn('recommendation', proba=True)))
+        difficulty_codes = active.classes('recommendation')[np.argmax(probabilities, axis=1)]
+        
+        difficulty_map = {0: 'easy', 1: 'medium', 2: 'hard'}
+        results = []
+        for code, probs in zip(difficulty_codes, probabilities):
+            results.append({
+                'difficulty_level': difficulty_map[int(code)],
+                'confidence': round(float(probs[int(code)]), 3),
+                'probabilities': {
+                    'easy': round(float(probs[0]), 3),
+                    'medium': round(float(probs[1]), 3),
+                    'hard': round(float(probs[2]), 3)
+                }
+            })
+        return results
     
     def get_student_insights(self, student_data):
         """
@@ -147,70 +298,174 @@ class AMEPPredictor:
         
         return insights
     
-    def _prepare_mastery_features(self, data):
-        """Prepare feature vector for mastery prediction"""
-        feature_order = self.feature_columns['mastery']
-        features = []
-        
-        for col in feature_order:
-            if '_encoded' in col:
-                # Handle encoded features
-                original_col = col.replace('_encoded', '')
-                if original_col in data and original_col in self.label_encoders:
-                    try:
-                        encoded_val = self.label_encoders[original_col].transform([str(data[original_col])])[0]
-                        features.append(encoded_val)
-                    except:
-                        features.append(0)
-                else:
-                    features.append(0)
-            else:
-                # Handle numeric features
-                features.append(data.get(col, 0))
+    def prediction_cache_stats(self):
+        """Hit/miss/eviction counters of the prediction cache"""
+        stats = self.prediction_cache.stats()
+        stats['model_version'] = self.model_version
+        return stats
+    
+    def _load_model_set(self, version=None):
+        """
+        Load a ModelSet from the registry (the given version, else CURRENT),
+        or from the legacy flat models folder when there is no registry
+        """
+        version = version or current_version(self.registry_path)
+        manifest = None
+        backends = {}
+        if version:
+            manifest = verify_version(self.registry_path, version)
+            source = version_path(self.registry_path, version)
+            backends = manifest.get('backends') or {}
+            # Fail with the missing library's name before unpickling anything
+            require_backends(backends)
+        else:
+            source = self.models_path
         
-        return features
+        # Models on backends tree_export cannot flatten have no export and
+        # are served from their pickle
+        exported = self.flat_trees and os.path.exists(f'{source}{LABEL_CLASSES_FILE}') and all(
+            os.path.exists(export_path(f'{source}{filename}'))
+            or backends.get(name, DEFAULT_BACKEND) not in FLAT_BACKENDS
+            for name, filename in self.MODEL_FILES.items()
+        )
+        if exported:
+            return self._load_exported(version, source, manifest)
+        return self._load_pickled(version, source, manifest)
     
-    def _prepare_engagement_features(self, data):
-        """Prepare feature vector for engagement prediction"""
-        feature_order = self.feature_columns['engagement']
-        features = []
-        
-        for col in feature_order:
-            if '_encoded' in col:
-                original_col = col.replace('_encoded', '')
-                if original_col in data and original_col in self.label_encoders:
-                    try:
-                        encoded_val = self.label_encoders[original_col].transform([str(data[original_col])])[0]
-                        features.append(encoded_val)
-                    except:
-                        features.append(0)
-                else:
-                    features.append(0)
+    def _load_exported(self, version, source, manifest):
+        """
+        Serve straight from the memory-mapped tree exports: nothing is
+        unpickled and sklearn is never imported, and every process mapping
+        the same files shares their pages. Models on other backends
+        (model_backends.py) are unpickled and serve with their own predict.
+        """
+        evaluators, models = {}, {}
+        for name, filename in self.MODEL_FILES.items():
+            tree_file = export_path(f'{source}{filename}')
+            if os.path.exists(tree_file):
+                evaluators[name] = load_flat_ensemble(tree_file)
             else:
-                features.append(data.get(col, 0))
+                models[name] = self._load_model(f'{source}{filename}')
+        with open(f'{source}{LABEL_CLASSES_FILE}') as f:
+            categories = json.load(f)
+        feature_columns = {name: evaluator.columns for name, evaluator in evaluators.items()}
+        feature_columns.update({name: self._feature_order(model, None) for name, model in models.items()})
         
-        return features
+        return ModelSet(
+            version=version or self._files_version(source),
+            source=source,
+            models=models,
+            categories=categories,
+            feature_columns=feature_columns,
+            feature_plans={
+                name: compile_feature_plan(name, feature_columns[name], categories)
+                for name in self.MODEL_FILES
+            },
+            evaluators=evaluators,
+            manifest=manifest
+        )
     
-    def _prepare_recommendation_features(self, data):
-        """Prepare feature vector for task recommendation"""
-        feature_order = self.feature_columns['recommendation']
-        features = []
-        
-        for col in feature_order:
-            if '_encoded' in col:
-                original_col = col.replace('_encoded', '')
-                if original_col in data and original_col in self.label_encoders:
-                    try:
-                        encoded_val = self.label_encoders[original_col].transform([str(data[original_col])])[0]
-                        features.append(encoded_val)
-                    except:
-                        features.append(0)
-                else:
-                    features.append(0)
+    def _load_pickled(self, version, source, manifest):
+        """Unpickle the models (folders from before the exports, or flat_trees=False)"""
+        import joblib
+        
+        metadata = joblib.load(f'{source}model_metadata.pkl')
+        require_backends(metadata.get('backends'))
+        models = {
+            name: self._load_model(f'{source}{filename}')
+            for name, filename in self.MODEL_FILES.items()
+        }
+        categories = encoder_categories(joblib.load(f'{source}label_encoders.pkl'))
+        
+        # Compile feature plans once; requests never touch the encoders
+        feature_plans = {
+            name: compile_feature_plan(name, self._feature_order(models[name], metadata['feature_columns'][name]), categories)
+            for name in models
+        }
+        
+        evaluators = {}
+        for name, model in models.items():
+            if not self.flat_trees:
+                break
+            try:
+                evaluators[name] = flatten_ensemble(model)
+            except TypeError:
+                pass
+        
+        return ModelSet(
+            version=version or metadata.get('version') or self._files_version(source),
+            source=source,
+            models=models,
+            categories=categories,
+            feature_columns=metadata['feature_columns'],
+            feature_plans=feature_plans,
+            evaluators=evaluators,
+            manifest=manifest
+        )
+    
+    def _load_model(self, model_file):
+        import joblib
+        return self.inference_policy.apply(joblib.load(model_file))
+    
+    def _smoke_test(self, model_set):
+        """
+        Run SMOKE_SAMPLE through every model; raise if an output is unusable
+        or a flattened evaluator disagrees with its sklearn model
+        """
+        for name, plan in model_set.feature_plans.items():
+            X = plan.transform([SMOKE_SAMPLE])
+            model = model_set.models.get(name)
+            evaluator = model_set.evaluators.get(name)
+            output = reference_output(model, X) if model is not None else flat_output(evaluator, X)
+            if name == 'recommendation':
+                valid = output.shape == (1, 3) and abs(float(output.sum()) - 1.0) < 1e-6
             else:
-                features.append(data.get(col, 0))
+                valid = output.shape == (1,)
+            if not valid or not np.all(np.isfinite(output)):
+                raise ValueError(f"Smoke prediction failed for {name} model (version {model_set.version}): {output!r}")
+            
+            if model is not None and evaluator is not None and not np.array_equal(flat_output(evaluator, X), output):
+                raise ValueError(f"Flattened {name} model disagrees with sklearn (version {model_set.version})")
+    
+    def _files_version(self, source):
+        """Fallback model version: digest of the model files' size and mtime"""
+        digest = hashlib.sha1()
+        for filename in sorted(self.MODEL_FILES.values()) + ['model_metadata.pkl', 'label_encoders.pkl']:
+            stat = os.stat(f'{source}{filename}')
+            digest.update(f'{filename}:{stat.st_size}:{stat.st_mtime_ns};'.encode('utf-8'))
+        return digest.hexdigest()[:12]
+    
+    def _predict_rows(self, model_set, model_name, X, predict_fn):
+        """
+        Per-row model outputs for X, calling predict_fn once on just the
+        rows that are not in the prediction cache
+        """
+        keys = [PredictionCache.make_key(model_name, model_set.version, row) for row in X]
+        outputs = [self.prediction_cache.get(key) for key in keys]
+        
+        missing = [i for i, output in enumerate(outputs) if output is None]
+        if missing:
+            for i, output in zip(missing, self.inference_policy.run(predict_fn, X[missing])):
+                outputs[i] = output
+                self.prediction_cache.set(keys[i], output)
         
-        return features
+        return outputs
+    
+    @staticmethod
+    def _feature_order(model, metadata_columns):
+        """Columns in the order the model was fitted on"""
+        # Prefer the model's own record: the saved metadata can list columns
+        # the model was not actually trained with
+        fitted = getattr(model, 'feature_names_in_', None)
+        if fitted is not None:
+            return list(fitted)
+        return metadata_columns
+    
+    def _prepare_features(self, model_set, model_name, students):
+        """Build the 2-D feature matrix for a model from its compiled plan"""
+        if hasattr(students, 'to_dict'):  # pandas DataFrame
+            students = students.to_dict('records')
+        return model_set.feature_plans[model_name].transform(students)
 
 
 # Example usage
@@ -218,28 +473,7 @@ if __name__ == "__main__":
     predictor = AMEPPredictor(models_path='../models/')
     
     # Example student data
-    test_student = {
-        'quiz_score': 85,
-        'time_taken_seconds': 180,
-        'number_of_attempts': 1,
-        'previous_mastery_score': 70,
-        'baseline_proficiency': 75,
-        'subject': 'Math',
-        'topic': 'Algebra',
-        'difficulty_level': 'hard',
-        'grade': 10,
-        'learning_pace': 'fast',
-        'preferred_learning_style': 'visual',
-        'tasks_completed': 10,
-        'peer_review_score': 4.5,
-        'communication_score': 4.3,
-        'collaboration_score': 4.6,
-        'creativity_score': 4.2,
-        'project_completion_pct': 95,
-        'role_in_team': 'Leader',
-        'avg_mastery_score': 75,
-        'section': 'A'
-    }
+    test_student = dict(SMOKE_SAMPLE)
     
     print("\n🔮 AMEP Prediction Example\n")
     print("Student Profile:")
@@ -0,0 +1,95 @@
+"""
+Per-stage timing and peak memory for the AMEP training pipeline
+
+Each stage records its wall time, the peak Python/NumPy heap allocated
+while it ran (tracemalloc; NumPy reports its array buffers to it) and the
+process's peak RSS so far. Reports from worker processes are merged into
+the parent's and saved with the model metadata.
+"""
+
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MIB = 1024 * 1024
+
+
+def peak_rss_mib():
+    """Peak resident set size of this process (None where unsupported)"""
+    if resource is None:
+        return None
+    # ru_maxrss is KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def reset_peak_rss():
+    """
+    Restart this process's peak RSS from its current RSS (Linux 4.0+), so
+    peak_rss_mib() measures what follows; False where unsupported
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+class StageReport:
+    """model name -> stage name -> {seconds, peak_heap_mib, peak_rss_mib}"""
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, model_name, stage_name, heap=True):
+        """
+        heap=False skips tracemalloc (peak_heap_mib is None), which slows
+        allocation-heavy pure-Python loops several times over
+        """
+        tracing = tracemalloc.is_tracing()
+        if heap:
+            if not tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            peak = None
+            if heap:
+                peak = max(tracemalloc.get_traced_memory()[1] - baseline, 0)
+                if not tracing:
+                    tracemalloc.stop()
+            self.stages.setdefault(model_name, {})[stage_name] = {
+                'seconds': round(seconds, 4),
+                'peak_heap_mib': None if peak is None else round(peak / MIB, 2),
+                'peak_rss_mib': peak_rss_mib()
+            }
+
+    def merge(self, stages):
+        """Add stages recorded elsewhere (e.g. by a worker process)"""
+        for model_name, model_stages in stages.items():
+            self.stages.setdefault(model_name, {}).update(model_stages)
+
+    def as_dict(self):
+        return {model_name: dict(model_stages) for model_name, model_stages in self.stages.items()}
+
+    def format(self):
+        """Report lines: one per (model, stage)"""
+        lines = [f"  {'model':<16} {'stage':<10} {'seconds':>9} {'peak heap MiB':>14} {'peak RSS MiB':>13}"]
+        for model_name, model_stages in self.stages.items():
+            for stage_name, values in model_stages.items():
+                heap, rss = values['peak_heap_mib'], values['peak_rss_mib']
+                lines.append(
+                    f"  {model_name:<16} {stage_name:<10} {values['seconds']:>9.3f} "
+                    f"{'-' if heap is None else f'{heap:.2f}':>14} {'-' if rss is None else f'{rss:.1f}':>13}"
+                )
+        return lines
@@ -9,29 +9,86 @@ Trains three core ML models:
 import pandas as pd
 import numpy as np
 import joblib
+import json
 import os
-from sklearn.model_selection import train_test_split, cross_val_score
-from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier, GradientBoostingRegressor
+from sklearn.model_selection import train_test_split
 from sklearn.linear_model import Ridge
 from sklearn.metrics import mean_squared_error, r2_score, accuracy_score, classification_report
 import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 
 # Add src to path
 sys.path.append(os.path.dirname(__file__))
 from data_preprocessing import AMEPDataProcessor
+from db_source import DatabaseSource, DEFAULT_DB_PATH
+from stage_report import StageReport, peak_rss_mib
+from model_registry import REGISTRY_DIR, stage_version, publish_version
+from tree_export import flatten_ensemble, check_parity, save_flat_ensemble, export_path
+from feature_plan import LABEL_CLASSES_FILE, encoder_categories
+from model_backends import DEFAULT_BACKEND, make_estimator, thread_limit, parse_backends
+
+# Training method for each model; the three trainings are independent
+TRAIN_METHODS = {
+    'mastery': 'train_mastery_model',
+    'engagement': 'train_engagement_model',
+    'recommendation': 'train_recommendation_model'
+}
+
+
+def train_split(X, y, stratify=False):
+    """The 80/20 train/test split every model is fitted and evaluated on"""
+    return train_test_split(X, y, test_size=0.2, random_state=42, stratify=y if stratify else None)
+
+
+def _train_in_worker(model_name, models_path, X, y, feature_columns, n_jobs, params, backends):
+    """Process pool task: train, evaluate and persist one model"""
+    trainer = AMEPModelTrainer(models_path=models_path, n_jobs=n_jobs, params=params, backends=backends)
+    getattr(trainer, TRAIN_METHODS[model_name])(X, y, feature_columns)
+    return trainer.metrics[model_name], trainer.report.as_dict(), peak_rss_mib()
+
 
 class AMEPModelTrainer:
     """Trains and saves all AMEP models"""
     
-    def __init__(self, models_path='../models/'):
+    def __init__(self, models_path='../models/', n_jobs=-1, params=None, backends=None):
         self.models_path = models_path
+        self.n_jobs = n_jobs  # fit/predict threads
+        self.params = params or {}  # per-model overrides, e.g. from search_hyperparameters
+        self.backends = backends or {}  # model name -> model_backends backend; default sklearn
+        self.search_results = {}
         self.models = {}
         self.feature_columns = {}
         self.metrics = {}
+        self.report = StageReport()
+        self.training = {}
         
         # Create models directory if it doesn't exist
         os.makedirs(models_path, exist_ok=True)
     
+    def backend(self, model_name):
+        return self.backends.get(model_name, DEFAULT_BACKEND)
+    
+    def make_model(self, model_name):
+        """Unfitted estimator for a model on its backend, with any param overrides"""
+        return make_estimator(self.backend(model_name), model_name, self.params.get(model_name), n_jobs=self.n_jobs)
+    
+    @staticmethod
+    def print_feature_importance(model, columns):
+        """Top 5 features, for models that report importances"""
+        importances = getattr(model, 'feature_importances_', None)
+        if importances is None:
+            return
+        feature_importance = pd.DataFrame({
+            'feature': columns,
+            'importance': importances
+        }).sort_values('importance', ascending=False)
+        
+        print(f"\n🔍 Top 5 Important Features:")
+        for idx, row in feature_importance.head().iterrows():
+            print(f"  {row['feature']}: {row['importance']:.4f}")
+    
     def train_mastery_model(self, X, y, feature_columns):
         """
         Train Mastery Score Prediction Model
@@ -41,60 +98,49 @@ class AMEPModelTrainer:
         print("TRAINING MASTERY SCORE PREDICTION MODEL")
         print("="*60)
         
-        # Split data
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42
-        )
-        
-        print(f"Training samples: {len(X_train)}")
-        print(f"Testing samples: {len(X_test)}")
-        
-        # Train Gradient Boosting model (best for regression)
-        model = GradientBoostingRegressor(
-            n_estimators=100,
-            learning_rate=0.1,
-            max_depth=5,
-            random_state=42
-        )
-        
-        print("\nTraining Gradient Boosting Regressor...")
-        model.fit(X_train, y_train)
-        
-        # Predictions
-        y_pred_train = model.predict(X_train)
-        y_pred_test = model.predict(X_test)
-        
-        # Clip predictions to 0-100 range
-        y_pred_train = np.clip(y_pred_train, 0, 100)
-        y_pred_test = np.clip(y_pred_test, 0, 100)
-        
-        # Evaluate
-        train_rmse = np.sqrt(mean_squared_error(y_train, y_pred_train))
-        test_rmse = np.sqrt(mean_squared_error(y_test, y_pred_test))
-        train_r2 = r2_score(y_train, y_pred_train)
-        test_r2 = r2_score(y_test, y_pred_test)
-        
-        print(f"\n📊 Model Performance:")
-        print(f"  Train RMSE: {train_rmse:.2f}")
-        print(f"  Test RMSE:  {test_rmse:.2f}")
-        print(f"  Train R²:   {train_r2:.4f}")
-        print(f"  Test R²:    {test_r2:.4f}")
-        
-        # Feature importance
-        feature_importance = pd.DataFrame({
-            'feature': X.columns,
-            'importance': model.feature_importances_
-        }).sort_values('importance', ascending=False)
-        
-        print(f"\n🔍 Top 5 Important Features:")
-        for idx, row in feature_importance.head().iterrows():
-            print(f"  {row['feature']}: {row['importance']:.4f}")
-        
-        # Save model
-        model_file = f'{self.models_path}mastery_predictor.pkl'
-        joblib.dump(model, model_file)
-        print(f"\n✅ Model saved: {model_file}")
-        
+        with self.report.stage('mastery', 'fit'):
+            # Split data
+            X_train, X_test, y_train, y_test = train_split(X, y)
+
+            print(f"Training samples: {len(X_train)}")
+            print(f"Testing samples: {len(X_test)}")
+
+            model = self.make_model('mastery')
+
+            print(f"\nTraining {type(model).__name__} ({self.backend('mastery')} backend)...")
+            with thread_limit(self.backend('mastery'), self.n_jobs):
+                model.fit(X_train, y_train)
+
+        with self.report.stage('mastery', 'evaluate'):
+            # Predictions
+            y_pred_train = model.predict(X_train)
+            y_pred_test = model.predict(X_test)
+
+            # Clip predictions to 0-100 range
+            y_pred_train = np.clip(y_pred_train, 0, 100)
+            y_pred_test = np.clip(y_pred_test, 0, 100)
+
+            # Evaluate
+            train_rmse = np.sqrt(mean_squared_error(y_train, y_pred_train))
+            test_rmse = np.sqrt(mean_squared_error(y_test, y_pred_test))
+            train_r2 = r2_score(y_train, y_pred_train)
+            test_r2 = r2_score(y_test, y_pred_test)
+
+            print(f"\n📊 Model Performance:")
+            print(f"  Train RMSE: {train_rmse:.2f}")
+            print(f"  Test RMSE:  {test_rmse:.2f}")
+            print(f"  Train R²:   {train_r2:.4f}")
+            print(f"  Test R²:    {test_r2:.4f}")
+
+            self.print_feature_importance(model, X.columns)
+
+        with self.report.stage('mastery', 'persist'):
+            # Save model
+            model_file = f'{self.models_path}mastery_predictor.pkl'
+            joblib.dump(model, model_file)
+            print(f"\n✅ Model saved: {model_file}")
+            self.export_trees(model, model_file, X_test)
+
         self.models['mastery'] = model
         self.feature_columns['mastery'] = feature_columns
         self.metrics['mastery'] = {
@@ -115,61 +161,49 @@ class AMEPModelTrainer:
         print("TRAINING ENGAGEMENT INDEX PREDICTION MODEL")
         print("="*60)
         
-        # Split data
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42
-        )
-        
-        print(f"Training samples: {len(X_train)}")
-        print(f"Testing samples: {len(X_test)}")
-        
-        # Train Random Forest model
-        model = RandomForestRegressor(
-            n_estimators=100,
-            max_depth=10,
-            min_samples_split=5,
-            random_state=42,
-            n_jobs=-1
-        )
-        
-        print("\nTraining Random Forest Regressor...")
-        model.fit(X_train, y_train)
-        
-        # Predictions
-        y_pred_train = model.predict(X_train)
-        y_pred_test = model.predict(X_test)
-        
-        # Clip predictions to 0-100 range
-        y_pred_train = np.clip(y_pred_train, 0, 100)
-        y_pred_test = np.clip(y_pred_test, 0, 100)
-        
-        # Evaluate
-        train_rmse = np.sqrt(mean_squared_error(y_train, y_pred_train))
-        test_rmse = np.sqrt(mean_squared_error(y_test, y_pred_test))
-        train_r2 = r2_score(y_train, y_pred_train)
-        test_r2 = r2_score(y_test, y_pred_test)
-        
-        print(f"\n📊 Model Performance:")
-        print(f"  Train RMSE: {train_rmse:.2f}")
-        print(f"  Test RMSE:  {test_rmse:.2f}")
-        print(f"  Train R²:   {train_r2:.4f}")
-        print(f"  Test R²:    {test_r2:.4f}")
-        
-        # Feature importance
-        feature_importance = pd.DataFrame({
-            'feature': X.columns,
-            'importance': model.feature_importances_
-        }).sort_values('importance', ascending=False)
-        
-        print(f"\n🔍 Top 5 Important Features:")
-        for idx, row in feature_importance.head().iterrows():
-            print(f"  {row['feature']}: {row['importance']:.4f}")
-        
-        # Save model
-        model_file = f'{self.models_path}engagement_predictor.pkl'
-        joblib.dump(model, model_file)
-        print(f"\n✅ Model saved: {model_file}")
-        
+        with self.report.stage('engagement', 'fit'):
+            # Split data
+            X_train, X_test, y_train, y_test = train_split(X, y)
+
+            print(f"Training samples: {len(X_train)}")
+            print(f"Testing samples: {len(X_test)}")
+
+            model = self.make_model('engagement')
+
+            print(f"\nTraining {type(model).__name__} ({self.backend('engagement')} backend)...")
+            with thread_limit(self.backend('engagement'), self.n_jobs):
+                model.fit(X_train, y_train)
+
+        with self.report.stage('engagement', 'evaluate'):
+            # Predictions
+            y_pred_train = model.predict(X_train)
+            y_pred_test = model.predict(X_test)
+
+            # Clip predictions to 0-100 range
+            y_pred_train = np.clip(y_pred_train, 0, 100)
+            y_pred_test = np.clip(y_pred_test, 0, 100)
+
+            # Evaluate
+            train_rmse = np.sqrt(mean_squared_error(y_train, y_pred_train))
+            test_rmse = np.sqrt(mean_squared_error(y_test, y_pred_test))
+            train_r2 = r2_score(y_train, y_pred_train)
+            test_r2 = r2_score(y_test, y_pred_test)
+
+            print(f"\n📊 Model Performance:")
+            print(f"  Train RMSE: {train_rmse:.2f}")
+            print(f"  Test RMSE:  {test_rmse:.2f}")
+            print(f"  Train R²:   {train_r2:.4f}")
+            print(f"  Test R²:    {test_r2:.4f}")
+
+            self.print_feature_importance(model, X.columns)
+
+        with self.report.stage('engagement', 'persist'):
+            # Save model
+            model_file = f'{self.models_path}engagement_predictor.pkl'
+            joblib.dump(model, model_file)
+            print(f"\n✅ Model saved: {model_file}")
+            self.export_trees(model, model_file, X_test)
+
         self.models['engagement'] = model
         self.feature_columns['engagement'] = feature_columns
         self.metrics['engagement'] = {
@@ -190,57 +224,45 @@ class AMEPModelTrainer:
         print("TRAINING ADAPTIVE TASK RECOMMENDATION MODEL")
         print("="*60)
         
-        # Split data
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42, stratify=y
-        )
-        
-        print(f"Training samples: {len(X_train)}")
-        print(f"Testing samples: {len(X_test)}")
-        
-        # Train Random Forest Classifier
-        model = RandomForestClassifier(
-            n_estimators=100,
-            max_depth=8,
-            min_samples_split=5,
-            random_state=42,
-            n_jobs=-1
-        )
-        
-        print("\nTraining Random Forest Classifier...")
-        model.fit(X_train, y_train)
-        
-        # Predictions
-        y_pred_train = model.predict(X_train)
-        y_pred_test = model.predict(X_test)
-        
-        # Evaluate
-        train_acc = accuracy_score(y_train, y_pred_train)
-        test_acc = accuracy_score(y_test, y_pred_test)
-        
-        print(f"\n📊 Model Performance:")
-        print(f"  Train Accuracy: {train_acc:.4f}")
-        print(f"  Test Accuracy:  {test_acc:.4f}")
-        
-        print(f"\n📋 Classification Report (Test Set):")
-        print(classification_report(y_test, y_pred_test, 
-                                   target_names=['Easy', 'Medium', 'Hard']))
-        
-        # Feature importance
-        feature_importance = pd.DataFrame({
-            'feature': X.columns,
-            'importance': model.feature_importances_
-        }).sort_values('importance', ascending=False)
-        
-        print(f"\n🔍 Top 5 Important Features:")
-        for idx, row in feature_importance.head().iterrows():
-            print(f"  {row['feature']}: {row['importance']:.4f}")
-        
-        # Save model
-        model_file = f'{self.models_path}task_recommender.pkl'
-        joblib.dump(model, model_file)
-        print(f"\n✅ Model saved: {model_file}")
-        
+        with self.report.stage('recommendation', 'fit'):
+            # Split data
+            X_train, X_test, y_train, y_test = train_split(X, y, stratify=True)
+
+            print(f"Training samples: {len(X_train)}")
+            print(f"Testing samples: {len(X_test)}")
+
+            model = self.make_model('recommendation')
+
+            print(f"\nTraining {type(model).__name__} ({self.backend('recommendation')} backend)...")
+            with thread_limit(self.backend('recommendation'), self.n_jobs):
+                model.fit(X_train, y_train)
+
+        with self.report.stage('recommendation', 'evaluate'):
+            # Predictions
+            y_pred_train = model.predict(X_train)
+            y_pred_test = model.predict(X_test)
+
+            # Evaluate
+            train_acc = accuracy_score(y_train, y_pred_train)
+            test_acc = accuracy_score(y_test, y_pred_test)
+
+            print(f"\n📊 Model Performance:")
+            print(f"  Train Accuracy: {train_acc:.4f}")
+            print(f"  Test Accuracy:  {test_acc:.4f}")
+
+            print(f"\n📋 Classification Report (Test Set):")
+            print(classification_report(y_test, y_pred_test,
+                                       target_names=['Easy', 'Medium', 'Hard']))
+
+            self.print_feature_importance(model, X.columns)
+
+        with self.report.stage('recommendation', 'persist'):
+            # Save model
+            model_file = f'{self.models_path}task_recommender.pkl'
+            joblib.dump(model, model_file)
+            print(f"\n✅ Model saved: {model_file}")
+            self.export_trees(model, model_file, X_test)
+
         self.models['recommendation'] = model
         self.feature_columns['recommendation'] = feature_columns
         self.metrics['recommendation'] = {
@@ -250,15 +272,113 @@ class AMEPModelTrainer:
         
         return model
     
-    def save_metadata(self):
+    def train_all(self, datasets, workers=None):
+        """
+        Train the models in datasets ({name: (X, y, feature_columns)})
+        
+        With a budget of more than one worker the trainings run concurrently,
+        one process per model, and the remaining budget goes to each
+        forest's n_jobs; with one worker they run in this process in turn.
+        Models are persisted by whichever process trained them.
+        """
+        workers = max(1, workers or os.cpu_count() or 1)
+        processes = min(workers, len(datasets))
+        n_jobs = max(1, workers // processes)
+        started = time.perf_counter()
+        worker_rss = {}
+        
+        if processes == 1:
+            self.n_jobs = n_jobs
+            for model_name, (X, y, feature_columns) in datasets.items():
+                getattr(self, TRAIN_METHODS[model_name])(X, y, feature_columns)
+        else:
+            print(f"\n⚙️  Training {len(datasets)} models in {processes} processes (n_jobs={n_jobs} each)")
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                futures = {
+                    model_name: pool.submit(_train_in_worker, model_name, self.models_path, X, y, feature_columns,
+                                            n_jobs, self.params, self.backends)
+                    for model_name, (X, y, feature_columns) in datasets.items()
+                }
+                for model_name, future in futures.items():
+                    self.metrics[model_name], stages, worker_rss[model_name] = future.result()
+                    self.feature_columns[model_name] = datasets[model_name][2]
+                    self.report.merge(stages)
+        
+        self.training = {
+            'workers': workers,
+            'processes': processes,
+            'n_jobs': n_jobs,
+            'train_seconds': round(time.perf_counter() - started, 3),
+            'worker_peak_rss_mib': worker_rss
+        }
+        return self.training
+    
+    def search_hyperparameters(self, datasets, workers=None, cv=5, tolerance=0.01):
+        """
+        Successive-halving search per model on its training split (see
+        model_search.py); the chosen configurations become self.params
+        """
+        from model_search import search_model, format_search
+        
+        n_jobs = max(1, workers or os.cpu_count() or 1)
+        for model_name, (X, y, feature_columns) in datasets.items():
+            if self.backend(model_name) != DEFAULT_BACKEND:
+                print(f"\n🔎 Skipping {model_name} search: the grids cover the {DEFAULT_BACKEND} backend only")
+                continue
+            X_train, _, y_train, _ = train_split(X, y, stratify=model_name == 'recommendation')
+            print(f"\n🔎 Searching {model_name} configurations ({cv}-fold CV, n_jobs={n_jobs})...")
+            with self.report.stage(model_name, 'search'):
+                result = search_model(model_name, X_train, y_train, cv=cv, n_jobs=n_jobs, tolerance=tolerance)
+            self.search_results[model_name] = result
+            self.params[model_name] = result['params']
+            for line in format_search(model_name, result):
+                print(line)
+        return self.params
+    
+    def print_report(self):
+        """Print per-stage timings and peak memory"""
+        print("\n⏱️  Training stages:")
+        for line in self.report.format():
+            print(line)
+        if self.training:
+            print(f"  {self.training['processes']} process(es), n_jobs={self.training['n_jobs']}, "
+                  f"models trained in {self.training['train_seconds']:.2f}s")
+    
+    def export_trees(self, model, model_file, X_check):
+        """
+        Save the flattened ensemble served by AMEPPredictor next to the
+        pickle, after checking it reproduces sklearn exactly on X_check;
+        models on other backends are served from the pickle
+        """
+        try:
+            flat = flatten_ensemble(model)
+        except TypeError:
+            print(f"ℹ️  No flattened export for {type(model).__name__}; served by its own predict")
+            return
+        if not check_parity(model, flat, X_check):
+            raise RuntimeError(f"Flattened ensemble for {model_file} does not match sklearn")
+        save_flat_ensemble(flat, export_path(model_file))
+        print(f"✅ Flattened trees saved: {export_path(model_file)} ({flat.n_trees} trees, {flat.n_nodes} nodes)")
+    
+    def save_metadata(self, version=None):
         """Save feature columns and label encoders"""
         metadata = {
+            'version': version,
             'feature_columns': self.feature_columns,
-            'metrics': self.metrics
+            'metrics': self.metrics,
+            'params': self.params,
+            'backends': self.trained_backends(),
+            'training': dict(self.training, stages=self.report.as_dict())
         }
+        if self.search_results:
+            metadata['search'] = self.search_results
         joblib.dump(metadata, f'{self.models_path}model_metadata.pkl')
         print(f"\n✅ Metadata saved: {self.models_path}model_metadata.pkl")
     
+    def trained_backends(self):
+        """model name -> backend, for every trained model"""
+        return {model_name: self.backend(model_name) for model_name in self.feature_columns}
+    
     def print_summary(self):
         """Print training summary"""
         print("\n" + "="*60)
@@ -282,39 +402,91 @@ class AMEPModelTrainer:
         print("="*60)
 
 
-def main():
+def main(workers=None, search=False, cv=5, tolerance=0.01, backends=None, db_path=None):
     """Main training pipeline"""
     print("\n🚀 AMEP MODEL TRAINING PIPELINE")
     print("="*60)
+    started = time.perf_counter()
+    report = StageReport()
     
-    # Initialize processor
-    processor = AMEPDataProcessor(data_path='../datasets/')
-    processor.load_datasets()
+    # Initialize processor; with a database, train on its synced snapshot
+    source = DatabaseSource(db_path) if db_path else None
+    processor = AMEPDataProcessor(data_path='../datasets/', source=source)
+    if source is not None:
+        # The sync is a pure-Python row loop; heap tracing would slow it badly
+        with report.stage('pipeline', 'sync', heap=False):
+            processor.sync_source()
+    with report.stage('pipeline', 'load'):
+        processor.load_datasets(sync=False)
     
-    # Prepare datasets
+    # Prepare datasets (in order: later models reuse the label encoders
+    # fitted for earlier ones)
     print("\n📊 Preparing datasets...")
-    X_mastery, y_mastery, mastery_cols = processor.prepare_mastery_features()
-    X_engagement, y_engagement, engagement_cols = processor.prepare_engagement_features()
-    X_recommend, y_recommend, recommend_cols = processor.prepare_recommendation_features()
+    datasets = {}
+    with report.stage('mastery', 'prepare'):
+        datasets['mastery'] = processor.prepare_mastery_features()
+    with report.stage('engagement', 'prepare'):
+        datasets['engagement'] = processor.prepare_engagement_features()
+    with report.stage('recommendation', 'prepare'):
+        datasets['recommendation'] = processor.prepare_recommendation_features()
+    
+    # Every run writes a new registry version; nothing is overwritten in place
+    registry_path = os.path.join('../models/', REGISTRY_DIR)
+    version, staging_path = stage_version(registry_path)
+    print(f"\n📦 Staging model version {version}")
     
     # Initialize trainer
-    trainer = AMEPModelTrainer(models_path='../models/')
+    trainer = AMEPModelTrainer(models_path=staging_path, backends=backends)
+    trainer.report = report
     
-    # Train models
-    trainer.train_mastery_model(X_mastery, y_mastery, mastery_cols)
-    trainer.train_engagement_model(X_engagement, y_engagement, engagement_cols)
-    trainer.train_recommendation_model(X_recommend, y_recommend, recommend_cols)
+    # Optionally pick each model's configuration by search first
+    if search:
+        trainer.search_hyperparameters(datasets, workers, cv=cv, tolerance=tolerance)
     
-    # Save metadata
-    trainer.save_metadata()
+    # Train models (fit, evaluate and persist each, concurrently)
+    trainer.train_all(datasets, workers)
     
     # Also save the processor's label encoders
-    joblib.dump(processor.label_encoders, '../models/label_encoders.pkl')
-    print(f"✅ Label encoders saved: ../models/label_encoders.pkl")
+    with report.stage('pipeline', 'persist'):
+        joblib.dump(processor.label_encoders, f'{staging_path}label_encoders.pkl')
+        with open(f'{staging_path}{LABEL_CLASSES_FILE}', 'w') as f:
+            json.dump(encoder_categories(processor.label_encoders), f, indent=2)
+    print(f"✅ Label encoders saved: {staging_path}label_encoders.pkl")
+    
+    # Save metadata, with the stage report
+    trainer.training['total_seconds'] = round(time.perf_counter() - started, 3)
+    trainer.save_metadata(version)
+    
+    # Publish the complete version and make it current; running servers
+    # follow CURRENT and swap to it on their own
+    publish_version(registry_path, staging_path, version, trainer.feature_columns, trainer.metrics,
+                    backends=trainer.trained_backends())
+    trainer.models_path = os.path.join(registry_path, version, '')
+    print(f"✅ Published model version {version} (now current)")
     
     # Print summary
     trainer.print_summary()
+    trainer.print_report()
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Train the AMEP models")
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('AMEP_TRAIN_WORKERS', 0)) or None,
+                        help="CPU budget for training (default: all cores, or AMEP_TRAIN_WORKERS)")
+    parser.add_argument('--search', action='store_true',
+                        help="choose each model's hyperparameters by successive-halving CV search")
+    parser.add_argument('--cv', type=int, default=5, help="folds for --search (default 5)")
+    parser.add_argument('--tolerance', type=float, default=0.01,
+                        help="--search picks the fastest config within this fraction of the best CV score")
+    parser.add_argument('--backend', default=os.environ.get('AMEP_MODEL_BACKEND'),
+                        help="model backend for every model ('hist') or per model "
+                             "('mastery=lightgbm,engagement=hist'); sklearn, hist, lightgbm or xgboost "
+                             f"(default {DEFAULT_BACKEND}, or AMEP_MODEL_BACKEND)")
+    parser.add_argument('--from-db', nargs='?', const=DEFAULT_DB_PATH, default=os.environ.get('AMEP_TRAINING_DB'),
+                        metavar='DB_PATH',
+                        help="train on the app database (default smarted.db, or AMEP_TRAINING_DB) through the "
+                             "incremental snapshot in ml/datasets/snapshot/ instead of the CSVs")
+    args = parser.parse_args()
+    main(workers=args.workers, search=args.search, cv=args.cv, tolerance=args.tolerance,
+         backends=parse_backends(args.backend, TRAIN_METHODS),
+         db_path=args.from_db)
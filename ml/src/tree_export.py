@@ -0,0 +1,430 @@
+"""
+Flattened tree ensembles for the AMEP prediction service
+
+Every tree of a fitted GradientBoostingRegressor / RandomForest is laid out
+in one set of contiguous node arrays (feature, threshold, left, right,
+value), and FlatEnsemble evaluates all trees of a batch together with a few
+NumPy operations per tree level. That skips sklearn's per-call input
+validation and per-estimator dispatch (and the thread pool that forests
+with n_jobs=-1 start for every predict call).
+
+Outputs are bit-identical to sklearn: inputs are cast to float32 before the
+threshold comparisons, exactly as sklearn validates them, and per-tree
+outputs are accumulated in estimator order before the same final scaling.
+Classifier leaves hold each tree's class probabilities (sklearn < 1.4
+stores weighted class counts and normalizes them per row at predict time;
+flatten_ensemble does that once per node), and NaN inputs are routed or
+rejected as the source model does under the installed sklearn.
+(Forests predicting with n_jobs != 1 add trees in whatever order the
+threads finish, so sklearn itself is only reproducible run to run with
+n_jobs=1; reference_output() compares against that order.)
+
+Exports are one flat file per model: a JSON header followed by the raw
+arrays at 64-byte aligned offsets. load_flat_ensemble() memory-maps the
+file read-only, so every worker process serving the same model version
+shares one copy of the node arrays through the page cache.
+"""
+
+import os
+import json
+import mmap
+import time
+import numpy as np
+
+TREE_EXPORT_SUFFIX = '.trees'
+TREE_EXPORT_MAGIC = b'AMEPTREE'
+_ALIGN = 64
+
+KIND_GRADIENT_BOOSTING = 'gradient_boosting'
+KIND_FOREST_REGRESSOR = 'forest_regressor'
+KIND_FOREST_CLASSIFIER = 'forest_classifier'
+
+_ESTIMATOR_KINDS = {
+    'GradientBoostingRegressor': KIND_GRADIENT_BOOSTING,
+    'RandomForestRegressor': KIND_FOREST_REGRESSOR,
+    'ExtraTreesRegressor': KIND_FOREST_REGRESSOR,
+    'RandomForestClassifier': KIND_FOREST_CLASSIFIER,
+    'ExtraTreesClassifier': KIND_FOREST_CLASSIFIER
+}
+
+
+class FlatEnsemble:
+    """
+    A tree ensemble as contiguous node arrays
+
+    roots:        index of each tree's root node, in estimator order
+    feature:      split feature per node (0 for leaves)
+    threshold:    split threshold per node
+    children:     global (right, left) child index pairs, so one gather at
+                  2 * node + went_left steps down; leaves point at
+                  themselves, so walking max_depth levels parks every row
+                  on its leaf (left / right are views into it)
+    missing_left: whether NaN goes left at the node
+    value:        leaf output per node, (n_nodes,) for regressors or
+                  (n_nodes, n_classes) class probabilities for classifiers
+    init, scale:  gradient boosting baseline and learning rate
+    allow_nan:    whether the source model accepts NaN inputs (and routes
+                  them by missing_left) rather than rejecting them
+    columns:      feature names in fitted order, when the model had them
+    """
+
+    ARRAYS = ('roots', 'feature', 'threshold', 'children', 'missing_left', 'value', 'classes')
+
+    def __init__(self, kind, n_features, max_depth, roots, feature, threshold, children,
+                 missing_left, value, init=0.0, scale=1.0, classes=None, columns=None, allow_nan=False):
+        self.kind = kind
+        self.n_features = int(n_features)
+        self.max_depth = int(max_depth)
+        self.roots = roots
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.missing_left = missing_left
+        self.has_missing = bool(missing_left.any())
+        self.value = value
+        self.init = float(init)
+        self.scale = float(scale)
+        self.classes = classes if classes is not None else np.empty(0, dtype=np.int64)
+        self.columns = list(columns) if columns is not None else None
+        self.allow_nan = bool(allow_nan)
+
+    @property
+    def left(self):
+        return self.children[1::2]
+
+    @property
+    def right(self):
+        return self.children[0::2]
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    @property
+    def nbytes(self):
+        """Size of the node arrays (what serving maps into memory)"""
+        return sum(getattr(self, name).nbytes for name in self.ARRAYS)
+
+    def apply(self, X):
+        """Leaf node index reached by every row in every tree, (n_rows, n_trees)"""
+        # sklearn validates X to float32; the comparison against the float64
+        # thresholds then happens in float64, as in its Cython tree walk
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got shape {X.shape}")
+        # Same input rules as the source model
+        if not self.allow_nan:
+            if not np.isfinite(X).all():
+                raise ValueError("Input X contains NaN or infinity")
+        elif np.isinf(X).any():
+            raise ValueError("Input X contains infinity")
+
+        # 1-D take() on the flattened matrix is the cheapest gather
+        flat_X = X.ravel()
+        row_start = (np.arange(len(X)) * self.n_features)[:, None]
+        node = np.tile(self.roots, (len(X), 1))
+        for _ in range(self.max_depth):
+            x = flat_X.take(row_start + self.feature.take(node))
+            go_left = x <= self.threshold.take(node)
+            if self.allow_nan and self.has_missing:
+                go_left |= np.isnan(x) & self.missing_left.take(node)
+            node = self.children.take(2 * node + go_left)
+        return node
+
+    def predict(self, X):
+        """Regression output, identical to the source estimator's predict()"""
+        if self.kind == KIND_FOREST_CLASSIFIER:
+            return self.classes[np.argmax(self.predict_proba(X), axis=1)]
+
+        leaf_values = self.value[self.apply(X)]
+        if self.kind == KIND_GRADIENT_BOOSTING:
+            # raw = init; raw += learning_rate * tree value, stage by stage
+            terms = np.empty((len(leaf_values), self.n_trees + 1), dtype=np.float64)
+            terms[:, 0] = self.init
+            np.multiply(self.scale, leaf_values, out=terms[:, 1:])
+            return np.add.accumulate(terms, axis=1)[:, -1]
+
+        # Forest: sum of tree outputs in estimator order, then the mean
+        out = np.add.accumulate(leaf_values, axis=1)[:, -1]
+        out /= self.n_trees
+        return out
+
+    def predict_proba(self, X):
+        """Class probabilities, identical to the source forest's predict_proba()"""
+        if self.kind != KIND_FOREST_CLASSIFIER:
+            raise AttributeError(f"{self.kind} ensembles have no predict_proba")
+        out = np.add.accumulate(self.value[self.apply(X)], axis=1)[:, -1]
+        out /= self.n_trees
+        return out
+
+
+def flatten_ensemble(model):
+    """
+    Flatten a fitted sklearn tree ensemble into a FlatEnsemble
+
+    Raises:
+        TypeError: for estimators other than single-output gradient boosting
+                   regressors and random / extra-trees forests
+    """
+    kind = _ESTIMATOR_KINDS.get(type(model).__name__)
+    if kind is None or getattr(model, 'n_outputs_', 1) != 1:
+        raise TypeError(f"Cannot flatten {type(model).__name__}")
+
+    init, scale = 0.0, 1.0
+    if kind == KIND_GRADIENT_BOOSTING:
+        if isinstance(model.init_, str):
+            init = 0.0  # init='zero'
+        elif type(model.init_).__name__ == 'DummyRegressor':
+            init = np.asarray(model.init_.constant_, dtype=np.float64).ravel()[0]
+        else:
+            raise TypeError(f"Cannot flatten gradient boosting with init={model.init_!r}")
+        scale = model.learning_rate
+        estimators = model.estimators_[:, 0]
+    else:
+        estimators = model.estimators_
+
+    normalize = kind == KIND_FOREST_CLASSIFIER and _tree_value_is_counts()
+    roots, features, thresholds, lefts, rights, missing, values = [], [], [], [], [], [], []
+    offset = 0
+    for estimator in estimators:
+        tree = estimator.tree_
+        ids = np.arange(tree.node_count) + offset
+        is_leaf = tree.children_left == -1
+
+        roots.append(offset)
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(tree.threshold)
+        lefts.append(np.where(is_leaf, ids, tree.children_left + offset))
+        rights.append(np.where(is_leaf, ids, tree.children_right + offset))
+        missing.append(np.asarray(tree.missing_go_to_left, dtype=bool))
+        if kind == KIND_FOREST_CLASSIFIER:
+            value = tree.value[:, 0, :model.n_classes_]
+            if normalize:
+                # As DecisionTreeClassifier.predict_proba does per row
+                normalizer = value.sum(axis=1)[:, np.newaxis]
+                normalizer[normalizer == 0.0] = 1.0
+                value = value / normalizer
+            values.append(value)
+        else:
+            values.append(tree.value[:, 0, 0])
+        offset += tree.node_count
+
+    classes = np.asarray(getattr(model, 'classes_', np.empty(0, dtype=np.int64)))
+    if classes.dtype == object:
+        classes = classes.astype(str)
+    columns = getattr(model, 'feature_names_in_', None)
+
+    return FlatEnsemble(
+        kind=kind,
+        n_features=model.n_features_in_,
+        max_depth=max(estimator.tree_.max_depth for estimator in estimators),
+        roots=np.array(roots, dtype=np.intp),
+        feature=np.ascontiguousarray(np.concatenate(features), dtype=np.intp),
+        threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+        children=np.stack([np.concatenate(rights), np.concatenate(lefts)], axis=1).astype(np.intp).ravel(),
+        missing_left=np.concatenate(missing),
+        value=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+        init=init,
+        scale=scale,
+        classes=classes,
+        columns=[str(c) for c in columns] if columns is not None else None,
+        allow_nan=kind != KIND_GRADIENT_BOOSTING and _accepts_nan(model)
+    )
+
+
+def _tree_value_is_counts():
+    """
+    Whether the installed sklearn keeps weighted class counts in a
+    classifier's tree_.value (before 1.4; later versions store fractions)
+    """
+    import sklearn
+    from sklearn.utils.fixes import parse_version
+    return parse_version(sklearn.__version__) < parse_version('1.4')
+
+
+def _accepts_nan(model):
+    """Whether model.predict takes a NaN input (forests from sklearn 1.4 on)"""
+    import warnings
+    row = np.full((1, model.n_features_in_), np.nan)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        try:
+            model.predict(row)
+        except ValueError:
+            return False
+    return True
+
+
+def export_path(model_file):
+    """Where the flattened export of a pickled model lives"""
+    return os.path.splitext(model_file)[0] + TREE_EXPORT_SUFFIX
+
+
+def save_flat_ensemble(flat, path):
+    """
+    Write the export file: magic, header length (uint64 LE), JSON header,
+    then each array's raw C-order bytes at a 64-byte aligned offset
+    """
+    arrays = {name: np.ascontiguousarray(getattr(flat, name)) for name in FlatEnsemble.ARRAYS}
+    header = {
+        'kind': flat.kind,
+        'n_features': flat.n_features,
+        'max_depth': flat.max_depth,
+        'init': flat.init,
+        'scale': flat.scale,
+        'columns': flat.columns,
+        'allow_nan': flat.allow_nan,
+        'arrays': {}
+    }
+
+    # Offsets depend on the header size, which depends on the offsets;
+    # reserving room for the widest offsets settles it in one pass
+    reserve = len(json.dumps(header)) + 128 * len(arrays)
+    offset = _aligned(len(TREE_EXPORT_MAGIC) + 8 + reserve)
+    for name, array in arrays.items():
+        header['arrays'][name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset = _aligned(offset + array.nbytes)
+
+    header_bytes = json.dumps(header).encode('utf-8').ljust(reserve)
+    with open(path, 'wb') as f:
+        f.write(TREE_EXPORT_MAGIC)
+        f.write(len(header_bytes).to_bytes(8, 'little'))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.seek(header['arrays'][name]['offset'])
+            f.write(array.tobytes())
+        f.truncate(offset)
+
+
+def load_flat_ensemble(path, mmap_mode=True):
+    """
+    Load an export file; with mmap_mode the arrays are read-only views of
+    a shared file mapping instead of private copies
+    """
+    with open(path, 'rb') as f:
+        if mmap_mode:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            buffer = f.read()
+
+    if buffer[:len(TREE_EXPORT_MAGIC)] != TREE_EXPORT_MAGIC:
+        raise ValueError(f"{path} is not a flattened tree export")
+    start = len(TREE_EXPORT_MAGIC)
+    header_length = int.from_bytes(buffer[start:start + 8], 'little')
+    header = json.loads(bytes(buffer[start + 8:start + 8 + header_length]))
+
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape'], dtype=np.int64))
+        arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=spec['offset']).reshape(spec['shape'])
+
+    return FlatEnsemble(
+        header['kind'], header['n_features'], header['max_depth'],
+        init=header['init'], scale=header['scale'], columns=header['columns'],
+        # Exports written before the flag existed came from sklearn >= 1.4
+        allow_nan=header.get('allow_nan', header['kind'] != KIND_GRADIENT_BOOSTING),
+        **arrays
+    )
+
+
+def _aligned(offset):
+    return -(-offset // _ALIGN) * _ALIGN
+
+
+def export_models(folder, model_files, label_encoders_file):
+    """
+    Write the .trees export of every flattenable pickled model in a folder,
+    plus the label classes the feature plans need
+    """
+    import joblib
+    from feature_plan import LABEL_CLASSES_FILE, encoder_categories
+
+    for filename in model_files:
+        model_file = os.path.join(folder, filename)
+        try:
+            save_flat_ensemble(flatten_ensemble(joblib.load(model_file)), export_path(model_file))
+        except TypeError:
+            continue
+    categories = encoder_categories(joblib.load(os.path.join(folder, label_encoders_file)))
+    with open(os.path.join(folder, LABEL_CLASSES_FILE), 'w') as f:
+        json.dump(categories, f, indent=2)
+
+
+def reference_output(model, X):
+    """
+    The model's own output for X (class probabilities for classifiers),
+    with sklearn forests summing trees in estimator order
+    """
+    n_jobs = getattr(model, 'n_jobs', None)
+    try:
+        if n_jobs not in (None, 1):
+            model.n_jobs = 1
+        if callable(getattr(model, 'predict_proba', None)):
+            return model.predict_proba(X)
+        return model.predict(X)
+    finally:
+        if n_jobs not in (None, 1):
+            model.n_jobs = n_jobs
+
+
+def flat_output(flat, X):
+    if flat.kind == KIND_FOREST_CLASSIFIER:
+        return flat.predict_proba(X)
+    return flat.predict(X)
+
+
+def check_parity(model, flat, X):
+    """True if the flat ensemble reproduces sklearn bit for bit on X"""
+    X = np.asarray(X, dtype=np.float64)
+    return np.array_equal(reference_output(model, X), flat_output(flat, X))
+
+
+def _time_per_call(fn, X, repeat):
+    fn(X)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn(X)
+    return (time.perf_counter() - started) / repeat
+
+
+if __name__ == "__main__":
+    import sys
+    import joblib
+    import warnings
+
+    # Latency of sklearn vs the flat evaluator per batch size on perturbed
+    # training rows (parity is covered by tests/test_tree_export.py)
+    sys.path.append(os.path.dirname(__file__))
+    from data_preprocessing import AMEPDataProcessor
+
+    warnings.filterwarnings('ignore', message='X does not have valid feature names')
+    models_path = sys.argv[1] if len(sys.argv) > 1 else '../models/'
+
+    processor = AMEPDataProcessor(data_path='../datasets/')
+    processor.load_datasets()
+    datasets = {
+        'mastery_predictor.pkl': processor.prepare_mastery_features()[0],
+        'engagement_predictor.pkl': processor.prepare_engagement_features()[0],
+        'task_recommender.pkl': processor.prepare_recommendation_features()[0]
+    }
+
+    rng = np.random.default_rng(0)
+    for filename, frame in datasets.items():
+        model = joblib.load(os.path.join(models_path, filename))
+        flat = flatten_ensemble(model)
+        X = frame[list(model.feature_names_in_)].to_numpy(dtype=np.float64)
+        noisy = X[rng.integers(0, len(X), 5000)] * rng.normal(1.0, 0.2, (5000, X.shape[1]))
+
+        print(f"\n{filename}: {type(model).__name__}, {flat.n_trees} trees, {flat.n_nodes} nodes, depth {flat.max_depth}")
+        sklearn_fn = model.predict_proba if flat.kind == KIND_FOREST_CLASSIFIER else model.predict
+        for batch_size in (1, 32, 1024):
+            batch = noisy[:batch_size]
+            repeat = max(20, 2000 // batch_size)
+            sk = _time_per_call(sklearn_fn, batch, repeat)
+            fl = _time_per_call(lambda rows: flat_output(flat, rows), batch, repeat)
+            print(f"  batch {batch_size:>4}: sklearn {sk * 1e3:8.3f} ms  flat {fl * 1e3:8.3f} ms  ({sk / fl:5.1f}x)")
@@ -0,0 +1,11 @@
+"""
+Shared pytest setup: the backend and ML modules import each other as
+top-level modules (as they do when run from their own directories)
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+sys.path.insert(0, os.path.join(ROOT, 'ml', 'src'))
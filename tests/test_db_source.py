@@ -0,0 +1,166 @@
+"""
+DatabaseSource: incremental pulls past the high-water marks, mastery
+updates and deletes, crash recovery of a half-written chunk, rebuilds when
+the database moved under a mark, and unmigrated databases
+"""
+
+import os
+import sqlite3
+import time
+
+import pytest
+
+import db_source
+from db_source import DatabaseSource, SchemaError, SYNC_SCHEMA_VERSION, TABLES
+from utils.migrations import migrate
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / 'app.db')
+    migrate(path)
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "INSERT INTO students (student_id, student_name, grade, section, institution_id) "
+        "VALUES ('S1', 'Student', 10, 'A', 'INST001')"
+    )
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def source(database, tmp_path):
+    return DatabaseSource(database, str(tmp_path / 'snapshot'), chunk_rows=2)
+
+
+def _settled():
+    return int(time.time()) - 10 * db_source.SETTLE_SECONDS
+
+
+def _quizzes(path, ids):
+    conn = sqlite3.connect(path)
+    for attempt_id in ids:
+        conn.execute(
+            "INSERT INTO quiz_attempts (attempt_id, student_id, subject, topic, quiz_id, quiz_score, "
+            "time_taken_seconds, number_of_attempts, difficulty_level, timestamp) "
+            "VALUES (?, 'S1', 'Math', 'Algebra', 'Q1', 50, 60, 1, 'easy', ?)",
+            (attempt_id, time.time())
+        )
+    conn.commit()
+    conn.close()
+
+
+def _mastery(path, topics, updated_at=None):
+    conn = sqlite3.connect(path)
+    for topic, score in topics:
+        conn.execute(
+            "INSERT INTO mastery_scores (student_id, subject, topic, final_mastery_score, mastery_level, "
+            "updated_at) VALUES ('S1', 'Math', ?, ?, 'intermediate', ?)",
+            (topic, score, updated_at or _settled())
+        )
+    conn.commit()
+    conn.close()
+
+
+def _execute(path, sql, args=()):
+    conn = sqlite3.connect(path)
+    conn.execute(sql, args)
+    conn.commit()
+    conn.close()
+
+
+def _labels(source):
+    df = source.read('mastery_scores')
+    return dict(zip(df['topic'], df['final_mastery_score']))
+
+
+def test_append_pulls_only_new_rows(source, database):
+    _quizzes(database, ['A1', 'A2', 'A3'])
+    assert source.sync()['tables']['quiz_attempts']['pulled'] == 3
+
+    _quizzes(database, ['A4', 'A5'])
+    stats = source.sync()['tables']['quiz_attempts']
+    assert (stats['pulled'], stats['rows'], stats['rebuilt']) == (2, 5, False)
+    assert list(source.read('quiz_attempts')['attempt_id']) == ['A1', 'A2', 'A3', 'A4', 'A5']
+
+    assert source.sync()['tables']['quiz_attempts']['pulled'] == 0
+
+
+def test_mastery_update_is_pulled_again_and_replaces_the_old_label(source, database):
+    stamp = _settled()
+    # Same updated_at across a chunk boundary (chunk_rows=2)
+    _mastery(database, [('Algebra', 40), ('Geometry', 50), ('Calculus', 60)], updated_at=stamp)
+    source.sync()
+    assert _labels(source) == {'Algebra': 40, 'Geometry': 50, 'Calculus': 60}
+
+    _execute(database, "UPDATE mastery_scores SET final_mastery_score = 90, updated_at = ? "
+                       "WHERE topic = 'Geometry'", (stamp + 1,))
+    stats = source.sync()['tables']['mastery_scores']
+    assert (stats['pulled'], stats['rebuilt']) == (1, False)
+    assert _labels(source) == {'Algebra': 40, 'Geometry': 90, 'Calculus': 60}
+
+
+def test_recent_mastery_rows_wait_until_they_settle(source, database, monkeypatch):
+    _mastery(database, [('Algebra', 40)], updated_at=int(time.time()))
+    assert source.sync()['tables']['mastery_scores']['pulled'] == 0
+
+    monkeypatch.setattr(db_source, 'SETTLE_SECONDS', -60)
+    assert source.sync()['tables']['mastery_scores']['pulled'] == 1
+    assert _labels(source) == {'Algebra': 40}
+
+
+def test_deleted_mastery_rows_leave_the_snapshot(source, database):
+    _mastery(database, [('Algebra', 40), ('Geometry', 50)])
+    source.sync()
+
+    _execute(database, "DELETE FROM mastery_scores WHERE topic = 'Algebra'")
+    stats = source.sync()['tables']
+    assert stats['mastery_score_deletes']['pulled'] == 1
+    assert _labels(source) == {'Geometry': 50}
+
+
+def test_half_written_chunk_is_truncated(source, database):
+    _quizzes(database, ['A1', 'A2', 'A3'])
+    source.sync()
+    path = source._path(TABLES['quiz_attempts'])
+    committed = os.path.getsize(path)
+
+    # A run that died after writing part of a chunk but before its mark
+    with open(path, 'a') as f:
+        f.write('A4,S1,Math,Alg')
+    _quizzes(database, ['A4'])
+    stats = source.sync()['tables']['quiz_attempts']
+
+    assert (stats['pulled'], stats['rows'], stats['rebuilt']) == (1, 4, False)
+    assert os.path.getsize(path) > committed
+    assert list(source.read('quiz_attempts')['attempt_id']) == ['A1', 'A2', 'A3', 'A4']
+
+
+def test_renumbered_rowids_force_a_rebuild(source, database):
+    _quizzes(database, ['A1', 'A2', 'A3'])
+    source.sync()
+
+    # What VACUUM may do to a table without an INTEGER PRIMARY KEY: the
+    # mark's row keeps its attempt_id under another rowid
+    _execute(database, "UPDATE quiz_attempts SET rowid = rowid + 100 WHERE attempt_id = 'A3'")
+    _quizzes(database, ['A4'])
+    stats = source.sync()['tables']['quiz_attempts']
+
+    assert (stats['pulled'], stats['rows'], stats['rebuilt']) == (4, 4, True)
+    assert sorted(source.read('quiz_attempts')['attempt_id']) == ['A1', 'A2', 'A3', 'A4']
+
+
+def test_unmigrated_database_is_refused(tmp_path):
+    path = str(tmp_path / 'old.db')
+    migrate(path, target=SYNC_SCHEMA_VERSION - 1)
+    source = DatabaseSource(path, str(tmp_path / 'snapshot'))
+
+    with pytest.raises(SchemaError, match=f'{SYNC_SCHEMA_VERSION:04d}'):
+        source.sync()
+    assert not os.path.exists(source._path(TABLES['mastery_scores']))
+
+    legacy = str(tmp_path / 'legacy.db')
+    sqlite3.connect(legacy).close()
+    with pytest.raises(SchemaError, match='schema version 0'):
+        DatabaseSource(legacy, str(tmp_path / 'snapshot')).sync()
@@ -0,0 +1,261 @@
+"""
+SingleWriter / read pool behaviour: WAL readers never wait on the writer,
+timed-out writes are cancelled when they can be, and a failing batch does
+not take the writer thread down with it
+"""
+
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from utils.db import ConnectionPool, SingleWriter, WriteTimeout
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / 'writer.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, value INTEGER NOT NULL)")
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def writer(database):
+    writer = SingleWriter(database, batch_size=16, commit_timeout=5.0, busy_timeout=1.0)
+    yield writer
+    writer.stop()
+
+
+@pytest.fixture
+def readers(writer, database):
+    pool = ConnectionPool(database, size=4, timeout=1.0, read_only=True)
+    yield pool
+    pool.close_all()
+
+
+def _gate(writer):
+    """SQL function `gate(x)` that blocks the writer until the event is set"""
+    release = threading.Event()
+    entered = threading.Event()
+
+    def gate(value):
+        entered.set()
+        release.wait(10)
+        return value
+
+    writer._conn.create_function('gate', 1, gate)
+    return entered, release
+
+
+def _count(pool):
+    with pool.connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+
+
+def test_readers_run_while_writer_holds_the_lock(writer, readers):
+    entered, release = _gate(writer)
+    writer.submit([("INSERT INTO items (value) VALUES (?)", (0,))])
+
+    blocked = threading.Thread(
+        target=writer.submit, args=([("INSERT INTO items (value) VALUES (gate(?))", (1,))],)
+    )
+    blocked.start()
+    assert entered.wait(5)
+
+    # The writer is inside BEGIN IMMEDIATE; readers still see the last commit
+    started = time.perf_counter()
+    for _ in range(50):
+        assert _count(readers) == 1
+    assert time.perf_counter() - started < 1.0
+    assert readers.metrics()['timeouts'] == 0
+
+    release.set()
+    blocked.join(5)
+    assert _count(readers) == 2
+
+
+def test_readers_never_blocked_under_write_stress(writer, readers):
+    n_writers, writes_each, n_readers = 8, 100, 4
+    stop = threading.Event()
+    latencies, errors, seen = [], [], []
+    lock = threading.Lock()
+
+    def write(worker):
+        try:
+            for i in range(writes_each):
+                writer.submit([
+                    ("INSERT INTO items (value) VALUES (?)", (worker * writes_each + i,)),
+                    ("UPDATE items SET value = value + 1 WHERE id = last_insert_rowid()", ())
+                ])
+        except Exception as e:
+            with lock:
+                errors.append(e)
+
+    def read():
+        last = 0
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                count = _count(readers)
+            except Exception as e:
+                with lock:
+                    errors.append(e)
+                return
+            with lock:
+                latencies.append(time.perf_counter() - started)
+            # Each reader sees committed batches only, never going backwards
+            assert count >= last
+            last = count
+        with lock:
+            seen.append(last)
+
+    reader_threads = [threading.Thread(target=read) for _ in range(n_readers)]
+    writer_threads = [threading.Thread(target=write, args=(w,)) for w in range(n_writers)]
+    for t in reader_threads + writer_threads:
+        t.start()
+    for t in writer_threads:
+        t.join(60)
+    stop.set()
+    for t in reader_threads:
+        t.join(5)
+
+    assert not errors
+    assert len(seen) == n_readers
+    assert _count(readers) == n_writers * writes_each
+    # No read ever waited on a busy handler or the pool
+    assert latencies and max(latencies) < writer.busy_timeout
+    assert readers.metrics()['timeouts'] == 0
+    assert writer.metrics()['batches'] < n_writers * writes_each
+
+
+def test_timed_out_queued_write_is_cancelled(writer, readers):
+    entered, release = _gate(writer)
+    holder = threading.Thread(
+        target=writer.submit, args=([("INSERT INTO items (value) VALUES (gate(?))", (1,))],)
+    )
+    holder.start()
+    assert entered.wait(5)
+
+    writer.commit_timeout = 0.2
+    with pytest.raises(WriteTimeout) as info:
+        writer.submit([("INSERT INTO items (value) VALUES (?)", (2,))])
+    assert info.value.pending is False
+
+    writer.commit_timeout = 5.0
+    release.set()
+    holder.join(5)
+    writer.submit([("INSERT INTO items (value) VALUES (?)", (3,))])
+
+    with readers.connection() as conn:
+        values = [row[0] for row in conn.execute("SELECT value FROM items ORDER BY id")]
+    assert values == [1, 3]
+
+
+def test_timed_out_running_write_may_still_commit(writer, readers):
+    entered, release = _gate(writer)
+    writer.commit_timeout = 0.2
+    with pytest.raises(WriteTimeout) as info:
+        writer.submit([("INSERT INTO items (value) VALUES (gate(?))", (1,))])
+    assert entered.is_set()
+    assert info.value.pending is True
+
+    release.set()
+    writer.stop()
+    assert _count(readers) == 1
+
+
+def test_failing_job_only_rolls_back_itself(writer, readers):
+    entered, release = _gate(writer)
+    holder = threading.Thread(
+        target=writer.submit, args=([("INSERT INTO items (value) VALUES (gate(?))", (1,))],)
+    )
+    holder.start()
+    assert entered.wait(5)
+
+    outcomes = {}
+
+    def submit(name, statements):
+        try:
+            outcomes[name] = writer.submit(statements)
+        except Exception as e:
+            outcomes[name] = e
+
+    # Queued behind the gate, these three commit as one batch
+    jobs = [
+        threading.Thread(target=submit, args=('ok', [("INSERT INTO items (value) VALUES (?)", (2,))])),
+        threading.Thread(target=submit, args=('bad', [
+            ("INSERT INTO items (value) VALUES (?)", (3,)),
+            ("INSERT INTO items (value) VALUES (?)", (None,))
+        ])),
+        threading.Thread(target=submit, args=('also_ok', [("INSERT INTO items (value) VALUES (?)", (4,))]))
+    ]
+    for t in jobs:
+        t.start()
+    while writer.metrics()['queued'] < len(jobs):
+        time.sleep(0.01)
+    release.set()
+    for t in [holder] + jobs:
+        t.join(5)
+
+    assert isinstance(outcomes['bad'], sqlite3.IntegrityError)
+    with readers.connection() as conn:
+        values = sorted(row[0] for row in conn.execute("SELECT value FROM items"))
+    assert values == [1, 2, 4]
+
+
+def test_writer_survives_an_unexpected_batch_error(writer, readers):
+    real_commit = writer._commit_batch
+    calls = []
+
+    def explode_once(batch):
+        if not calls:
+            calls.append(batch)
+            writer._conn.execute("BEGIN IMMEDIATE")
+            writer._conn.execute("INSERT INTO items (value) VALUES (?)", (1,))
+            raise RuntimeError("boom")
+        return real_commit(batch)
+
+    writer._commit_batch = explode_once
+    with pytest.raises(RuntimeError, match="boom"):
+        writer.submit([("INSERT INTO items (value) VALUES (?)", (1,))])
+
+    # The half-done batch was rolled back and the thread is still serving
+    assert writer._thread.is_alive()
+    assert not writer._conn.in_transaction
+    writer.submit([("INSERT INTO items (value) VALUES (?)", (2,))])
+    with readers.connection() as conn:
+        values = [row[0] for row in conn.execute("SELECT value FROM items")]
+    assert values == [2]
+
+
+def test_lastrowid_is_only_reported_for_a_jobs_own_insert(writer):
+    entered, release = _gate(writer)
+    holder = threading.Thread(
+        target=writer.submit, args=([("INSERT INTO items (value) VALUES (gate(?))", (1,))],)
+    )
+    holder.start()
+    assert entered.wait(5)
+
+    outcomes = {}
+
+    def submit(name, statements):
+        outcomes[name] = writer.submit(statements)
+
+    # Queued behind the gate, the UPDATE commits in the same batch as the INSERT
+    jobs = [
+        threading.Thread(target=submit, args=('insert', [("INSERT INTO items (value) VALUES (?)", (2,))])),
+        threading.Thread(target=submit, args=('update', [("UPDATE items SET value = value + 1", ())]))
+    ]
+    for t in jobs:
+        t.start()
+        while writer.metrics()['queued'] < jobs.index(t) + 1:
+            time.sleep(0.01)
+    release.set()
+    for t in [holder] + jobs:
+        t.join(5)
+
+    assert outcomes == {'insert': 2, 'update': None}
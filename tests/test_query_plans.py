@@ -0,0 +1,285 @@
+"""
+Query plans of every route against a migrated, seeded database: each query
+reads through an index (never a bare table scan) and sorts into a temp
+B-tree only where EXEMPT says why that sort is small
+"""
+
+import random
+import sqlite3
+import time
+import uuid
+from collections import Counter
+
+import bcrypt
+import pytest
+
+from config import Config
+from utils import db, ml
+from utils.auth import generate_token
+from utils.migrations import migrate
+
+# Plan lines a query may still show, keyed by a fragment unique to it
+EXEMPT = {
+    'as topics_covered': (
+        ['USE TEMP B-TREE FOR ORDER BY'],
+        "one row per subject of a single student, ordered by its average"),
+    'WHERE avg_mastery < 65 OR avg_engagement < 60': (
+        ['USE TEMP B-TREE FOR ORDER BY'],
+        "at-risk list: averages computed per roster student, ordered by one"),
+    'GROUP BY topic': (
+        ['USE TEMP B-TREE FOR GROUP BY', 'USE TEMP B-TREE FOR ORDER BY'],
+        "topic rollup rows of the roster classes, grouped and ordered by topic average"),
+    'SELECT level, COUNT(*) as count': (
+        ['USE TEMP B-TREE FOR GROUP BY'],
+        "one computed level per roster student into three groups"),
+    'LIMIT 1 OFFSET 19': (
+        ['USE TEMP B-TREE FOR ORDER BY'],
+        "merges at most 20 attempts per roster student"),
+    'GROUP BY t.grade, t.section': (
+        ['USE TEMP B-TREE FOR GROUP BY'],
+        "one row per roster class"),
+    'ORDER BY s.student_name': (
+        ['USE TEMP B-TREE FOR ORDER BY'],
+        "one row per student of the requested section, ordered by name"),
+    'COUNT(DISTINCT student_id) as student_count': (
+        ['USE TEMP B-TREE FOR count(DISTINCT)'],
+        "institution-wide panel; the distinct set is at most the students of one subject"),
+    'CROSS JOIN student_daily_engagement d': (
+        ['USE TEMP B-TREE FOR GROUP BY'],
+        "one computed level per student into three groups"),
+    'as usage_level': (
+        ['USE TEMP B-TREE FOR GROUP BY'],
+        "one computed level per teacher into three groups"),
+}
+
+USERS = {
+    'student': ('U0', 's0@example.com'),
+    'teacher': ('T1', 't1@example.com'),
+    'admin': ('A1', 'a1@example.com'),
+}
+
+ROUTES = [
+    ('student', 'GET', '/api/student/dashboard', None),
+    ('student', 'GET', '/api/student/analytics', None),
+    ('student', 'GET', '/api/student/practice', None),
+    ('student', 'GET', '/api/student/projects', None),
+    ('student', 'GET', '/api/student/settings', None),
+    ('teacher', 'GET', '/api/teacher/dashboard', None),
+    ('teacher', 'GET', '/api/teacher/classes', None),
+    ('teacher', 'GET', '/api/teacher/class-forecast?grade=10&section=A', None),
+    ('admin', 'GET', '/api/admin/dashboard', None),
+    ('admin', 'GET', '/api/admin/users', None),
+    ('admin', 'GET', '/api/admin/teachers/T1/classes', None),
+    ('admin', 'PUT', '/api/admin/teachers/T1/classes', {'classes': [
+        {'institution_id': 'INST001', 'grade': 10, 'section': 'A'},
+        {'institution_id': 'INST001', 'grade': 9, 'section': 'B'},
+    ]}),
+    (None, 'POST', '/api/auth/login', {'email': 's1@example.com', 'password': 'password'}),
+]
+
+SUBJECTS = {'Mathematics': ['Algebra', 'Geometry'], 'Science': ['Physics', 'Biology']}
+
+
+class _Predictor:
+    """Stands in for the ML models, which the plans don't depend on"""
+    model_version = 'test'
+
+    def predict_mastery_batch(self, rows):
+        return [70] * len(rows)
+
+    def predict_engagement_batch(self, rows):
+        return [60.0] * len(rows)
+
+    def recommend_tasks_batch(self, rows):
+        return [{'difficulty_level': 'medium', 'confidence': 0.5}] * len(rows)
+
+
+def _seed(path):
+    conn = sqlite3.connect(path)
+    rnd = random.Random(7)
+    now = time.time()
+    password = bcrypt.hashpw(b'password', bcrypt.gensalt(4)).decode('utf-8')
+    for i in range(60):
+        user_id, student_id = f'U{i}', f'S{i:03d}'
+        grade, section = rnd.choice([9, 10]), rnd.choice('ABC')
+        conn.execute(
+            "INSERT INTO users (user_id, email, password_hash, full_name, role, grade) "
+            "VALUES (?, ?, ?, ?, 'student', ?)",
+            (user_id, f's{i}@example.com', password, f'Student {i}', str(grade))
+        )
+        conn.execute(
+            "INSERT INTO students (student_id, user_id, student_name, grade, section, institution_id, "
+            "baseline_proficiency, learning_pace, preferred_learning_style) "
+            "VALUES (?, ?, ?, ?, ?, 'INST001', 70, 'average', 'visual')",
+            (student_id, user_id, f'Student {i}', grade, section)
+        )
+        for subject, topics in SUBJECTS.items():
+            for topic in topics:
+                conn.execute(
+                    "INSERT INTO mastery_scores (student_id, subject, topic, final_mastery_score, "
+                    "mastery_level, updated_at) VALUES (?, ?, ?, ?, 'intermediate', ?)",
+                    (student_id, subject, topic, rnd.randint(30, 100), int(now - rnd.random() * 200 * 86400))
+                )
+        for _ in range(25):
+            subject = rnd.choice(list(SUBJECTS))
+            conn.execute(
+                "INSERT INTO quiz_attempts (attempt_id, student_id, subject, topic, quiz_id, quiz_score, "
+                "time_taken_seconds, number_of_attempts, difficulty_level, timestamp) "
+                "VALUES (?, ?, ?, ?, 'Q1', ?, 60, 1, 'medium', ?)",
+                (str(uuid.uuid4()), student_id, subject, rnd.choice(SUBJECTS[subject]),
+                 rnd.randint(0, 100), now - rnd.random() * 90 * 86400)
+            )
+        for _ in range(30):
+            conn.execute(
+                "INSERT INTO engagement_logs (student_id, session_id, activity_type, duration_seconds, "
+                "interaction_count, timestamp, engagement_score) VALUES (?, ?, 'video', ?, 5, ?, ?)",
+                (student_id, str(uuid.uuid4()), rnd.randint(60, 3000),
+                 now - rnd.random() * 60 * 86400, rnd.randint(30, 100))
+            )
+        for k in range(3):
+            conn.execute(
+                "INSERT INTO project_activity (project_id, student_id, team_id, role_in_team, "
+                "tasks_completed, peer_review_score, communication_score, collaboration_score, "
+                "creativity_score, project_completion_pct) VALUES (?, ?, 'TEAM1', 'Coder', 3, 4, 4, 4, 4, 70)",
+                (f'P{k}', student_id)
+            )
+    conn.execute(
+        "INSERT INTO users (user_id, email, password_hash, full_name, role, subject) "
+        "VALUES ('T1', 't1@example.com', ?, 'Teacher', 'teacher', 'Mathematics')",
+        (password,)
+    )
+    conn.execute(
+        "INSERT INTO users (user_id, email, password_hash, full_name, role) "
+        "VALUES ('A1', 'a1@example.com', ?, 'Admin', 'admin')",
+        (password,)
+    )
+    conn.execute("DELETE FROM teacher_classes WHERE teacher_id = 'T1'")
+    conn.execute(
+        "INSERT INTO teacher_classes (teacher_id, institution_id, grade, section) "
+        "VALUES ('T1', 'INST001', 10, 'A'), ('T1', 'INST001', 9, 'B')"
+    )
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture(scope='module')
+def traced_app(tmp_path_factory):
+    """The Flask app on a seeded database, recording every read statement"""
+    base = tmp_path_factory.mktemp('query_plans')
+    path = str(base / 'app.db')
+    migrate(path)
+    _seed(path)
+
+    statements = []
+    connect = db.ConnectionPool._connect
+
+    def traced_connect(self):
+        conn = connect(self)
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    patch = pytest.MonkeyPatch()
+    patch.setattr(Config, 'DATABASE_PATH', path)
+    patch.setattr(Config, 'ML_LOAD_MODE', 'lazy')
+    patch.setattr(Config, 'ML_MODELS_PATH', str(base / 'models'))
+    patch.setattr(db, '_pool', None)
+    patch.setattr(db, '_writer', None)
+    patch.setattr(db.ConnectionPool, '_connect', traced_connect)
+    # Keep the real models out: no load, no registry polling
+    patch.setattr(ml, '_state', 'failed')
+    patch.setattr(ml, 'follow_current', lambda: None)
+
+    from app import app
+    import routes.teacher
+    patch.setattr(routes.teacher, 'get_predictor', lambda: _Predictor())
+
+    yield app.test_client(), statements, path
+
+    if db._pool is not None:
+        db._pool.close_all()
+    if db._writer is not None:
+        db._writer.stop()
+    patch.undo()
+
+
+def _headers(role):
+    if role is None:
+        return {}
+    user_id, email = USERS[role]
+    return {'Authorization': f'Bearer {generate_token(user_id, email, role)}'}
+
+
+def _normalize(sql):
+    return ' '.join(sql.split())
+
+
+def _violations(conn, sql):
+    plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+    derived = {line.split()[-1] for line in plan if line.startswith(('CO-ROUTINE ', 'MATERIALIZE '))}
+    return plan, [
+        line for line in plan
+        if 'TEMP B-TREE' in line
+        or (line.startswith('SCAN ') and 'USING' not in line and 'CONSTANT ROW' not in line
+            and line.split()[1] not in derived and not line.startswith('SCAN ('))
+    ]
+
+
+def _route_id(route):
+    return f'{route[1]} {route[2]}'
+
+
+@pytest.fixture(scope='module')
+def route_queries(traced_app):
+    """Distinct read statements of each route, in the order they ran"""
+    client, statements, path = traced_app
+    queries = {}
+    for role, method, url, body in ROUTES:
+        del statements[:]
+        response = client.open(url, method=method, headers=_headers(role), json=body)
+        assert response.status_code == 200, response.get_json()
+        seen = queries.setdefault(_route_id((role, method, url, body)), {})
+        for sql in statements:
+            key = _normalize(sql)
+            if key.upper().startswith(('SELECT', 'WITH')) and key != 'SELECT 1':
+                seen.setdefault(key, sql)
+    return queries
+
+
+@pytest.mark.parametrize('route', [_route_id(r) for r in ROUTES])
+def test_route_queries_use_indexes(traced_app, route_queries, route):
+    path = traced_app[2]
+    assert route_queries[route]
+
+    conn = sqlite3.connect(path)
+    failures = []
+    for key, sql in route_queries[route].items():
+        plan, violations = _violations(conn, sql)
+        exempt = [fragment for fragment in EXEMPT if fragment in key]
+        allowed = Counter(EXEMPT[exempt[0]][0]) if exempt else Counter()
+        if len(exempt) > 1 or Counter(violations) != allowed:
+            failures.append(f"{key}\n    plan: {plan}")
+    conn.close()
+    assert not failures, '\n'.join(failures)
+
+
+def test_every_exemption_is_used(route_queries):
+    queries = [key for route in route_queries.values() for key in route]
+    assert [fragment for fragment in EXEMPT if not any(fragment in key for key in queries)] == []
+
+
+def test_mastery_trend_matches_calendar_months(traced_app):
+    client, statements, path = traced_app
+    response = client.get('/api/admin/dashboard', headers=_headers('admin'))
+    conn = sqlite3.connect(path)
+    expected = conn.execute(
+        """SELECT strftime('%Y-%m', updated_at, 'unixepoch'), AVG(final_mastery_score)
+           FROM mastery_scores
+           WHERE updated_at >= CAST(strftime('%s', 'now', '-5 months') AS INTEGER)
+           GROUP BY 1 ORDER BY 1"""
+    ).fetchall()
+    conn.close()
+    # The oldest month is clipped at the cutoff and may be empty
+    assert len(expected) >= 5
+    assert response.get_json()['mastery_trend'] == [
+        {'month': month, 'value': int(avg)} for month, avg in expected
+    ]
@@ -0,0 +1,55 @@
+"""
+Migration 0011: teachers that existed before the teacher_classes roster
+keep seeing every class; rosters that were already filled in are untouched
+"""
+
+import sqlite3
+
+from utils.migrations import migrate
+from utils.scope import StudentScope
+
+
+def _students(conn, classes):
+    for i, (institution_id, grade, section) in enumerate(classes):
+        conn.execute(
+            "INSERT INTO students (student_id, student_name, grade, section, institution_id) "
+            "VALUES (?, 'Student', ?, ?, ?)",
+            (f'S{i}', grade, section, institution_id)
+        )
+
+
+def _teacher(conn, user_id):
+    conn.execute(
+        "INSERT INTO users (user_id, email, password_hash, full_name, role) "
+        "VALUES (?, ?, 'x', 'Teacher', 'teacher')",
+        (user_id, f'{user_id}@example.com')
+    )
+
+
+def _visible(conn, user_id):
+    sql, args = StudentScope({'user_id': user_id, 'role': 'teacher'}).student_filter('s.student_id')
+    return sorted(r[0] for r in conn.execute(f"SELECT s.student_id FROM students s WHERE {sql}", args))
+
+
+def test_backfill_gives_existing_teachers_every_class(tmp_path):
+    path = str(tmp_path / 'roster.db')
+    migrate(path, target=10)
+    conn = sqlite3.connect(path)
+    _students(conn, [('INST001', 10, 'A'), ('INST001', 10, 'A'), ('INST001', 10, 'B'), ('INST002', 9, 'A')])
+    _teacher(conn, 'legacy')
+    _teacher(conn, 'rostered')
+    conn.execute(
+        "INSERT INTO teacher_classes (teacher_id, institution_id, grade, section) "
+        "VALUES ('rostered', 'INST001', 10, 'B')"
+    )
+    conn.commit()
+
+    migrate(path)
+
+    assert conn.execute(
+        "SELECT institution_id, grade, section FROM teacher_classes "
+        "WHERE teacher_id = 'legacy' ORDER BY 1, 2, 3"
+    ).fetchall() == [('INST001', 10, 'A'), ('INST001', 10, 'B'), ('INST002', 9, 'A')]
+    assert _visible(conn, 'legacy') == ['S0', 'S1', 'S2', 'S3']
+    assert _visible(conn, 'rostered') == ['S2']
+    conn.close()
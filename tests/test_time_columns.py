@@ -0,0 +1,95 @@
+"""
+Migration 0003 (epoch time columns): legacy ISO strings convert as UTC
+whatever the machine's timezone, keep their microseconds, and render back
+through utils.timeutil in the formats the API returned before
+"""
+
+import os
+import sqlite3
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from utils.migrations import migrate
+from utils.timeutil import day_bucket, to_iso, to_sql_datetime, week_bucket
+
+LEGACY_QUIZ_TIMES = [
+    '2025-12-21T11:44:48.276150',
+    '2026-01-12T11:44:48.276491',
+    '2026-01-12T11:44:48.276562',   # same second as the previous attempt
+    '2026-01-05T23:59:59.999999',
+    '2026-01-06T00:00:00',          # isoformat() drops a zero fraction
+]
+
+
+@pytest.fixture
+def local_timezone():
+    def use(name):
+        os.environ['TZ'] = name
+        time.tzset()
+
+    previous = os.environ.get('TZ')
+    yield use
+    if previous is None:
+        os.environ.pop('TZ', None)
+    else:
+        os.environ['TZ'] = previous
+    time.tzset()
+
+
+def _legacy_database(path):
+    migrate(path, target=2)
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "INSERT INTO students (student_id, student_name, grade, section, institution_id) "
+        "VALUES ('S1', 'Test', 10, 'A', 'INST')"
+    )
+    for i, stamp in enumerate(LEGACY_QUIZ_TIMES):
+        conn.execute(
+            "INSERT INTO quiz_attempts (attempt_id, student_id, subject, topic, quiz_id, quiz_score, "
+            "time_taken_seconds, number_of_attempts, difficulty_level, timestamp) "
+            "VALUES (?, 'S1', 'Math', 'Algebra', 'Q', 50, 60, 1, 'easy', ?)",
+            (f'A{i}', stamp)
+        )
+        conn.execute(
+            "INSERT INTO engagement_logs (student_id, session_id, activity_type, duration_seconds, "
+            "timestamp, engagement_score) VALUES ('S1', ?, 'video', 60, ?, 70)",
+            (f'session-{i}', stamp)
+        )
+    conn.commit()
+    conn.close()
+
+
+@pytest.mark.parametrize('zone', ['UTC', 'America/New_York', 'Asia/Kathmandu'])
+def test_legacy_times_convert_as_utc(tmp_path, local_timezone, zone):
+    local_timezone(zone)
+    path = str(tmp_path / f'{zone.replace("/", "_")}.db')
+    _legacy_database(path)
+    migrate(path)
+
+    conn = sqlite3.connect(path)
+    for table in ('quiz_attempts', 'engagement_logs'):
+        rows = conn.execute(f"SELECT timestamp, day_bucket, week_bucket FROM {table} ORDER BY rowid").fetchall()
+        for legacy, (stamp, day, week) in zip(LEGACY_QUIZ_TIMES, rows):
+            expected = datetime.fromisoformat(legacy).replace(tzinfo=timezone.utc).timestamp()
+            assert stamp == pytest.approx(expected, abs=1e-6)
+            assert to_iso(stamp) == legacy
+            assert (day, week) == (day_bucket(stamp), week_bucket(stamp))
+
+    # Newest first, ties within a second broken by the microseconds
+    newest = [row[0] for row in conn.execute(
+        "SELECT attempt_id FROM quiz_attempts WHERE student_id = 'S1' ORDER BY timestamp DESC"
+    )]
+    assert newest == ['A2', 'A1', 'A4', 'A3', 'A0']
+    conn.close()
+
+
+def test_response_formats():
+    assert to_iso(None) is None
+    assert to_iso(1766317488.27615) == '2025-12-21T11:44:48.276150'
+    assert to_iso(1766318400) == '2025-12-21T12:00:00'
+    assert to_sql_datetime(1768198488) == '2026-01-12 06:14:48'
+    assert day_bucket(86399.9) == 0 and day_bucket(86400) == 1
+    # 1970-01-05 was the first Monday
+    assert week_bucket(4 * 86400 - 1) == 0 and week_bucket(4 * 86400) == 1
@@ -0,0 +1,131 @@
+"""
+Parity of the flattened tree evaluator (ml/src/tree_export.py) with the
+sklearn models it is exported from, under whichever sklearn is installed
+"""
+
+import warnings
+
+import numpy as np
+import pytest
+from sklearn.ensemble import (
+    ExtraTreesClassifier, ExtraTreesRegressor, GradientBoostingRegressor,
+    RandomForestClassifier, RandomForestRegressor
+)
+
+from tree_export import (
+    KIND_FOREST_CLASSIFIER, check_parity, flat_output, flatten_ensemble,
+    load_flat_ensemble, reference_output, save_flat_ensemble
+)
+
+MODELS = {
+    'gradient_boosting': lambda: GradientBoostingRegressor(n_estimators=30, max_depth=4, random_state=0),
+    'forest_regressor': lambda: RandomForestRegressor(n_estimators=20, max_depth=8, random_state=0),
+    'extra_trees_regressor': lambda: ExtraTreesRegressor(n_estimators=20, max_depth=8, random_state=0),
+    'forest_classifier': lambda: RandomForestClassifier(n_estimators=20, max_depth=6, random_state=0),
+    'extra_trees_classifier': lambda: ExtraTreesClassifier(n_estimators=20, max_depth=6, random_state=0)
+}
+
+
+@pytest.fixture(scope='module')
+def data():
+    rng = np.random.default_rng(0)
+    X = np.column_stack([
+        rng.uniform(0, 100, 600).round(),
+        rng.integers(30, 1800, 600),
+        rng.integers(1, 6, 600),
+        rng.uniform(1, 5, 600).round(1),
+        rng.integers(0, 3, 600)
+    ]).astype(np.float64)
+    y = 0.6 * X[:, 0] - 3 * X[:, 2] + 4 * X[:, 3] + rng.normal(0, 5, 600)
+    return X, y, np.digitize(y, [30, 55])
+
+
+@pytest.fixture(scope='module', params=sorted(MODELS))
+def fitted(request, data):
+    X, y, classes = data
+    model = MODELS[request.param]()
+    model.fit(X, classes if 'classifier' in request.param else y)
+    return model, flatten_ensemble(model)
+
+
+def perturbed(X, rows=2000, seed=1):
+    rng = np.random.default_rng(seed)
+    return X[rng.integers(0, len(X), rows)] * rng.normal(1.0, 0.2, (rows, X.shape[1]))
+
+
+def test_training_rows_identical(fitted, data):
+    model, flat = fitted
+    assert check_parity(model, flat, data[0])
+
+
+def test_perturbed_rows_identical(fitted, data):
+    model, flat = fitted
+    assert check_parity(model, flat, perturbed(data[0]))
+
+
+def test_single_rows_identical(fitted, data):
+    model, flat = fitted
+    for row in perturbed(data[0], rows=50, seed=2):
+        assert check_parity(model, flat, row[None, :])
+
+
+def test_classifier_probabilities_and_labels(data):
+    X, _, classes = data
+    model = MODELS['forest_classifier']().fit(X, classes)
+    flat = flatten_ensemble(model)
+    rows = perturbed(X)
+
+    proba = flat.predict_proba(rows)
+    np.testing.assert_array_equal(proba, reference_output(model, rows))
+    np.testing.assert_allclose(proba.sum(axis=1), 1.0)
+    np.testing.assert_array_equal(flat.predict(rows), model.predict(rows))
+
+
+def test_missing_values_follow_sklearn(fitted, data):
+    model, flat = fitted
+    rows = perturbed(data[0], rows=500, seed=3)
+    rows[np.random.default_rng(4).random(rows.shape) < 0.2] = np.nan
+
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            expected = reference_output(model, rows)
+    except ValueError:
+        with pytest.raises(ValueError):
+            flat_output(flat, rows)
+    else:
+        np.testing.assert_array_equal(flat_output(flat, rows), expected)
+
+
+def test_trained_with_missing_values(data):
+    X, y, classes = data
+    X = X.copy()
+    X[np.random.default_rng(5).random(X.shape) < 0.1] = np.nan
+    model = RandomForestClassifier(n_estimators=10, max_depth=6, random_state=0)
+    try:
+        model.fit(X, classes)
+    except ValueError:
+        pytest.skip("this sklearn's forests do not train on NaN")
+    flat = flatten_ensemble(model)
+    assert flat.allow_nan and flat.has_missing
+    assert check_parity(model, flat, X)
+
+
+def test_export_round_trip(fitted, data, tmp_path):
+    model, flat = fitted
+    path = tmp_path / 'model.trees'
+    save_flat_ensemble(flat, path)
+    rows = perturbed(data[0])
+    for mmap_mode in (True, False):
+        loaded = load_flat_ensemble(path, mmap_mode=mmap_mode)
+        assert loaded.allow_nan == flat.allow_nan
+        assert check_parity(model, loaded, rows)
+        if flat.kind == KIND_FOREST_CLASSIFIER:
+            np.testing.assert_array_equal(loaded.classes, model.classes_)
+
+
+def test_rejects_unsupported_estimators(data):
+    from sklearn.linear_model import LinearRegression
+    X, y, _ = data
+    with pytest.raises(TypeError):
+        flatten_ensemble(LinearRegression().fit(X, y))